@@ -1,6 +1,14 @@
+import os
+import sys
 import pandas as pd
 import argparse
-import log_analyzer_module as lam
+
+# Adiciona o diretório src ao path para importar o log_analyzer
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import log_analyzer as lam
+
+CRITICAL_CATEGORY = 'Aplicação (erro/exceção)'     # Categoria analisada pela IA (--analyze-errors)
 
 def main():
     """
@@ -11,6 +19,7 @@ def main():
     parser.add_argument('-o', '--output', default='analysis_result.csv', help='O caminho para o arquivo CSV de saída.')
     parser.add_argument('-c', '--config', default='config.json', help='O caminho para o arquivo de configuração JSON.')
     parser.add_argument('--analyze-errors', action='store_true', help='Ativa a análise de logs de erro com IA (Groq).')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Linhas lidas e processadas por vez (limita o pico de memória em exports grandes).')
     
     args = parser.parse_args()
 
@@ -22,10 +31,10 @@ def main():
         if config is None:
             return
 
-    # 2. Read Input CSV
+    # 2. Read Input CSV em chunks
     try:
         # Lendo o CSV. Se o seu arquivo não tiver cabeçalho, header=None está correto.
-        df = pd.read_csv(args.file_path, header=None, names=['timestamp', 'source', 'message'])
+        chunks = pd.read_csv(args.file_path, header=None, names=['timestamp', 'source', 'message'], chunksize=args.chunksize)
     except FileNotFoundError:
         print(f"Erro: O arquivo '{args.file_path}' não foi encontrado.")
         return
@@ -33,23 +42,30 @@ def main():
         print(f"Ocorreu um erro ao ler o arquivo CSV de entrada: {e}")
         return
 
-    # 3. Process Data
+    # 3 e 4. Processa e grava chunk a chunk (só um chunk em memória por vez)
+    total_rows = 0
+    category_counts = {}
+    critical_parts = []
+    columns = None
     try:
-        output_df, category_counts = lam.process_log_data(df, config)
+        for output_df, category_counts in lam.process_log_stream(chunks, config):
+            # Campos JSON podem aparecer só em alguns chunks: o cabeçalho do CSV é fixado no primeiro
+            columns = columns or list(dict.fromkeys(list(output_df.columns) + lam.JSON_COLUMNS))
+            output_df = output_df.reindex(columns=columns)
+            output_df.to_csv(args.output, index=False, quoting=1, mode='w' if total_rows == 0 else 'a', header=total_rows == 0)
+            total_rows += len(output_df)
+            if args.analyze_errors:
+                critical_parts.append(output_df[output_df['category'] == CRITICAL_CATEGORY])
+        if total_rows == 0:
+            pd.DataFrame(columns=['timestamp', 'source', 'message', 'category', 'log_level', 'message_length']).to_csv(args.output, index=False, quoting=1)
+        print(f"Análise salva com sucesso em '{args.output}'")
     except Exception as e:
         print(f"Erro durante o processamento: {e}")
         return
 
-    # 4. Save results
-    try:
-        output_df.to_csv(args.output, index=False, quoting=1)
-        print(f"Análise salva com sucesso em '{args.output}'")
-    except Exception as e:
-        print(f"Ocorreu um erro ao salvar o arquivo de saída: {e}")
-
     # 5. Print summary
     print("\n--- Resumo da Análise ---")
-    print(f"Total de logs processados: {len(output_df)}")
+    print(f"Total de logs processados: {total_rows}")
     if category_counts:
         for category, count in sorted(category_counts.items()):
             print(f"- {category}: {count}")
@@ -59,7 +75,8 @@ def main():
     if args.analyze_errors:
         print("\n--- Análise de Erros com IA ---")
 
-        ai_analyses = lam.analyze_critical_logs_with_ai(output_df)
+        critical_df = pd.concat(critical_parts, ignore_index=True) if critical_parts else pd.DataFrame(columns=['category'])
+        ai_analyses = lam.analyze_critical_logs_with_ai(critical_df)
         
         if isinstance(ai_analyses, list) and len(ai_analyses) > 0:
             for analysis in ai_analyses:
@@ -0,0 +1,256 @@
+import os
+import sys
+import re
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Adiciona o diretório src ao path para importar o pacote log_analyzer_lib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from log_analyzer_lib import database as db
+from log_analyzer_lib.log_store import LogStore, parse_timestamps_ns
+
+
+def generate_logs(rows, seed=42):
+    """Gera um DataFrame sintético de logs com mensagens de tamanhos variados."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01')
+    offsets = np.sort(rng.integers(0, 7 * 24 * 3600, rows))
+    templates = [
+        'INFO: Request GET /api/survey/{} completed duration={}ms',
+        'ERROR: Timeout connecting to sql server after {} ms (id {})',
+        'WARNING: Slow query took {}ms on table orders {}',
+        'fail: Unhandled exception in worker {}\n   at Lockton.Service.Process() line {}\n   at Lockton.Jobs.Run()',
+    ]
+    messages = [templates[i % len(templates)].format(rng.integers(1, 10000), i) for i in range(rows)]
+    return pd.DataFrame({
+        'timestamp': (start + pd.to_timedelta(offsets, unit='s')).strftime('%Y-%m-%d %H:%M:%S'),
+        'source': rng.choice(['api-gateway', 'survey-service', 'worker', 'auth'], rows),
+        'message': messages
+    })
+
+
+def generate_realistic_logs(rows, seed=7):
+    """
+    Logs no formato da produção: ~20 templates (requisições HTTP, SQL, filas,
+    stack traces) com ids, UUIDs, IPs e durações variando, mais ~5% de
+    mensagens de texto livre sem template.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01')
+    offsets = np.sort(rng.integers(0, 7 * 24 * 3600, rows))
+    templates = [
+        'INFO: Request finished HTTP/1.1 GET https://api.lockton.com.br/api/survey/{n} - {status} {n} application/json {f}ms',
+        'INFO: Request starting HTTP/1.1 POST https://api.lockton.com.br/api/policies/{n}/quote application/json {n}',
+        'INFO: Executed endpoint Lockton.Api.Controllers.SurveyController.Get (Lockton.Api) in {f}ms CorrelationId={uuid}',
+        'ERROR: Timeout connecting to sql server lkt-sql-{n} after {n} ms (CommandTimeout={n}) TraceId={hex32}',
+        'WARNING: Slow query took {n}ms on table Orders rows={n} plan_hash=0x{hex8}',
+        'fail: Microsoft.EntityFrameworkCore.Database.Command[{n}] Failed executing DbCommand ({n}ms) [Parameters=[@p0={n}], CommandType=Text, CommandTimeout={n}]',
+        'fail: Unhandled exception in worker {n}\n   at Lockton.Service.Process() line {n}\n   at Lockton.Jobs.Run() line {n}',
+        'Connection from {ip}:{n} closed after {f}s (bytes_in={n} bytes_out={n})',
+        'User {n} authenticated via SSO session={uuid} ip={ip}',
+        'Job {uuid} enqueued on queue renewals priority={n} attempt={n}/{n}',
+        'Job {uuid} completed in {f}s (processed={n} failed={n})',
+        'Cache miss for key policy:{n}:coverage:{n} (ttl={n}s)',
+        'METRIC | CPU: {f}% | Memory: {f}% | Disk: {f}%',
+        'Health check GET /health returned {status} in {n}ms from {ip}',
+        'Retrying HTTP call to https://payments.lockton.com.br/v{n}/charges/{hex32} (attempt {n} of {n})',
+        'Kafka consumer group renewals-{n} lag={n} partition={n} offset={n}',
+        'Document {uuid}.pdf generated with {n} pages in {f}ms',
+        'Email sent to customer {n} template=renewal_{n} message_id={hex32}',
+        'Rate limit exceeded for client {hex8} on /api/quotes ({n} req/min)',
+        'Audit: policy {n} updated by user {n} fields=[premium, coverage_{n}] version={n}',
+    ]
+    fields = {
+        'n': lambda: str(rng.integers(1, 100000)),
+        'f': lambda: f"{rng.random() * 1000:.2f}",
+        'status': lambda: str(rng.choice([200, 200, 200, 201, 204, 400, 404, 500])),
+        'uuid': lambda: '-'.join(rng.bytes(16).hex()[a:b] for a, b in ((0, 8), (8, 12), (12, 16), (16, 20), (20, 32))),
+        'hex32': lambda: rng.bytes(16).hex(),
+        'hex8': lambda: rng.bytes(4).hex(),
+        'ip': lambda: '.'.join(str(x) for x in rng.integers(1, 255, 4)),
+    }
+    words = ['customer', 'renewal', 'policy', 'manual', 'adjustment', 'note', 'broker', 'requested', 'review', 'claim']
+    choice = rng.integers(0, len(templates), rows)
+    free_text = rng.random(rows) < 0.05
+    messages = []
+    for i in range(rows):
+        if free_text[i]:
+            messages.append(' '.join(rng.choice(words, rng.integers(4, 12))) + f' ({i})')
+            continue
+        template = templates[choice[i]]
+        messages.append(re.sub(r'\{(\w+)\}', lambda m: fields[m.group(1)](), template))
+    return pd.DataFrame({
+        'timestamp': (start + pd.to_timedelta(offsets, unit='s')).strftime('%Y-%m-%d %H:%M:%S'),
+        'source': rng.choice(['api-gateway', 'survey-service', 'worker', 'auth'], rows),
+        'message': messages
+    })
+
+
+def _use_dir(base):
+    """Redireciona os arquivos de persistência para um diretório isolado."""
+    db.DB_FILE = os.path.join(base, 'log_analysis_data.json')
+    db.SNAPSHOT_DIR = os.path.join(base, 'snapshot')
+    db.WAL_DIR = os.path.join(base, 'wal')
+    if db._WAL is not None:
+        db._WAL.close()
+    db._WAL = None
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_snapshot(rows):
+    """Compara o snapshot JSON legado com o snapshot binário mapeado em memória."""
+    df = generate_logs(rows)
+    results = {}
+    for fmt in ('json', 'binary'):
+        base = tempfile.mkdtemp()
+        try:
+            _use_dir(base)
+            db.init_db()
+            db.ingest_logs_to_db(df)
+            save_s, _ = _timed(db.save_to_disk, snapshot_format=fmt)
+            _use_dir(base)
+            load_s, _ = _timed(db.load_from_disk)
+            assert len(db.get_collected_logs(limit=rows)) == rows
+            results[fmt] = (save_s, load_s)
+        finally:
+            if db._WAL is not None:
+                db._WAL.close()
+            db._WAL = None
+            db._reset_state()
+            shutil.rmtree(base, ignore_errors=True)
+    return results
+
+
+def bench_ingest(rows):
+    """Mede a ingestão em lote (linhas/s) de um lote novo e do mesmo lote repetido (só duplicatas)."""
+    df = generate_logs(rows)
+    base = tempfile.mkdtemp()
+    try:
+        _use_dir(base)
+        db.init_db()
+        fresh_s, inserted = _timed(db.ingest_logs_to_db, df)
+        dup_s, duplicated = _timed(db.ingest_logs_to_db, df)
+        assert inserted == rows and duplicated == 0
+        return rows / fresh_s, rows / dup_s
+    finally:
+        if db._WAL is not None:
+            db._WAL.close()
+        db._WAL = None
+        db._reset_state()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def bench_search(rows, query='error AND timeout'):
+    """Compara a busca pelo índice invertido com a varredura completa (str.contains)."""
+    df = generate_logs(rows)
+    base = tempfile.mkdtemp()
+    try:
+        _use_dir(base)
+        db.init_db()
+        ingest_s, _ = _timed(db.ingest_logs_to_db, df)
+        db.search_logs_in_db(query=query, limit=None)   # Aquece o índice/blocos
+        index_s, result = _timed(db.search_logs_in_db, query=query, limit=None)
+        # 'error.*timeout' é tratada como regex e percorre todas as mensagens
+        scan_s, scanned = _timed(db.search_logs_in_db, query='error.*timeout', limit=None)
+        assert len(result) == len(scanned)
+        return ingest_s, index_s, scan_s
+    finally:
+        if db._WAL is not None:
+            db._WAL.close()
+        db._WAL = None
+        db._reset_state()
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def bench_templates(rows, batch=100000):
+    """
+    Compara o armazenamento das mensagens em texto ('plain') e por template
+    ('templates'): bytes em memória, bytes do snapshot, ingestão e leitura.
+    """
+    df = generate_realistic_logs(rows)
+    ts_ns = parse_timestamps_ns(df['timestamp'].tolist())
+    digests = db.calculate_log_digests(df['timestamp'], df['source'], df['message'])
+    raw_bytes = int(df['message'].str.len().sum())
+    results = {}
+    for mode in ('plain', 'templates'):
+        store = LogStore(message_storage=mode)
+        start = time.perf_counter()
+        for i in range(0, rows, batch):
+            end = min(i + batch, rows)
+            store.append_batch(df['timestamp'].iloc[i:end].tolist(), ts_ns[i:end], df['source'].iloc[i:end].tolist(),
+                               df['message'].iloc[i:end].tolist(), np.zeros(end - i, dtype=np.int64), digests[i:end])
+        ingest_s = time.perf_counter() - start
+        read_s, frame = _timed(store.to_frame, 100000)
+        assert frame['message'].tolist() == df['message'].iloc[-len(frame):].tolist()
+
+        base = tempfile.mkdtemp()
+        try:
+            store.save(base)
+            disk = _dir_bytes(base)
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+        usage = store.memory_usage()
+        results[mode] = {
+            'messages_bytes': sum(b.msg_blob.nbytes + b.msg_offsets.nbytes + (0 if b.msg_templates is None else b.msg_templates.nbytes)
+                                  for p in store.partitions.values() for b in p.blocks) + (store.templates.nbytes() if store.templates else 0),
+            'logs_bytes': usage['logs'], 'disk_bytes': disk, 'ingest_s': ingest_s, 'read_s': read_s,
+            'templates': len(store.templates) if store.templates else 0
+        }
+    return raw_bytes, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do armazenamento local de logs.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='Tamanhos de base a testar.')
+    parser.add_argument('--ingest-rows', type=int, nargs='+', default=[10000, 100000, 1000000], help='Tamanhos de lote para a ingestão.')
+    parser.add_argument('--template-rows', type=int, default=1000000, help='Tamanho da base realista para o modo template.')
+    args = parser.parse_args()
+
+    print("\n--- Ingestão em lote (linhas/s) ---")
+    print(f"{'linhas':>10} | {'lote novo':>12} | {'duplicatas':>12}")
+    for rows in args.ingest_rows:
+        fresh, dup = bench_ingest(rows)
+        print(f"{rows:>10} | {fresh:>12,.0f} | {dup:>12,.0f}")
+
+    print("\n--- Snapshot: JSON vs Binário (mmap) ---")
+    print(f"{'linhas':>10} | {'json save':>10} | {'json load':>10} | {'bin save':>10} | {'bin load':>10}")
+    for rows in args.rows:
+        r = bench_snapshot(rows)
+        print(f"{rows:>10} | {r['json'][0]:>9.3f}s | {r['json'][1]:>9.3f}s | {r['binary'][0]:>9.3f}s | {r['binary'][1]:>9.3f}s")
+
+    print("\n--- Busca 'error AND timeout': índice invertido vs varredura ---")
+    print(f"{'linhas':>10} | {'ingestão':>10} | {'índice':>10} | {'varredura':>10}")
+    for rows in args.rows:
+        ingest_s, index_s, scan_s = bench_search(rows)
+        print(f"{rows:>10} | {ingest_s:>9.3f}s | {index_s:>9.3f}s | {scan_s:>9.3f}s")
+
+    print(f"\n--- Mensagens: texto vs template ({args.template_rows:,} linhas realistas) ---")
+    raw_bytes, r = bench_templates(args.template_rows)
+    mb = 1024 * 1024
+    print(f"texto bruto das mensagens: {raw_bytes / mb:.1f} MB | templates no dicionário: {r['templates']['templates']}")
+    print(f"{'modo':>10} | {'mensagens':>10} | {'logs (RAM)':>10} | {'snapshot':>10} | {'ingestão':>9} | {'leitura 100k':>12}")
+    for mode in ('plain', 'templates'):
+        x = r[mode]
+        print(f"{mode:>10} | {x['messages_bytes'] / mb:>7.1f} MB | {x['logs_bytes'] / mb:>7.1f} MB | {x['disk_bytes'] / mb:>7.1f} MB | {x['ingest_s']:>8.2f}s | {x['read_s']:>11.2f}s")
+    plain, tpl = r['plain'], r['templates']
+    print(f"compressão das mensagens: {plain['messages_bytes'] / tpl['messages_bytes']:.2f}x | "
+          f"economia em RAM (logs): {(plain['logs_bytes'] - tpl['logs_bytes']) / mb:.1f} MB "
+          f"({1 - tpl['logs_bytes'] / plain['logs_bytes']:.0%})")
+
+
+if __name__ == '__main__':
+    main()
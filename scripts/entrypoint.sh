@@ -12,6 +12,12 @@ fi
 if [ "$1" = "start-services" ]; then
     echo "🚀 Iniciando Stack de Serviços..."
 
+    # 0. Inicia o Serviço de Armazenamento (escritor único) quando STORAGE_BACKEND=service
+    if [ "$STORAGE_BACKEND" = "service" ]; then
+        echo "--- Iniciando Serviço de Armazenamento ---"
+        python store_service.py &
+    fi
+
     # 1. Inicia Scheduler (Watchdog) em background
     echo "--- Iniciando Scheduler ---"
     python scheduler.py &
@@ -18,13 +18,16 @@ from fastapi import FastAPI, Request, WebSocket, Response
 from fastapi.responses import StreamingResponse, RedirectResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.websockets import WebSocketDisconnect
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 
 app = FastAPI()
 
 # --- Métricas Prometheus ---
 REQUEST_COUNT = Counter("http_requests_total", "Total HTTP Requests", ["method", "endpoint", "status_code"])
 REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP Request Duration", ["method", "endpoint"])
+# Uso de memória do armazenamento em memória, publicado pelo processo que o mantém (store_service)
+STORE_MEMORY = Gauge("log_store_memory_bytes", "Estimated in-memory store size", ["process", "structure"])
+STORE_MEMORY_BUDGET = Gauge("log_store_memory_budget_bytes", "Configured in-memory store budget", ["process"])
 
 # Cliente HTTP Global para o Proxy (Evita fechar conexões prematuramente)
 HTTP_CLIENT = None
@@ -47,6 +50,7 @@ async def log_requests(request: Request, call_next):
 
 # Armazena referências aos processos em background para monitoramento
 service_processes = {
+    "store": None,
     "streamlit": None,
     "scheduler": None,
     "collector": None
@@ -66,6 +70,11 @@ async def start_system_services():
         print("--- Modo Docker detectado: Subprocessos gerenciados pelo Entrypoint ---")
         return
 
+    # Serviço de armazenamento (escritor único) sobe antes de quem lê/escreve nele
+    if os.getenv("STORAGE_BACKEND", "").lower() == "service":
+        print("--- Iniciando Serviço de Armazenamento ---")
+        service_processes["store"] = subprocess.Popen([sys.executable, "store_service.py"])
+
     print(f"--- Iniciando Streamlit na porta {STREAMLIT_PORT} ---")
 
     cmd = [
@@ -292,6 +301,18 @@ async def env_status():
 # Rota de Métricas (Prometheus)
 @app.get("/metrics")
 async def metrics():
+    try:
+        from log_analyzer_lib.database import read_memory_usage
+        STORE_MEMORY.clear()
+        STORE_MEMORY_BUDGET.clear()
+        for report in read_memory_usage():
+            process = f"{report['process']}:{report['pid']}"
+            for structure, value in report['usage'].items():
+                STORE_MEMORY.labels(process=process, structure=structure).set(value)
+            if report.get('budget'):
+                STORE_MEMORY_BUDGET.labels(process=process).set(report['budget'])
+    except Exception as e:
+        print(f"⚠️ Falha ao ler uso de memória do armazenamento: {e}")
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 # Rota de Healthcheck (Liveness Probe)
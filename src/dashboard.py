@@ -223,13 +223,15 @@ def main():
 
             enable_masking = st.checkbox("🛡️ Mascarar Dados", value=True)
             
-        filtered_df = raw_df[
+        filtered_df = lam.drop_unused_categories(raw_df[
             (raw_df['source'].isin(selected_sources)) &
             (raw_df['log_level'].isin(selected_log_levels))
-        ]
+        ].copy())
         display_df = cached_mask_sensitive_data(filtered_df.copy()) if enable_masking else filtered_df.copy()
 
-        filtered_df['timestamp'] = pd.to_datetime(filtered_df['timestamp'])
+        # Timestamp já normalizado no processamento (timestamp_ns): sem reconverter o texto
+        filtered_df['timestamp'] = lam.ns_to_datetime(filtered_df['timestamp_ns'], index=filtered_df.index)
+        lam.invalidate_enrichment(filtered_df)    # timestamp alterado no lugar: descarta colunas derivadas
         
         # Opções de Exportação na Sidebar (após filtros)
         with st.sidebar:
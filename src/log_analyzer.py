@@ -14,10 +14,18 @@ import numpy as np
 import subprocess
 import sys
 import signal
+import threading
 from datetime import datetime
 import socket
 import zlib
 
+from log_analyzer_lib.categorization import UNCATEGORIZED, get_engine as get_categorization_engine, load_config_file
+from log_analyzer_lib.structured_fields import JSON_COLUMNS, extract_json_fields, loads as json_loads
+from log_analyzer_lib.enrichment import enrich, invalidate as invalidate_enrichment, timestamp_frame
+from log_analyzer_lib.timestamps import NAT_NS, as_ns, ns_to_datetime, parse_timestamps_ns, utc_now_ns, utc_timestamp
+from log_analyzer_lib.template_miner import get_miner as get_template_miner
+from log_analyzer_lib import search_index, template_registry
+
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 # --- Pre-compiled Regex for Performance ---
@@ -34,10 +42,121 @@ URL_PATTERN = re.compile(r'https?://([\w\-\.]+)(?::\d+)?')
 
 # --- Database Functions (Persistence) ---
 DB_NAME = 'log_analysis_memory.db'
-
-def init_db():
-    """Inicializa o banco de dados (DESATIVADO)."""
-    pass
+# Backend de armazenamento dos logs coletados (configuração STORAGE_BACKEND):
+#   'sqlite' -> banco local em DB_NAME (WAL + FTS5), consultado sob demanda
+#   'service'-> serviço escritor único (store_service.py) em STORE_SERVICE_URL
+#   'none'   -> persistência desativada (funções de logs retornam vazio)
+DEFAULT_STORAGE_BACKEND = 'sqlite'
+SQLITE_BATCH_SIZE = 5000
+# Timestamps gravados em UTC (texto sem fuso é tomado como UTC, como no coletor), com milissegundos
+SQLITE_TS_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+_DB_CONN = None
+_DB_LOCK = threading.Lock()
+_DB_HAS_FTS = False
+_STORE_CLIENT = None
+_TEMPLATE_REGISTRY = None   # Registro persistente de templates (só no backend sqlite)
+
+_SQLITE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY,
+        log_hash TEXT NOT NULL UNIQUE,
+        timestamp TEXT,
+        source TEXT,
+        message TEXT,
+        ingested_at TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_source ON logs(source, timestamp)",
+] + template_registry.SCHEMA
+
+# Índice full-text externo (o texto fica só em `logs`), sincronizado por triggers
+_SQLITE_FTS_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(message, content='logs', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER IF NOT EXISTS logs_ai AFTER INSERT ON logs BEGIN
+        INSERT INTO logs_fts(rowid, message) VALUES (new.id, new.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS logs_ad AFTER DELETE ON logs BEGIN
+        INSERT INTO logs_fts(logs_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END""",
+]
+
+
+def get_storage_backend():
+    """Backend de armazenamento de logs configurado ('sqlite', 'service' ou 'none')."""
+    return str(get_setting("STORAGE_BACKEND", DEFAULT_STORAGE_BACKEND) or DEFAULT_STORAGE_BACKEND).lower()
+
+
+def init_db(db_path=None):
+    """
+    Inicializa o banco SQLite de logs (modo WAL, índices por timestamp/source e
+    FTS5 sobre a mensagem). Com STORAGE_BACKEND='service' as funções de logs
+    usam o serviço de armazenamento; com 'none' a persistência fica desativada.
+    """
+    global _DB_CONN, _DB_HAS_FTS, _STORE_CLIENT, _TEMPLATE_REGISTRY
+    with _DB_LOCK:
+        if _DB_CONN is not None:
+            _DB_CONN.close()
+            _DB_CONN = None
+        _STORE_CLIENT = None
+        _TEMPLATE_REGISTRY = None
+        backend = get_storage_backend()
+        if backend == 'service':
+            from log_analyzer_lib.store_service import StoreClient, DEFAULT_URL
+            _STORE_CLIENT = StoreClient(get_setting("STORE_SERVICE_URL", DEFAULT_URL))
+            if not _STORE_CLIENT.is_available():
+                print(f"⚠️ Serviço de armazenamento ainda não responde em {_STORE_CLIENT.base_url}.")
+            return True
+        if backend != 'sqlite':
+            return False
+        try:
+            conn = sqlite3.connect(db_path or get_setting("LOG_DB_PATH", DB_NAME), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SQLITE_SCHEMA:
+                conn.execute(statement)
+            try:
+                for statement in _SQLITE_FTS_SCHEMA:
+                    conn.execute(statement)
+                _DB_HAS_FTS = True
+            except sqlite3.OperationalError as e:
+                # SQLite compilado sem FTS5: a busca cai para LIKE
+                print(f"⚠️ FTS5 indisponível ({e}). Busca textual usará LIKE.")
+                _DB_HAS_FTS = False
+            template_registry.ensure_unique_templates(conn)
+            conn.commit()
+            # Templates já registrados voltam para o minerador do processo (ids persistentes)
+            registry = template_registry.TemplateRegistry(get_template_miner())
+            registry.load(conn)
+            _DB_CONN, _TEMPLATE_REGISTRY = conn, registry
+            return True
+        except sqlite3.Error as e:
+            print(f"❌ Erro ao inicializar o banco de logs: {e}")
+            return False
+
+
+def _normalize_db_timestamps(values, ts_ns=None):
+    """
+    Timestamps em UTC no formato SQLITE_TS_FORMAT com milissegundos (ordenável como
+    texto); inválidos ficam como vieram. `ts_ns`: os mesmos timestamps já
+    normalizados (coluna timestamp_ns), para não reconverter.
+    """
+    raw = pd.Series(values, dtype=object).astype(str)
+    parsed = ns_to_datetime(parse_timestamps_ns(raw) if ts_ns is None else ts_ns, index=raw.index)
+    return parsed.dt.strftime(SQLITE_TS_FORMAT).str[:-3].where(parsed.notna(), raw).tolist()
+
+
+def _db_timestamp(ts):
+    """Um pd.Timestamp (UTC, sem fuso) no formato gravado no banco."""
+    return ts.strftime(SQLITE_TS_FORMAT)[:-3]
+
+
+def _store_service_call(method, default, *args, **kwargs):
+    """Chama o serviço de armazenamento; se estiver fora do ar, retorna `default`."""
+    try:
+        return getattr(_STORE_CLIENT, method)(*args, **kwargs)
+    except requests.RequestException as e:
+        print(f"⚠️ Serviço de armazenamento indisponível: {e}")
+        return default
 
 
 def get_cached_ai_analysis(message):
@@ -100,12 +219,82 @@ def ingest_logs_to_db(df):
     Ingere um DataFrame de logs no banco de dados local (Coleta Centralizada).
     Ignora duplicatas automaticamente para eficiência.
     """
-    return 0
+    if _DB_CONN is None:
+        # Sem banco local: o minerador de templates do processo ainda aprende lote a lote
+        if df is not None and not df.empty and 'message' in df.columns:
+            get_template_miner().add_messages(df['message'].astype(str).to_numpy())
+        return _store_service_call('ingest', 0, df) if _STORE_CLIENT is not None else 0
+    if df is None or df.empty:
+        return 0
+    data = pd.DataFrame({col: df[col] if col in df.columns else '' for col in ('timestamp', 'source', 'message')})
+    # source/log_level chegam categóricos do process_log_data: fillna('') exige object
+    data = data.astype(object).fillna('').astype(str)
+    if 'log_hash' in df.columns:
+        hashes = df['log_hash'].astype(str).tolist()
+    else:
+        hashes = [calculate_log_hash(t, s, m) for t, s, m in zip(data['timestamp'], data['source'], data['message'])]
+    now = _db_timestamp(pd.Timestamp(utc_now_ns()))
+    timestamps = _normalize_db_timestamps(data['timestamp'], df['timestamp_ns'] if 'timestamp_ns' in df.columns else None)
+    rows = list(zip(hashes, timestamps, data['source'].tolist(), data['message'].tolist()))
+
+    inserted = 0
+    with _DB_LOCK:
+        try:
+            with _DB_CONN:
+                # Trava de escrita antes de ler MAX(id): linhas de outro processo não entram no "id > last_id"
+                _DB_CONN.execute("BEGIN IMMEDIATE")
+                last_id = _DB_CONN.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+                for start in range(0, len(rows), SQLITE_BATCH_SIZE):
+                    cursor = _DB_CONN.executemany(
+                        "INSERT OR IGNORE INTO logs (log_hash, timestamp, source, message, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                        [row + (now,) for row in rows[start:start + SQLITE_BATCH_SIZE]]
+                    )
+                    inserted += max(cursor.rowcount, 0)
+                if inserted and _TEMPLATE_REGISTRY is not None:
+                    # Só as linhas realmente inseridas (primeira ocorrência de cada hash novo) entram no registro
+                    new_hashes = {h for (h,) in _DB_CONN.execute("SELECT log_hash FROM logs WHERE id > ?", (last_id,))}
+                    keep = pd.Series(hashes).isin(new_hashes).to_numpy() & ~pd.Series(hashes).duplicated().to_numpy()
+                    _TEMPLATE_REGISTRY.record(
+                        _DB_CONN, data['message'].to_numpy()[keep], np.asarray(timestamps, dtype=object)[keep],
+                        data['source'].to_numpy()[keep],
+                        df['log_level'].to_numpy()[keep] if 'log_level' in df.columns else None
+                    )
+        except sqlite3.Error as e:
+            print(f"❌ Erro ao ingerir logs no banco: {e}")
+            return 0
+    return inserted
+
+
+def _query_logs(sql, params=()):
+    if _DB_CONN is None:
+        return pd.DataFrame()
+    with _DB_LOCK:
+        return pd.read_sql_query(sql, _DB_CONN, params=params)
+
+
+def get_template_patterns():
+    """
+    Padrões acumulados no registro de templates (todas as ingestões, mesmas
+    colunas de generate_log_patterns), sem reagrupar as linhas.
+    """
+    if _DB_CONN is None:
+        return pd.DataFrame()
+    templates = _query_logs("SELECT template_id, template, count, first_seen, last_seen, example_message, log_level FROM log_templates")
+    sources = _query_logs("SELECT template_id, source, count FROM log_template_sources")
+    return template_registry.patterns_frame(templates, sources)
+
+
+def get_template_incidents():
+    """Incidentes acumulados no registro de templates (mesmas colunas de group_incidents)."""
+    return template_registry.incidents_frame(get_template_patterns())
 
 
 def get_collected_logs(limit=50000):
     """Recupera logs armazenados localmente para análise."""
-    return pd.DataFrame()
+    if _STORE_CLIENT is not None:
+        return _store_service_call('get_logs', pd.DataFrame(), limit)
+    df = _query_logs("SELECT timestamp, source, message FROM logs ORDER BY timestamp DESC LIMIT ?", (int(limit),))
+    return df.iloc[::-1].reset_index(drop=True)
 
 
 def clean_old_logs(retention_days=30):
@@ -113,20 +302,102 @@ def clean_old_logs(retention_days=30):
     [Pipeline] Política de Retenção: Remove logs mais antigos que X dias.
     Garante eficiência de armazenamento e indexação.
     """
-    return 0
+    if _STORE_CLIENT is not None:
+        return _store_service_call('clean', 0, retention_days)
+    if _DB_CONN is None:
+        return 0
+    # Timestamps são gravados em UTC (ver _normalize_db_timestamps): o corte também é em UTC
+    cutoff = _db_timestamp(pd.Timestamp(utc_now_ns()) - pd.Timedelta(days=retention_days))
+    with _DB_LOCK:
+        try:
+            with _DB_CONN:
+                cursor = _DB_CONN.execute("DELETE FROM logs WHERE timestamp < ?", (cutoff,))
+        except sqlite3.Error as e:
+            print(f"❌ Erro ao aplicar a retenção no banco: {e}")
+            return 0
+    return cursor.rowcount
 
 
 def search_logs_in_db(query=None, start_date=None, end_date=None, source=None, limit=10000):
     """
     [Busca Avançada] Realiza queries otimizadas diretamente no banco de dados.
     Permite filtrar grandes volumes de dados sem carregar tudo na memória.
-    """
-    return pd.DataFrame()
+    A query tem a mesma semântica da busca em memória (search_index.parse_query):
+    AND/OR/NOT explícitos, parênteses e "frases", com cada termo buscado como
+    substring (LIKE; "error" encontra "TimeoutError"). O FTS5 só escolhe as
+    linhas candidatas dos termos com várias palavras; consultas que não são
+    expressões válidas são tratadas inteiras como substring.
+    """
+    if _STORE_CLIENT is not None:
+        return _store_service_call('search', pd.DataFrame(), query, start_date, end_date, source, limit)
+    if _DB_CONN is None:
+        return pd.DataFrame()
+    where, params = [], []
+    if start_date:
+        where.append("l.timestamp >= ?")
+        params.append(_db_timestamp(utc_timestamp(start_date)))
+    if end_date:
+        # Data fim inclusiva (o date_input entrega só o dia)
+        end = utc_timestamp(end_date)
+        if end == end.normalize():
+            end += pd.Timedelta(days=1)
+            where.append("l.timestamp < ?")
+        else:
+            where.append("l.timestamp <= ?")
+        params.append(_db_timestamp(end))
+    if source and source != "Todos":
+        where.append("l.source = ?")
+        params.append(source)
+
+    def run(text_clause, text_params, join=""):
+        clauses = where + ([text_clause] if text_clause else [])
+        sql = f"SELECT l.timestamp, l.source, l.message FROM logs l {join}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY l.timestamp DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        found = _query_logs(sql, params + text_params)
+        if not found.empty:
+            # Gravados já normalizados (SQLITE_TS_FORMAT): o formato vem do cache, sem inferência
+            found['timestamp_ns'] = parse_timestamps_ns(found['timestamp'])
+        return found
+
+    if not query:
+        return run(None, [])
+    tree = search_index.parse_query(query)
+    clause, text_params = _sql_text_clause(tree if tree is not None else ('term', query))
+    return run(clause, text_params)
+
+
+def _sql_text_clause(tree):
+    """Traduz a árvore de search_index.parse_query para SQL: cada termo é substring (LIKE)."""
+    kind = tree[0]
+    if kind in ('and', 'or'):
+        parts = [_sql_text_clause(child) for child in tree[1]]
+        sql = f" {kind.upper()} ".join(f"({clause})" for clause, _ in parts)
+        return sql, [p for _, params in parts for p in params]
+    if kind == 'not':
+        clause, params = _sql_text_clause(tree[1])
+        return f"NOT ({clause})", params
+    text = tree[1].strip('*')
+    like = "l.message LIKE ? ESCAPE '\\'"
+    params = ['%' + re.sub(r'([%_\\])', r'\\\1', text) + '%']
+    tokens = search_index.tokenize(text)
+    if _DB_HAS_FTS and len(tokens) > 1:
+        # Numa substring com várias palavras, as do meio são tokens inteiros e a última
+        # é prefixo de um token: o FTS5 escolhe as candidatas e o LIKE confirma
+        match = ' AND '.join([f'"{t}"' for t in tokens[1:-1]] + [f'"{tokens[-1]}"*'])
+        return f"l.id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?) AND {like}", [match] + params
+    return like, params
 
 
 def get_unique_sources_from_db():
     """Retorna lista de sources únicos indexados no banco para filtros rápidos."""
-    return []
+    if _STORE_CLIENT is not None:
+        return _store_service_call('sources', [])
+    df = _query_logs("SELECT DISTINCT source FROM logs ORDER BY source")
+    return [] if df.empty else df['source'].tolist()
 
 
 def is_scheduler_running():
@@ -235,7 +506,12 @@ init_db()
 
 
 def load_config(config_path='config.json'):
-    """Carrega o arquivo de configuração de forma segura."""
+    """
+    Carrega o arquivo de configuração de forma segura.
+    O conteúdo e o plano de categorização compilado ficam em cache até o
+    arquivo mudar (mtime), então reruns do dashboard e ciclos do scheduler
+    não releem nem recompilam nada.
+    """
     # Lista de caminhos possíveis para tentar encontrar o config
     possible_paths = [
         config_path,
@@ -248,9 +524,7 @@ def load_config(config_path='config.json'):
     for path in possible_paths:
         if os.path.exists(path):
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return config, None
+                return load_config_file(path), None
             except json.JSONDecodeError:
                 return None, f"Erro: O arquivo '{path}' não é um JSON válido."
             except Exception as e:
@@ -264,10 +538,8 @@ def parse_log_entry(message):
     Parses a log message, which can be a JSON string or plain text.
     Returns a dictionary with extracted data.
     """
-    try:
-        return json.loads(message)
-    except (json.JSONDecodeError, TypeError):
-        return {'message_text': str(message)}
+    parsed = json_loads(message) if isinstance(message, (str, bytes)) else None
+    return parsed if parsed is not None else {'message_text': str(message)}
 
 
 def categorize_log(log_data, config):
@@ -277,6 +549,7 @@ def categorize_log(log_data, config):
     if not config or 'categories' not in config:
         return 'Não configurado'
 
+    plan = get_categorization_engine(config)
     text_to_search = ''
     log_level_to_check = ''
     if 'message_text' in log_data:
@@ -285,16 +558,9 @@ def categorize_log(log_data, config):
         text_to_search = (log_data.get('Message', '') + ' ' + log_data.get('Category', '')).lower()
         log_level_to_check = log_data.get('LogLevel', '').lower()
 
-    for category in config['categories']:
-        if 'log_levels' in category and log_level_to_check in category['log_levels']:
-            return category['name']
-        
-        if 'keywords' in category:
-            for keyword in category['keywords']:
-                if keyword.lower() in text_to_search:
-                    return category['name']
-
-    return 'Não categorizado'
+    bits, _, _ = plan.scan([text_to_search])
+    code = plan.assign_categories(bits, [log_level_to_check])[0]
+    return plan.category_names[code]
 
 
 def extract_log_level(log_data):
@@ -319,13 +585,56 @@ def extract_log_level(log_data):
     return 'Não Identificado'
 
 
-def process_log_data(df, config):
+# Tabelas de códigos estáveis das colunas categóricas: níveis conhecidos têm
+# sempre o mesmo código; níveis extras (vindos de JSON) entram ordenados no fim.
+LOG_LEVEL_CATEGORIES = ['Critical', 'Debug', 'Error', 'Fail', 'Fatal', 'Info', 'Warning', 'Não identificado']
+CATEGORICAL_COLUMNS = ['source', 'category', 'log_level']
+DEFAULT_PROCESSING_WORKERS = 1      # Varredura em paralelo é opcional (PROCESSING_WORKERS > 1)
+
+try:
+    import pyarrow  # noqa: F401
+    MESSAGE_DTYPE = 'string[pyarrow]'   # Texto em buffer Arrow contíguo, sem um objeto Python por linha
+except ImportError:
+    MESSAGE_DTYPE = object
+
+
+def _as_categorical(values, categories):
+    """Converte para categórico com a tabela `categories` + valores extras ordenados no fim."""
+    values = pd.Series(values)
+    extras = sorted(set(values.dropna().unique()) - set(categories), key=str)
+    return pd.Categorical(values, categories=list(categories) + extras)
+
+
+def drop_unused_categories(df):
+    """
+    Remove das colunas categóricas as categorias sem nenhuma linha (ex.: após
+    um filtro), para que value_counts/groupby não listem grupos vazios.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
+
+
+def get_processing_workers():
+    """Processos usados pela varredura de categorização (configuração PROCESSING_WORKERS, padrão 1)."""
+    try:
+        return max(1, int(get_setting("PROCESSING_WORKERS", DEFAULT_PROCESSING_WORKERS) or 1))
+    except (TypeError, ValueError):
+        return DEFAULT_PROCESSING_WORKERS
+
+
+def process_log_data(df, config, workers=None):
     """
     Processes a DataFrame of logs, categorizes them, and returns the results.
     Optimized for performance using vectorized operations.
+    source, category e log_level saem como categóricos (códigos + tabela
+    pequena) e message como string Arrow quando o pyarrow está disponível.
+    workers > 1 (ou PROCESSING_WORKERS) divide a varredura das mensagens em
+    faixas de linhas processadas em paralelo; o resultado é o mesmo.
     """
     if df.empty:
-        return pd.DataFrame(columns=['timestamp', 'source', 'message', 'category', 'log_level', 'message_length']), {}
+        return pd.DataFrame(columns=['timestamp', 'source', 'message', 'category', 'log_level', 'message_length', 'timestamp_ns']), {}
 
     if not config:
         raise ValueError("A configuração para categorização é inválida.")
@@ -351,68 +660,61 @@ def process_log_data(df, config):
     # 1. Calculate Message Length (Vectorized)
     df_proc['message_length'] = df_proc['message'].str.len()
 
-    # 2. Extract Log Level (Vectorized)
-    # Default
-    df_proc['log_level'] = 'Não Identificado'
-    
-    # Strategy A: Regex for "LogLevel": "Value" (Common in JSON logs)
-    log_level_pattern = r'(?i)"?LogLevel"?\s*[:=]\s*"?(\w+)"?'
-    extracted_levels = df_proc['message'].astype(str).str.extract(log_level_pattern, expand=False)
-    
-    if extracted_levels is not None:
-        df_proc['log_level'] = extracted_levels.fillna('Não Identificado')
-
-    # Strategy B: Keyword search for those still unidentified
-    msg_lower = df_proc['message'].str.lower()
-    mask_unknown = df_proc['log_level'] == 'Não Identificado'
-    
-    keywords_map = {
-        'fail:': 'Fail',
-        'error:': 'Error',
-        'exception': 'Error',
-        'critical:': 'Critical',
-        'fatal:': 'Fatal',
-        'warning:': 'Warning',
-        'debug:': 'Debug',
-        'info:': 'Info'
-    }
-    
-    for key, label in keywords_map.items():
-        mask_hit = mask_unknown & msg_lower.str.contains(re.escape(key), regex=True)
-        df_proc.loc[mask_hit, 'log_level'] = label
-        mask_unknown = mask_unknown & (~mask_hit)
+    # 2 e 3. Log Level e Categoria: uma única passada do motor compilado
+    # (Aho–Corasick sobre todas as keywords do config e de nível, em cache pelo hash do config)
+    engine = get_categorization_engine(config)
+    workers = get_processing_workers() if workers is None else workers
+    messages = df_proc['message'].tolist()
+    keyword_bits, level_hits, has_loglevel = engine.scan(messages, workers=workers)
+
+    # Logs estruturados: o JSON é decodificado uma vez e os campos conhecidos viram colunas
+    _, json_columns = extract_json_fields(messages)
+    log_level = pd.Series('Não Identificado', index=df_proc.index, dtype=object)
+    json_levels = json_columns.pop('json_log_level', None)
+    if json_levels is not None:
+        json_levels = pd.Series(json_levels, index=df_proc.index)
+        valid = json_levels.str.fullmatch(r'\w+', na=False)
+        log_level[valid] = json_levels[valid]
+
+    # Strategy A: Regex for "LogLevel": "Value" (texto não JSON), só nas linhas que citam LogLevel
+    regex_rows = has_loglevel & (log_level == 'Não Identificado').to_numpy()
+    if regex_rows.any():
+        log_level_pattern = r'(?i)"?LogLevel"?\s*[:=]\s*"?(\w+)"?'
+        extracted_levels = df_proc['message'][regex_rows].str.extract(log_level_pattern, expand=False)
+        log_level[extracted_levels.index] = extracted_levels.fillna('Não Identificado')
+
+    # Strategy B: Keyword search for those still unidentified (prioridade da ordem de LEVEL_KEYWORDS)
+    mask_unknown = (log_level == 'Não Identificado').to_numpy()
+    log_level[mask_unknown] = engine.level_from_keywords(level_hits[mask_unknown], 'Não Identificado')
 
     # Normalize Log Level casing
-    df_proc['log_level'] = df_proc['log_level'].astype(str).str.capitalize()
-
-    # 3. Categorization (Vectorized)
-    df_proc['category'] = 'Não categorizado'
-    
-    if 'categories' in config:
-        for cat in config['categories']:
-            cat_name = cat['name']
-            cat_mask = pd.Series(False, index=df_proc.index)
-            
-            if 'log_levels' in cat:
-                target_levels = [l.lower() for l in cat['log_levels']]
-                if target_levels:
-                    cat_mask |= df_proc['log_level'].astype(str).str.lower().isin(target_levels)
-            
-            keywords = cat.get('keywords', [])
-            if keywords:
-                pattern = '|'.join(map(re.escape, keywords))
-                cat_mask |= df_proc['message'].astype(str).str.contains(pattern, case=False, regex=True, na=False)
-            
-            # Apply category only to rows that are currently 'Não categorizado' (Priority: First match wins)
-            update_mask = (df_proc['category'] == 'Não categorizado') & cat_mask
-            df_proc.loc[update_mask, 'category'] = cat_name
+    df_proc['log_level'] = _as_categorical(log_level.str.capitalize(), LOG_LEVEL_CATEGORIES)
+    level_lower = df_proc['log_level'].str.lower()    # Em categóricos, .str roda só sobre a tabela de categorias
+
+    # Categoria: primeira do config (prioridade) que casar por nível ou keyword
+    category_codes = engine.assign_categories(keyword_bits, level_lower)
+    df_proc['category'] = pd.Categorical.from_codes(category_codes, categories=engine.category_names)
+    if 'source' in df_proc.columns:
+        df_proc['source'] = df_proc['source'].astype('category')
+    df_proc['message'] = df_proc['message'].astype(MESSAGE_DTYPE)
+    for col, values in json_columns.items():
+        df_proc[col] = values
+
+    # Timestamp normalizado uma única vez (int64 ns, UTC; formato em cache pela forma do texto).
+    # timestamp_ns que já venha na entrada (ex.: busca no armazenamento) é mantido
+    if 'timestamp_ns' in df_proc.columns:
+        df_proc['timestamp_ns'] = as_ns(df_proc['timestamp_ns'])
+    elif 'timestamp' in df_proc.columns:
+        df_proc['timestamp_ns'] = parse_timestamps_ns(df_proc['timestamp'])
+    else:
+        df_proc['timestamp_ns'] = NAT_NS
 
     # Select and reorder columns
     # Atualizado para preservar colunas de métricas vindas do Graylog (cpu_valor, mem_valor)
-    output_cols = ['timestamp', 'source', 'message', 'category', 'log_level', 'message_length']
+    output_cols = ['timestamp', 'source', 'message', 'category', 'log_level', 'message_length', 'timestamp_ns']
     
     # Preserva colunas extras se existirem no DF original
-    extra_cols = ['cpu_valor', 'mem_valor', 'container_name', 'image_name', 'RequestPath']
+    extra_cols = ['cpu_valor', 'mem_valor', 'container_name', 'image_name', 'RequestPath'] + list(json_columns)
     for col in extra_cols:
         if col in df_proc.columns:
             output_cols.append(col)
@@ -422,11 +724,30 @@ def process_log_data(df, config):
             df_proc[col] = None
             
     output_df = df_proc[output_cols]
-    category_counts = output_df['category'].value_counts().to_dict()
+    category_counts = output_df['category'].value_counts()
+    category_counts = category_counts[category_counts > 0].to_dict()
 
     return output_df, category_counts
 
 
+def process_log_stream(chunks, config, workers=None):
+    """
+    Versão em streaming do process_log_data para entradas maiores que a RAM.
+    Consome um iterador de DataFrames (ex.: pd.read_csv(..., chunksize=N)) e
+    gera (chunk processado, contagem acumulada por categoria); só um chunk
+    fica em memória por vez. O índice dos chunks continua o do anterior.
+    """
+    running_counts = {}
+    offset = 0
+    for chunk in chunks:
+        output_df, category_counts = process_log_data(chunk, config, workers)
+        output_df.index = pd.RangeIndex(offset, offset + len(output_df))
+        offset += len(output_df)
+        for category, count in category_counts.items():
+            running_counts[category] = running_counts.get(category, 0) + count
+        yield output_df, dict(running_counts)
+
+
 
 def generate_initial_prompt(log_message):
     """Gera o prompt inicial para análise de logs."""
@@ -544,10 +865,8 @@ def detect_volume_anomalies(df, time_window='1min', z_score_threshold=3):
     if 'timestamp' not in df.columns:
         return pd.DataFrame()
 
-    # Garante datetime
-    temp_df = df.copy()
-    temp_df['timestamp'] = pd.to_datetime(temp_df['timestamp'], errors='coerce')
-    temp_df = temp_df.dropna(subset=['timestamp'])
+    # Garante datetime (timestamp convertido uma vez por dataset)
+    temp_df = timestamp_frame(df)
     
     # Resample para contagem por intervalo
     volume_series = temp_df.set_index('timestamp').resample(time_window).size()
@@ -567,16 +886,15 @@ def detect_volume_anomalies(df, time_window='1min', z_score_threshold=3):
 def detect_rare_patterns(df, rarity_threshold=0.01):
     """
     Detecta padrões de logs raros (Anomaly Detection de texto).
-    Mascará números e datas para agrupar mensagens similares.
+    Agrupa mensagens similares pelo template minerado (números e ids variam).
     """
-    # Vectorized regex replacement is faster
-    df = df.copy()
-    df['pattern_signature'] = df['message'].astype(str).str.replace(NUM_PATTERN, '<NUM>', regex=True).str.slice(0, 100)
-    pattern_counts = df['pattern_signature'].value_counts(normalize=True)
+    # Template compartilhado (minerado uma vez por dataset)
+    template_ids = enrich(df)['template_id']
+    pattern_counts = template_ids.value_counts(normalize=True)
     
     # Retorna logs cujos padrões aparecem menos que o threshold (ex: 1%)
-    rare_signatures = pattern_counts[pattern_counts < rarity_threshold].index
-    rare_logs = df[df['pattern_signature'].isin(rare_signatures)].drop(columns=['pattern_signature'])
+    rare_templates = pattern_counts[pattern_counts < rarity_threshold].index
+    rare_logs = df[template_ids.isin(rare_templates).to_numpy()]
     
     return rare_logs
 
@@ -589,16 +907,24 @@ def extract_trace_ids(df):
     if df.empty:
         return df
     
+    # Campos da extração em passada única (por posição)
+    fields = enrich(df)['fields'].rows
+
     # Reset index to avoid alignment issues
     df = df.reset_index(drop=True)
     
-    # Use .values to avoid index alignment issues with duplicate indices
-    uuid_extract = df['message'].astype(str).str.extract(UUID_PATTERN, expand=False)
-    w3c_extract = df['message'].astype(str).str.extract(TRACE_ID_PATTERN, expand=False)
-    
-    # Combine using numpy where to handle conditional logic without index alignment risks
-    df['trace_id'] = np.where(uuid_extract.notna(), uuid_extract.values, w3c_extract.values)
-    
+    # TraceId já materializado do JSON (process_log_data) tem prioridade; UUID e TraceId W3C no resto
+    if 'trace_id' in df.columns:
+        trace_id = df['trace_id'].to_numpy(dtype=object, copy=True)
+    else:
+        trace_id = np.full(len(df), None, dtype=object)
+    missing = pd.isna(trace_id)
+
+    if missing.any():
+        uuid = fields['uuid'].to_numpy()
+        trace_id[missing] = np.where(pd.notna(uuid), uuid, fields['w3c_trace_id'].to_numpy())[missing]
+
+    df['trace_id'] = trace_id
     return df
 
 
@@ -610,7 +936,8 @@ def calculate_file_hash(file_content):
 def mask_sensitive_data(df):
     """
     Ofuscação dinâmica de dados sensíveis (LGPD).
-    Mascará CPFs, E-mails e IPs.
+    Mascará CPFs, E-mails e IPs. Devolve uma cópia: o DataFrame recebido (e
+    as colunas derivadas em cache dele) não é alterado.
     """
     df_masked = df.copy()
     # Vectorized replacements
@@ -630,29 +957,30 @@ def group_incidents(df):
     if df.empty:
         return pd.DataFrame()
 
+    enrichment = enrich(df)
+
     # 1. Filtra por Nível de Log explícito (Expandido)
     target_levels = ['Error', 'Fail', 'Critical', 'Fatal']
-    error_df = df[df['log_level'].isin(target_levels)].copy()
+    error_mask = df['log_level'].isin(target_levels).to_numpy()
     
-    # 2. Fallback: Se não encontrar por nível, busca por palavras-chave de erro
-    if error_df.empty:
-        keyword_mask = df['message'].astype(str).str.contains(r'error|fail|exception|critical|fatal|timeout|deadlock', case=False, regex=True)
-        error_df = df[keyword_mask].copy()
-        if error_df.empty:
+    # 2. Fallback: Se não encontrar por nível, busca por palavras-chave de erro (no texto já em minúsculas)
+    if not error_mask.any():
+        error_mask = enrichment['lower'].str.contains(r'error|fail|exception|critical|fatal|timeout|deadlock', regex=True).to_numpy()
+        if not error_mask.any():
             return pd.DataFrame()
 
-    # Vectorized signature generation
-    sigs = error_df['message'].astype(str).str.replace(NUM_PATTERN, '<NUM>', regex=True)
-    sigs = sigs.str.replace(UUID_PATTERN, '<UUID>', regex=True)
-    error_df['signature'] = sigs.str.slice(0, 150)
+    # Template compartilhado (minerado uma vez por dataset)
+    error_df = df[error_mask].copy()
+    error_df['template_id'] = enrichment.take('template_id', error_mask).to_numpy()
     
-    grouped = error_df.groupby('signature').agg(
+    grouped = error_df.groupby('template_id').agg(
         count=('timestamp', 'count'),
         first_seen=('timestamp', 'min'),
         last_seen=('timestamp', 'max'),
         example_message=('message', 'first'),
         sources=('source', lambda x: list(set(x))[:3]) # Top 3 sources
     ).reset_index()
+    grouped.insert(0, 'signature', enrichment.miner.templates_of(grouped['template_id']))
     
     return grouped.sort_values('count', ascending=False)
 
@@ -662,26 +990,23 @@ def extract_latency_metrics(df):
     Tenta extrair métricas de latência (ex: 'duration=50ms') dos logs.
     Log-to-Metrics.
     """
-    # Vectorized extraction
     work_df = df.reset_index(drop=True)
-    extracted = work_df['message'].astype(str).str.extract(LATENCY_PATTERN)
-    extracted.columns = ['value', 'unit']
-    
-    valid_mask = extracted['value'].notna()
+    # ElapsedMilliseconds do JSON (process_log_data) tem prioridade; latência do texto (já em ms) no resto
+    if 'elapsed_ms' in work_df.columns:
+        latency = work_df['elapsed_ms'].to_numpy(dtype=np.float64, copy=True)
+    else:
+        latency = np.full(len(work_df), np.nan)
+    missing = np.isnan(latency)
+
+    if missing.any():
+        latency[missing] = enrich(df)['fields'].rows['latency_ms'].to_numpy()[missing]
+
+    valid_mask = ~np.isnan(latency)
     if not valid_mask.any():
         return pd.DataFrame()
-        
+
     result = work_df.loc[valid_mask, ['timestamp', 'source']].copy()
-    result['latency_ms'] = extracted.loc[valid_mask, 'value'].astype(float)
-    
-    # Convert seconds to ms
-    s_mask = extracted.loc[valid_mask, 'unit'] == 's'
-    result.loc[s_mask, 'latency_ms'] *= 1000
-    
-    # Convert microseconds to ms
-    us_mask = extracted.loc[valid_mask, 'unit'].isin(['us', 'µs'])
-    result.loc[us_mask, 'latency_ms'] /= 1000
-    
+    result['latency_ms'] = latency[valid_mask]
     return result
 
 
@@ -701,7 +1026,7 @@ def detect_bottlenecks(df, threshold_ms=1000):
         return pd.DataFrame()
 
     # Agrupa por source para identificar ofensores frequentes
-    bottlenecks = slow_logs.groupby('source').agg(
+    bottlenecks = slow_logs.groupby('source', observed=True).agg(
         slow_count=('latency_ms', 'count'),
         avg_latency=('latency_ms', 'mean'),
         max_latency=('latency_ms', 'max'),
@@ -717,11 +1042,16 @@ def generate_stack_trace_metrics(df):
     Retorna um DataFrame com 'stack_trace', 'count' e 'depth'.
     """
     # Filtra logs de erro e Warning (ampliando escopo para capturar traces em warnings)
-    error_df = df[df['log_level'].isin(['Error', 'Fail', 'Critical', 'Fatal', 'Warning'])]
+    error_mask = df['log_level'].isin(['Error', 'Fail', 'Critical', 'Fatal', 'Warning']).to_numpy()
     
-    if error_df.empty:
+    if not error_mask.any():
         return pd.DataFrame()
 
+    enrichment = enrich(df)
+    messages = enrichment.take('text', error_mask).tolist()
+    sources = df['source'][error_mask].tolist() if 'source' in df.columns else ['Unknown'] * len(messages)
+    signatures = None   # Assinaturas mascaradas, só se alguma linha cair no fallback
+
     # Regex para capturar linhas de stack trace (Python e Java/Generic)
     # Python: File "...", line X, in method
     # Java: at package.Class.method(...)
@@ -732,10 +1062,8 @@ def generate_stack_trace_metrics(df):
     stack_counts = {}
     
     # Itera sobre as linhas para ter acesso ao 'source' para o fallback
-    for row in error_df.itertuples(index=False):
-        msg = getattr(row, 'message', '')
-        source = getattr(row, 'source', 'Unknown')
-        msg_str = str(msg).replace('\\n', '\n').replace('\\r', '')
+    for i, (msg, source) in enumerate(zip(messages, sources)):
+        msg_str = msg.replace('\\n', '\n').replace('\\r', '')
         
         matches = stack_pattern.findall(msg_str)
         if matches:
@@ -787,8 +1115,10 @@ def generate_stack_trace_metrics(df):
         else:
             # FALLBACK: Se não encontrar stack trace, usa a mensagem agrupada como "trace"
             # Isso garante que o gráfico mostre a distribuição de erros mesmo sem traces formais
-            # Limpa números e UUIDs para agrupar mensagens similares
-            clean_msg = re.sub(r'\d+', '<NUM>', msg_str)
+            # Limpa números e UUIDs para agrupar mensagens similares (assinatura compartilhada)
+            if signatures is None:
+                signatures = enrichment.take('signature', error_mask).tolist()
+            clean_msg = signatures[i].replace('\\n', '\n').replace('\\r', '')
             clean_msg = re.sub(r'([a-f0-9-]{36})', '<UUID>', clean_msg)
             short_msg = clean_msg.strip()[:80] # Limita tamanho
             
@@ -850,32 +1180,29 @@ def extract_api_metrics(df):
     if df.empty:
         return pd.DataFrame()
 
+    # Método + Endpoint, RequestPath (SignalR/Blazor) e Status Code da extração em passada única
+    fields = enrich(df)['fields'].rows
     work_df = df.reset_index(drop=True)
 
-    # Regex otimizado para Método e Path
-    # Captura: Método (Grupo 1) + Espaço + Endpoint (Grupo 2)
-    method_path_pattern = r'(GET|POST|PUT|DELETE|PATCH|HEAD|OPTIONS)\s+([^\s?]+)'
-    # Regex para RequestPath (SignalR/Blazor) - Case Insensitive
-    request_path_pattern = r'RequestPath[:=]\s*([^\s,"]+)'
-    
-    # Regex para Status Code (3 dígitos entre 100-599)
-    status_pattern = r'(?:^|\s|status[:=]\s*)([1-5]\d{2})(?:\s|$)'
-
-    df_str = work_df['message'].astype(str)
-    extracted_mp = df_str.str.extract(method_path_pattern, flags=re.IGNORECASE)
-    extracted_rp = df_str.str.extract(request_path_pattern, flags=re.IGNORECASE)
-    extracted_status = df_str.str.extract(status_pattern, flags=re.IGNORECASE)
+    # RequestPath já materializado do JSON (process_log_data) tem prioridade; o do texto no resto
+    if 'request_path' in work_df.columns:
+        request_path = work_df['request_path'].astype(object)
+        missing = request_path.isna()
+        if missing.any():
+            request_path[missing] = fields['request_path'][missing]
+    else:
+        request_path = fields['request_path']
     
     result = work_df[['timestamp', 'source']].copy()
-    result['method'] = extracted_mp[0].str.upper()
-    result['endpoint'] = extracted_mp[1]
+    result['method'] = fields['method'].to_numpy()
+    result['endpoint'] = fields['endpoint'].to_numpy()
     
     # Fallback: Se não achou método HTTP padrão, mas achou RequestPath (SignalR)
-    mask_rp = result['endpoint'].isna() & extracted_rp[0].notna()
-    result.loc[mask_rp, 'endpoint'] = extracted_rp.loc[mask_rp, 0]
+    mask_rp = result['endpoint'].isna() & request_path.notna()
+    result.loc[mask_rp, 'endpoint'] = request_path[mask_rp]
     result.loc[mask_rp, 'method'] = 'RPC' # Classifica como RPC/SignalR
     
-    result['status_code'] = extracted_status[0]
+    result['status_code'] = fields['status_code'].to_numpy()
     
     # Retorna apenas linhas que tenham pelo menos o método identificado
     return result.dropna(subset=['method'], how='any')
@@ -924,21 +1251,23 @@ def extract_cicd_metrics(df):
 
 def analyze_security_threats(df):
     """Análise simples de segurança (SIEM). Extrai IPs e verifica volume de erros."""
-    # Vectorized IP extraction
-    work_df = df.reset_index(drop=True)
-    ips_series = work_df['message'].astype(str).str.findall(IP_PATTERN)
-    exploded = ips_series.explode()
-    exploded = exploded.dropna()
+    # IPs da extração em passada única (uma linha por ocorrência)
+    ips = enrich(df)['fields'].ips
     
-    if exploded.empty:
+    if ips.empty:
         return pd.DataFrame()
         
-    sec_df = work_df.loc[exploded.index, ['timestamp', 'log_level', 'source']].copy()
-    sec_df['ip'] = exploded.values
+    work_df = df.reset_index(drop=True)
+    sec_df = work_df.loc[ips['row'].to_numpy(), ['timestamp', 'log_level', 'source']].copy()
+    sec_df['ip'] = ips['ip'].to_numpy()
+    sec_df['is_error'] = sec_df['log_level'].isin(['Error', 'Fail'])
         
-    ip_stats = sec_df.groupby('ip').agg(total_logs=('timestamp', 'count'), error_count=('log_level', lambda x: x.isin(['Error', 'Fail']).sum())).reset_index()
+    ip_stats = sec_df.groupby('ip').agg(total_logs=('timestamp', 'count'), error_count=('is_error', 'sum')).reset_index()
     ip_stats['error_rate'] = ip_stats['error_count'] / ip_stats['total_logs']
-    ip_stats['status'] = ip_stats.apply(lambda x: '🔴 Crítico' if x['error_rate'] > 0.5 and x['total_logs'] > 5 else ('🟡 Suspeito' if x['error_rate'] > 0.2 else '🟢 Normal'), axis=1)
+    ip_stats['status'] = np.select(
+        [(ip_stats['error_rate'] > 0.5) & (ip_stats['total_logs'] > 5), ip_stats['error_rate'] > 0.2],
+        ['🔴 Crítico', '🟡 Suspeito'], default='🟢 Normal'
+    )
     return ip_stats.sort_values('error_count', ascending=False)
 
 
@@ -947,31 +1276,29 @@ def simulate_alerts(df, latency_threshold=None, keyword=None, log_levels=None):
     Simula regras de alerta baseadas em latência, palavras-chave e nível de log.
     Retorna o DataFrame filtrado com os logs que disparariam o alerta.
     """
-    triggered_logs = df.copy()
+    enrichment = enrich(df)
+    mask = np.ones(len(df), dtype=bool)
     
     # 1. Filtro por Nível de Log
     if log_levels:
-        triggered_logs = triggered_logs[triggered_logs['log_level'].isin(log_levels)]
+        mask &= df['log_level'].isin(log_levels).to_numpy()
         
     # 2. Filtro por Palavra-chave
     if keyword:
-        triggered_logs = triggered_logs[triggered_logs['message'].astype(str).str.contains(keyword, case=False, na=False)]
+        mask[mask] = enrichment.take('text', mask).str.contains(keyword, case=False, na=False).to_numpy()
         
+    triggered_logs = df[mask].copy()
+
     # 3. Filtro por Latência
     if latency_threshold is not None and latency_threshold > 0:
-        # Reutiliza lógica de extração de latência linha a linha
-        def get_latency(msg):
-            match = LATENCY_PATTERN.search(str(msg))
-            if match:
-                value = float(match.group(1))
-                unit = match.group(2)
-                if unit == 's': value *= 1000
-                elif unit in ['us', 'µs']: value /= 1000
-                return value
-            return -1 # Valor negativo para indicar que não tem latência
-            
-        # Aplica a extração e filtra
-        triggered_logs['latency_ms'] = triggered_logs['message'].apply(get_latency)
+        # ElapsedMilliseconds do JSON primeiro; a latência do texto (extração em passada única) no resto
+        if 'elapsed_ms' in triggered_logs.columns:
+            latency = triggered_logs['elapsed_ms'].to_numpy(dtype=np.float64, copy=True)
+        else:
+            latency = np.full(len(triggered_logs), np.nan)
+        missing = np.isnan(latency)
+        latency[missing] = enrichment['fields'].rows['latency_ms'].to_numpy()[mask][missing]
+        triggered_logs['latency_ms'] = latency
         triggered_logs = triggered_logs[triggered_logs['latency_ms'] > latency_threshold]
         
     return triggered_logs
@@ -985,24 +1312,20 @@ def generate_log_patterns(df):
     if df.empty:
         return pd.DataFrame()
 
-    df_patterns = df.copy()
-    
-    # Vectorized masking
-    sigs = df_patterns['message'].astype(str)
-    sigs = sigs.str.replace(NUM_PATTERN, '[NUM]', regex=True)
-    sigs = sigs.str.replace(UUID_PATTERN, '[UUID]', regex=True)
-    sigs = sigs.str.replace(IP_PATTERN, '[IP]', regex=True)
-    sigs = sigs.str.replace(EMAIL_PATTERN, '[EMAIL]', regex=True)
-    df_patterns['signature'] = sigs.str.slice(0, 200)
+    # Template compartilhado (minerado uma vez por dataset)
+    enrichment = enrich(df)
+    df_patterns = df.assign(template_id=enrichment['template_id'].to_numpy())
     
-    patterns = df_patterns.groupby('signature').agg(
+    patterns = df_patterns.groupby('template_id').agg(
         count=('timestamp', 'count'),
         first_seen=('timestamp', 'min'),
         last_seen=('timestamp', 'max'),
         example_message=('message', 'first'),
         log_level=('log_level', 'first'),
         sources=('source', lambda x: list(set(x)))
-    ).reset_index().sort_values(['count', 'first_seen'], ascending=[False, True])
+    ).reset_index()
+    patterns.insert(0, 'signature', enrichment.miner.templates_of(patterns['template_id']))
+    patterns = patterns.sort_values(['count', 'first_seen'], ascending=[False, True])
     
     patterns['percent'] = (patterns['count'] / len(df)) * 100
     return patterns
@@ -1019,20 +1342,24 @@ def infer_service_dependencies(df):
     # OTIMIZAÇÃO: Priority Sampling se o dataset for muito grande (>50k)
     # Mantém todos os logs de erro (Error/Fail) e faz a amostragem apenas nos logs Info.
     limit = 50000
-    working_df = df
+    positions = np.arange(len(df))
     
     if len(df) > limit:
-        priority_mask = df['log_level'].isin(['Error', 'Fail', 'Critical', 'Fatal'])
-        priority_df = df[priority_mask]
-        other_df = df[~priority_mask]
+        priority_mask = df['log_level'].isin(['Error', 'Fail', 'Critical', 'Fatal']).to_numpy()
+        priority_pos = positions[priority_mask]
+        other_pos = positions[~priority_mask]
         
-        if len(priority_df) >= limit:
-            working_df = priority_df.sample(limit)
+        if len(priority_pos) >= limit:
+            positions = pd.Series(priority_pos).sample(limit).to_numpy()
         else:
-            working_df = pd.concat([priority_df, other_df.sample(limit - len(priority_df))])
+            positions = np.concatenate([priority_pos, pd.Series(other_pos).sample(limit - len(priority_pos)).to_numpy()])
 
     # Reset index to avoid shape mismatch in vectorized operations
-    working_df = working_df.reset_index(drop=True)
+    working_df = df.iloc[positions].reset_index(drop=True)
+    sampled = np.zeros(len(df), dtype=bool)
+    sampled[positions] = True
+    sources = df['source'].to_numpy(dtype=object)
+    fields = enrich(df)['fields']
 
     all_edges_list = []
 
@@ -1055,33 +1382,18 @@ def infer_service_dependencies(df):
             edges = edges[edges['source'] != edges['target']]
             all_edges_list.append(edges)
 
-    # 2. External Dependencies (IPs)
-    # OTIMIZAÇÃO: Filtra mensagens que possuem dígitos antes de aplicar regex de IP
-    ip_mask = working_df['message'].astype(str).str.contains(r'\d', regex=True)
-    ip_matches = working_df.loc[ip_mask, 'message'].astype(str).str.findall(IP_PATTERN)
-    ip_exploded = ip_matches.explode().dropna()
-    
-    if not ip_exploded.empty:
-        ip_edges = pd.DataFrame({
-            'source': working_df.loc[ip_exploded.index, 'source'].values,
-            'target': ip_exploded.values
+    # 2/3. External Dependencies (IPs e URLs/Domains) da extração em passada única, só nas linhas amostradas
+    for found, column in ((fields.ips, 'ip'), (fields.hosts, 'host')):
+        rows = found['row'].to_numpy()
+        in_sample = sampled[rows]
+        if not in_sample.any():
+            continue
+        ext_edges = pd.DataFrame({
+            'source': sources[rows[in_sample]],
+            'target': found[column].to_numpy()[in_sample]
         })
-        ip_edges = ip_edges[ip_edges['source'] != ip_edges['target']]
-        all_edges_list.append(ip_edges)
-
-    # 3. External Dependencies (URLs/Domains)
-    # OTIMIZAÇÃO: Filtra mensagens com 'http' antes de extrair
-    url_mask = working_df['message'].astype(str).str.contains(r'http', case=False, regex=True)
-    url_matches = working_df.loc[url_mask, 'message'].astype(str).str.findall(URL_PATTERN)
-    url_exploded = url_matches.explode().dropna()
-    
-    if not url_exploded.empty:
-        url_edges = pd.DataFrame({
-            'source': working_df.loc[url_exploded.index, 'source'].values,
-            'target': url_exploded.values
-        })
-        url_edges = url_edges[url_edges['source'] != url_edges['target']]
-        all_edges_list.append(url_edges)
+        ext_edges = ext_edges[ext_edges['source'] != ext_edges['target']]
+        all_edges_list.append(ext_edges)
 
     if not all_edges_list:
         return pd.DataFrame(columns=['source', 'target', 'count'])
@@ -1126,14 +1438,13 @@ def compare_log_datasets(df_main, df_ref):
     # 4. Novos Erros
     # Gera assinaturas para ambos
     def get_sigs(df):
-        if df.empty: return set()
-        # Reutiliza lógica de regex simples para assinatura
-        sigs = df['message'].astype(str).str.replace(NUM_PATTERN, '<NUM>', regex=True)
-        sigs = sigs.str.replace(UUID_PATTERN, '<UUID>', regex=True)
-        return set(sigs.unique())
+        error_mask = df['log_level'].isin(['Error', 'Fail']).to_numpy()
+        if not error_mask.any(): return set()
+        # Reutiliza a assinatura mascarada do dataset
+        return set(enrich(df).take('signature', error_mask).unique())
 
-    sigs_main = get_sigs(df_main[df_main['log_level'].isin(['Error', 'Fail'])])
-    sigs_ref = get_sigs(df_ref[df_ref['log_level'].isin(['Error', 'Fail'])])
+    sigs_main = get_sigs(df_main)
+    sigs_ref = get_sigs(df_ref)
     
     metrics['new_error_signatures'] = list(sigs_main - sigs_ref)
     
@@ -1180,12 +1491,10 @@ def generate_rca_prompt(df):
     total_errors = len(error_df)
     sources = list(error_df['source'].unique())[:5] # Top 5 sources afetados
     
-    # Garante que timestamp é datetime para calcular janela
-    if not pd.api.types.is_datetime64_any_dtype(error_df['timestamp']):
-        error_df['timestamp'] = pd.to_datetime(error_df['timestamp'], errors='coerce')
-    
-    min_t = error_df['timestamp'].min()
-    max_t = error_df['timestamp'].max()
+    # Janela do incidente pelo timestamp já convertido (timestamp_ns / cache do dataset)
+    stamps = enrich(error_df)['timestamp']
+    min_t = stamps.min()
+    max_t = stamps.max()
     
     # Gera padrões dos erros para resumir o problema
     patterns = generate_log_patterns(error_df).head(7)
@@ -1227,12 +1536,8 @@ def generate_volume_forecast(df, periods=60):
     if df.empty or 'timestamp' not in df.columns:
         return pd.DataFrame(), "Dados insuficientes", 0
 
-    # Garante datetime
-    temp_df = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(temp_df['timestamp']):
-        temp_df['timestamp'] = pd.to_datetime(temp_df['timestamp'], errors='coerce')
-    
-    temp_df = temp_df.dropna(subset=['timestamp'])
+    # Garante datetime (timestamp convertido uma vez por dataset)
+    temp_df = timestamp_frame(df)
 
     # Resample adaptativo: Se tiver pouco tempo de dados (< 5 min), usa granularidade de segundos
     duration_sec = (temp_df['timestamp'].max() - temp_df['timestamp'].min()).total_seconds()
@@ -1333,12 +1638,8 @@ def detect_log_periodicity(df):
     if df.empty or 'timestamp' not in df.columns:
         return []
 
-    # Garante datetime
-    temp_df = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(temp_df['timestamp']):
-        temp_df['timestamp'] = pd.to_datetime(temp_df['timestamp'], errors='coerce')
-    
-    temp_df = temp_df.dropna(subset=['timestamp'])
+    # Garante datetime (timestamp convertido uma vez por dataset)
+    temp_df = timestamp_frame(df)
     
     # Resample para minutos (frequência de amostragem = 1/min)
     # Preenche gaps com 0 para manter a linearidade do tempo
@@ -1644,21 +1945,18 @@ def get_context_logs(df, target_timestamp, source, window_seconds=300):
     if df.empty:
         return pd.DataFrame()
         
-    # Garante datetime
-    df_ctx = df.copy()
-    df_ctx['timestamp'] = pd.to_datetime(df_ctx['timestamp'], errors='coerce')
-    target_ts = pd.to_datetime(target_timestamp)
+    # Timestamp já convertido (timestamp_ns / cache do dataset), no mesmo eixo UTC do alvo
+    stamps = enrich(df)['timestamp'].to_numpy()
+    target_ts = utc_timestamp(target_timestamp)
     
     # Filtra por source e janela de tempo (+/- 5 min por padrão)
-    start_time = target_ts - pd.Timedelta(seconds=window_seconds)
-    end_time = target_ts + pd.Timedelta(seconds=window_seconds)
+    start_time = (target_ts - pd.Timedelta(seconds=window_seconds)).to_datetime64()
+    end_time = (target_ts + pd.Timedelta(seconds=window_seconds)).to_datetime64()
     
     # Filtra logs do mesmo source dentro da janela
-    context = df_ctx[
-        (df_ctx['source'] == source) & 
-        (df_ctx['timestamp'] >= start_time) & 
-        (df_ctx['timestamp'] <= end_time)
-    ]
+    mask = (df['source'] == source).to_numpy() & (stamps >= start_time) & (stamps <= end_time)
+    context = df[mask].copy()
+    context['timestamp'] = stamps[mask]
     return context.sort_values('timestamp')
 
 
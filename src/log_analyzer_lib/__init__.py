@@ -29,6 +29,7 @@ from .database import (
     search_logs_in_db,
     get_unique_sources_from_db,
     get_rum_stats,
+    get_rum_percentiles,
     get_all_cached_analyses,
     save_to_disk,
     load_from_disk
@@ -5,8 +5,8 @@ import pandas as pd
 import numpy as np
 import re
 
-NUM_PATTERN = re.compile(r'\d+')
-UUID_PATTERN = re.compile(r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})', re.IGNORECASE)
+from .template_miner import TemplateMiner
+from .enrichment import timestamp_frame
 
 def detect_volume_anomalies(df, time_window='1min', z_score_threshold=3):
     """
@@ -14,8 +14,8 @@ def detect_volume_anomalies(df, time_window='1min', z_score_threshold=3):
     """
     if 'timestamp' not in df.columns or df.empty: return pd.DataFrame()
     
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-    volume = df.set_index('timestamp').resample(time_window).size()
+    # Timestamp convertido uma vez por dataset (sem alterar o DataFrame de quem chamou)
+    volume = timestamp_frame(df).set_index('timestamp').resample(time_window).size()
     mean = volume.rolling(window=60, min_periods=1).mean()
     std = volume.rolling(window=60, min_periods=1).std()
     z_scores = (volume - mean) / std.replace(0, 1) # Evita divisão por zero
@@ -27,11 +27,10 @@ def detect_rare_patterns(df, rarity_threshold=0.01):
     Identifica padrões de log que ocorrem com baixa frequência, um sinal de anomalia.
     """
     if df.empty: return pd.DataFrame()
-    df = df.copy()
-    df['pattern_signature'] = df['message'].astype(str).str.replace(NUM_PATTERN, '<NUM>', regex=True).str.slice(0, 100)
-    counts = df['pattern_signature'].value_counts(normalize=True)
-    rare_sigs = counts[counts < rarity_threshold].index
-    return df[df['pattern_signature'].isin(rare_sigs)].drop(columns=['pattern_signature'])
+    template_ids = pd.Series(TemplateMiner().add_messages(df['message'].astype(str).to_numpy()))
+    counts = template_ids.value_counts(normalize=True)
+    rare_ids = counts[counts < rarity_threshold].index
+    return df[template_ids.isin(rare_ids).to_numpy()]
 
 def group_incidents(df):
     """Agrupa logs de erro similares em 'incidentes' para análise de causa raiz."""
@@ -40,16 +39,18 @@ def group_incidents(df):
     error_df = df[df['log_level'].isin(['Error', 'Fail', 'Critical', 'Fatal'])].copy()
     if error_df.empty: return pd.DataFrame()
 
-    sigs = error_df['message'].astype(str).str.replace(NUM_PATTERN, '<NUM>', regex=True)
-    error_df['signature'] = sigs.str.replace(UUID_PATTERN, '<UUID>', regex=True).str.slice(0, 150)
+    miner = TemplateMiner()     # Minerador do dataset: a análise não treina o do processo
+    error_df['template_id'] = miner.add_messages(error_df['message'].astype(str).to_numpy())
     
-    return error_df.groupby('signature').agg(
+    grouped = error_df.groupby('template_id').agg(
         count=('timestamp', 'size'),
         first_seen=('timestamp', 'min'),
         last_seen=('timestamp', 'max'),
         example_message=('message', 'first'),
         sources=('source', lambda x: list(set(x))[:3])
-    ).reset_index().sort_values('count', ascending=False)
+    ).reset_index()
+    grouped.insert(0, 'signature', miner.templates_of(grouped['template_id']))
+    return grouped.sort_values('count', ascending=False)
 
 def generate_volume_forecast(df, periods=60):
     """
@@ -58,12 +59,8 @@ def generate_volume_forecast(df, periods=60):
     if df.empty or 'timestamp' not in df.columns:
         return pd.DataFrame(), "Dados insuficientes", 0
 
-    # Garante datetime
-    temp_df = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(temp_df['timestamp']):
-        temp_df['timestamp'] = pd.to_datetime(temp_df['timestamp'], errors='coerce')
-    
-    temp_df = temp_df.dropna(subset=['timestamp'])
+    # Garante datetime (timestamp convertido uma vez por dataset)
+    temp_df = timestamp_frame(df)
 
     # Resample adaptativo
     duration_sec = (temp_df['timestamp'].max() - temp_df['timestamp'].min()).total_seconds()
@@ -115,10 +112,7 @@ def detect_log_periodicity(df):
     """
     if df.empty or 'timestamp' not in df.columns: return []
 
-    temp_df = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(temp_df['timestamp']):
-        temp_df['timestamp'] = pd.to_datetime(temp_df['timestamp'], errors='coerce')
-    temp_df = temp_df.dropna(subset=['timestamp'])
+    temp_df = timestamp_frame(df)
     
     duration_sec = (temp_df['timestamp'].max() - temp_df['timestamp'].min()).total_seconds()
     rule, d_val = ('5S', 5.0/60.0) if duration_sec < 300 else ('T', 1.0)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Filtro de Bloom escalável para a deduplicação dos logs.
+
+Cada partição temporal mantém um filtro sobre os digests MD5 dos seus logs.
+O filtro responde "com certeza não existe" para a grande maioria dos logs novos,
+então os digests completos (mapeados do snapshot) só são consultados nos
+positivos. Por ser escalável, o filtro cresce em estágios sem precisar saber
+de antemão quantos logs a partição vai receber, mantendo a taxa de falsos
+positivos total abaixo da configurada.
+"""
+import os
+import math
+import numpy as np
+
+DEFAULT_FP_RATE = 0.001
+DEFAULT_INITIAL_CAPACITY = 4096
+GROWTH = 2              # Cada estágio novo tem o dobro da capacidade do anterior
+TIGHTENING = 0.5        # ... e metade da taxa de falsos positivos
+
+
+def _digest_words(digests):
+    """Duas palavras de 64 bits por digest (o MD5 já é uniforme, dispensa outro hash)."""
+    data = np.ascontiguousarray(np.asarray(digests, dtype='S16'))
+    words = data.view(np.uint64).reshape(-1, 2)
+    # O segundo hash precisa ser ímpar para percorrer todas as posições
+    return words[:, 0], words[:, 1] | np.uint64(1)
+
+
+class _BloomStage:
+
+    def __init__(self, capacity, fp_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.num_bits = max(64, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8) if bits is None else bits
+        self.count = count
+
+    def _positions(self, h1, h2):
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, h1, h2):
+        pos = self._positions(h1, h2).ravel()
+        np.bitwise_or.at(self.bits, (pos >> np.uint64(3)).astype(np.int64), (1 << (pos & np.uint64(7))).astype(np.uint8))
+        self.count += len(h1)
+
+    def might_contain(self, h1, h2):
+        pos = self._positions(h1, h2)
+        hit = (self.bits[(pos >> np.uint64(3)).astype(np.int64)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1
+        return hit.all(axis=1)
+
+
+class ScalableBloomFilter:
+    """Sequência de filtros de Bloom com capacidade crescente (Almeida et al., 2007)."""
+
+    def __init__(self, fp_rate=DEFAULT_FP_RATE, initial_capacity=DEFAULT_INITIAL_CAPACITY):
+        self.fp_rate = fp_rate
+        self.initial_capacity = initial_capacity
+        self.stages = []
+
+    def _new_stage(self, min_capacity=0):
+        i = len(self.stages)
+        capacity = max(self.initial_capacity * GROWTH ** i, min_capacity)
+        stage = _BloomStage(capacity, self.fp_rate * (1 - TIGHTENING) * TIGHTENING ** i)
+        self.stages.append(stage)
+        return stage
+
+    def add_many(self, digests):
+        h1, h2 = _digest_words(digests)
+        start = 0
+        while start < len(h1):
+            stage = self.stages[-1] if self.stages else None
+            if stage is None or stage.count >= stage.capacity:
+                stage = self._new_stage(len(h1) - start if not self.stages else 0)
+            take = min(len(h1) - start, stage.capacity - stage.count)
+            stage.add(h1[start:start + take], h2[start:start + take])
+            start += take
+
+    def might_contain(self, digests):
+        """Vetor booleano: False garante que o digest nunca foi adicionado."""
+        h1, h2 = _digest_words(digests)
+        result = np.zeros(len(h1), dtype=bool)
+        for stage in self.stages:
+            pending = ~result
+            if not pending.any():
+                break
+            result[pending] = stage.might_contain(h1[pending], h2[pending])
+        return result
+
+    def memory_bytes(self):
+        return sum(stage.bits.nbytes for stage in self.stages)
+
+    def save(self, path):
+        arrays = {f'bits_{i}': stage.bits for i, stage in enumerate(self.stages)}
+        meta = [[stage.capacity, stage.fp_rate, stage.count] for stage in self.stages]
+        arrays['meta'] = np.array(meta, dtype=np.float64).reshape(-1, 3)
+        arrays['config'] = np.array([self.fp_rate, self.initial_capacity], dtype=np.float64)
+        with open(os.path.join(path, 'bloom.npz'), 'wb') as f:
+            np.savez(f, **arrays)
+
+    @staticmethod
+    def exists(path):
+        return path is not None and os.path.exists(os.path.join(path, 'bloom.npz'))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(os.path.join(path, 'bloom.npz')) as data:
+            fp_rate, initial_capacity = data['config'].tolist()
+            bloom = cls(fp_rate=fp_rate, initial_capacity=int(initial_capacity))
+            for i, (capacity, stage_fp, count) in enumerate(data['meta'].tolist()):
+                bloom.stages.append(_BloomStage(int(capacity), stage_fp, bits=data[f'bits_{i}'], count=int(count)))
+        return bloom
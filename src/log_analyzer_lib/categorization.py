@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de categorização em passada única.
+
+Todas as keywords do config.json (de todas as categorias) e as keywords de
+nível de log entram num único autômato Aho–Corasick: cada mensagem é
+percorrida uma vez e sai com o conjunto de categorias cujas keywords
+apareceram (bits) e a keyword de nível de maior prioridade encontrada.
+A regra "primeira categoria do config que casar vence" é aplicada depois,
+vetorizada sobre esses bits. O motor compilado (o "plano de categorização":
+matchers, níveis em minúsculas e ordem de prioridade) fica em cache pela
+identidade do objeto de config e, para objetos novos, pelo hash do conteúdo;
+o config.json também fica em cache e só é relido quando o mtime do arquivo
+muda.
+
+Sem o pyahocorasick instalado, o mesmo resultado sai de uma única regex com
+lookahead (todas as ocorrências, inclusive sobrepostas).
+
+A varredura é o único passo que roda em Python puro por mensagem (preso ao
+GIL); com workers > 1 ela é dividida em faixas de linhas processadas em
+paralelo por um pool de processos, e os resultados voltam na ordem original.
+O pool é criado na primeira varredura paralela e reaproveitado; usa
+forkserver (ou spawn), nunca fork, porque o processo (Streamlit, scheduler)
+tem threads e um fork herdaria locks no estado em que estivessem.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Keywords de nível (usadas quando a mensagem não traz LogLevel), em ordem de prioridade
+LEVEL_KEYWORDS = {
+    'fail:': 'Fail',
+    'error:': 'Error',
+    'exception': 'Error',
+    'critical:': 'Critical',
+    'fatal:': 'Fatal',
+    'warning:': 'Warning',
+    'debug:': 'Debug',
+    'info:': 'Info'
+}
+UNCATEGORIZED = 'Não categorizado'
+LOGLEVEL_TOKEN = 'loglevel'     # Só mensagens com este trecho passam pela regex de LogLevel
+NO_LEVEL = 255                  # Prioridade "nenhuma keyword de nível encontrada"
+MAX_CACHED_ENGINES = 16
+PARALLEL_MIN_ROWS = 50000       # Abaixo disso, subir os processos custa mais que a varredura
+PARTITIONS_PER_WORKER = 2       # Faixas menores equilibram a carga entre os processos
+
+_ENGINES = {}
+_ENGINES_BY_ID = {}             # (id(config), id(level_keywords)) -> (config, level_keywords, motor)
+_EMPTY_CONFIG = {}              # Todo config vazio usa este objeto (sem hash a cada chamada)
+_CONFIG_FILES = {}              # caminho absoluto -> (mtime_ns, tamanho, hash do conteúdo, config)
+_POOL = None                    # (workers, ProcessPoolExecutor) compartilhado pelas varreduras paralelas
+_POOL_LOCK = threading.Lock()
+
+
+class CategorizationEngine:
+    """Categorias e keywords de nível de um config, compiladas num único autômato."""
+
+    def __init__(self, config, level_keywords=LEVEL_KEYWORDS):
+        self.config = config
+        self.level_keywords = level_keywords
+        categories = (config or {}).get('categories', [])
+        # Tabela de nomes sem repetição, incluindo a das não categorizadas
+        entry_names = [cat['name'] for cat in categories]
+        self.category_names = list(dict.fromkeys(entry_names + [UNCATEGORIZED]))
+        self.uncategorized_code = self.category_names.index(UNCATEGORIZED)
+        self._entry_codes = [self.category_names.index(name) for name in entry_names]
+        self.category_levels = [{l.lower() for l in cat.get('log_levels', [])} for cat in categories]
+        self.level_labels = list(level_keywords.values())
+        self._bits_dtype = np.uint64 if len(categories) <= 64 else object
+        self.match_all_bits = 0     # Keyword vazia casa com qualquer mensagem (como no str.contains)
+
+        # keyword -> [bits das categorias, prioridade de nível]
+        values = {}
+        for i, cat in enumerate(categories):
+            for keyword in cat.get('keywords', []):
+                keyword = str(keyword).lower()
+                if not keyword:
+                    self.match_all_bits |= 1 << i
+                    continue
+                values.setdefault(keyword, [0, NO_LEVEL])[0] |= 1 << i
+        for prio, keyword in enumerate(level_keywords):
+            entry = values.setdefault(keyword.lower(), [0, NO_LEVEL])
+            entry[1] = min(entry[1], prio)
+        values.setdefault(LOGLEVEL_TOKEN, [0, NO_LEVEL])
+        self.values = {k: tuple(v) for k, v in values.items()}
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, value in self.values.items():
+                self._automaton.add_word(keyword, (keyword == LOGLEVEL_TOKEN,) + value)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            # Lookahead: uma tentativa por posição, achando também ocorrências sobrepostas.
+            # Em cada posição casa a keyword mais longa; as contidas nela entram pelo fechamento.
+            ordered = sorted(self.values, key=len, reverse=True)
+            self._regex = re.compile('(?=(' + '|'.join(map(re.escape, ordered)) + '))')
+            self._closure = {}
+            for keyword in ordered:
+                bits, prio, token = 0, NO_LEVEL, False
+                for other, (other_bits, other_prio) in self.values.items():
+                    if other in keyword:
+                        bits |= other_bits
+                        prio = min(prio, other_prio)
+                        token = token or other == LOGLEVEL_TOKEN
+                self._closure[keyword] = (token, bits, prio)
+
+    def scan(self, messages, workers=1):
+        """
+        Uma passada por mensagem. Retorna (bits das categorias por keyword,
+        prioridade da keyword de nível ou NO_LEVEL, mensagem contém 'loglevel').
+        Com workers > 1 (e linhas suficientes), as faixas rodam em paralelo.
+        """
+        if workers > 1 and len(messages) >= PARALLEL_MIN_ROWS:
+            return self._scan_parallel(messages, workers)
+        return self._scan(messages)
+
+    def _scan_parallel(self, messages, workers):
+        bounds = np.linspace(0, len(messages), workers * PARTITIONS_PER_WORKER + 1).astype(int)
+        # Cada tarefa leva sua fatia; cada processo compila o motor uma vez (cache pelo hash)
+        tasks = [(self.config, self.level_keywords, messages[start:end])
+                 for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+        pool = _get_pool(workers)
+        try:
+            parts = list(pool.map(_scan_partition, tasks))
+        except BrokenProcessPool:
+            _shutdown_pool(pool)
+            raise
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def _scan(self, messages):
+        n = len(messages)
+        bits = np.full(n, self.match_all_bits, dtype=self._bits_dtype)
+        levels = np.full(n, NO_LEVEL, dtype=np.uint8)
+        tokens = np.zeros(n, dtype=bool)
+        match_all = self.match_all_bits
+        if self._automaton is not None:
+            find = self._automaton.iter
+            for i, text in enumerate(messages):
+                b, prio, token = match_all, NO_LEVEL, False
+                for _, (is_token, kb, kp) in find(str(text).lower()):
+                    b |= kb
+                    if kp < prio:
+                        prio = kp
+                    token = token or is_token
+                bits[i], levels[i], tokens[i] = b, prio, token
+        else:
+            findall, closure = self._regex.findall, self._closure
+            for i, text in enumerate(messages):
+                b, prio, token = match_all, NO_LEVEL, False
+                for keyword in set(findall(str(text).lower())):
+                    is_token, kb, kp = closure[keyword]
+                    b |= kb
+                    if kp < prio:
+                        prio = kp
+                    token = token or is_token
+                bits[i], levels[i], tokens[i] = b, prio, token
+        return bits, levels, tokens
+
+    def level_from_keywords(self, levels, default):
+        """Rótulo da keyword de nível mais prioritária de cada linha (ou `default`)."""
+        labels = np.array(self.level_labels + [default], dtype=object)
+        return labels[np.minimum(levels, len(self.level_labels))]
+
+    def assign_categories(self, bits, log_levels_lower):
+        """
+        Código (em category_names) da primeira categoria do config que casa
+        por nível ou keyword.
+        """
+        n = len(bits)
+        uncategorized = self.uncategorized_code
+        codes = np.full(n, uncategorized, dtype=np.int32)
+        levels = pd.Series(log_levels_lower)
+        for i, target_levels in enumerate(self.category_levels):
+            if self._bits_dtype is object:
+                hit = np.array([(b >> i) & 1 for b in bits], dtype=bool)
+            else:
+                hit = (bits & np.uint64(1 << i)) != 0
+            if target_levels:
+                hit |= levels.isin(target_levels).to_numpy()
+            codes[(codes == uncategorized) & hit] = self._entry_codes[i]
+        return codes
+
+
+def _scan_partition(task):
+    """Executado no processo do pool: varre uma faixa de mensagens."""
+    config, level_keywords, messages = task
+    return get_engine(config, level_keywords)._scan(messages)
+
+
+def _get_pool(workers):
+    """Pool de processos compartilhado, criado sob demanda (recriado se workers mudar)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL[0] == workers:
+            return _POOL[1]
+        if _POOL is not None:
+            _POOL[1].shutdown(wait=False)
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        _POOL = (workers, pool)
+        return pool
+
+
+def _shutdown_pool(pool=None):
+    """Descarta o pool compartilhado (todo, ou só se ainda for `pool`)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and (pool is None or _POOL[1] is pool):
+            _POOL[1].shutdown(wait=False)
+            _POOL = None
+
+
+def _config_key(config, level_keywords):
+    data = json.dumps([config, level_keywords], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def get_engine(config, level_keywords=LEVEL_KEYWORDS):
+    """
+    Motor compilado para o config. O mesmo objeto de config (ex.: o dict do
+    load_config_file) é resolvido pela identidade, sem serializar nem gerar
+    hash; só um objeto novo passa pelo hash do conteúdo. Por isso um config
+    não deve ser alterado depois de usado aqui.
+    """
+    if not config:
+        config = _EMPTY_CONFIG
+    ident = (id(config), id(level_keywords))
+    cached = _ENGINES_BY_ID.get(ident)
+    if cached is not None and cached[0] is config and cached[1] is level_keywords:
+        return cached[2]
+
+    key = _config_key(config, level_keywords)
+    engine = _ENGINES.get(key)
+    if engine is None:
+        if len(_ENGINES) >= MAX_CACHED_ENGINES:
+            _ENGINES.clear()
+        engine = _ENGINES[key] = CategorizationEngine(config, level_keywords)
+    if len(_ENGINES_BY_ID) >= MAX_CACHED_ENGINES:
+        _ENGINES_BY_ID.clear()
+    # Guarda as referências junto: o id só é válido enquanto o objeto existir
+    _ENGINES_BY_ID[ident] = (config, level_keywords, engine)
+    return engine
+
+
+def load_config_file(path):
+    """
+    Lê o config.json e já compila o plano de categorização. Enquanto mtime e
+    tamanho do arquivo não mudam, devolve o mesmo dict sem abrir o arquivo
+    (não altere o dict retornado); quando mudam, relê e só recompila se o
+    conteúdo mudou. Erros de leitura/JSON são propagados.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = _CONFIG_FILES.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[3]
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    if cached and cached[2] == digest:
+        config = cached[3]
+    else:
+        config = json.loads(data.decode('utf-8'))
+        get_engine(config)
+    _CONFIG_FILES[path] = (stat.st_mtime_ns, stat.st_size, digest, config)
+    return config
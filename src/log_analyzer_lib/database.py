@@ -3,8 +3,8 @@
 Módulo para todas as interações com o banco de dados SQLite.
 """
 import hashlib
+import numpy as np
 import pandas as pd
-from datetime import datetime
 import os
 import re
 import json
@@ -12,80 +12,282 @@ import zlib
 import socket
 import warnings
 import json
+import time
+import shutil
+import sys
+
+from .wal import SegmentWriter
+from .log_store import LogStore, NAT_NS, parse_timestamps_ns
+from .timestamps import as_ns, utc_now_ns
+from .time_buckets import record_bytes
+from .metric_series import MetricStore
+from .rum_sketches import RumStore
+from . import search_index
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 # --- Constantes do Módulo ---
-DB_FILE = 'log_analysis_data.json'
+DB_FILE = 'log_analysis_data.json'       # Snapshot legado (JSON)
+SNAPSHOT_DIR = 'log_analysis_snapshot'   # Snapshot binário (colunas mapeáveis em memória)
+SNAPSHOT_FORMAT = 'binary'               # 'binary' ou 'json'
+WAL_DIR = 'log_analysis_wal'
+# Quantidade de registros no WAL que dispara um snapshot compactado automático
+SNAPSHOT_EVERY_RECORDS = 50000
+# Taxa de falsos positivos do filtro de Bloom de deduplicação (por partição).
+# Um falso positivo só custa uma consulta aos digests; nenhum log é descartado por engano.
+DEDUP_FP_RATE = 0.001
+# Armazenamento das mensagens: 'plain' (texto) ou 'templates' (id do template +
+# parâmetros, com dicionário compartilhado; ver message_templates.py)
+MESSAGE_STORAGE = 'plain'
+# Orçamento de bytes para logs + métricas + RUM (None ou <= 0 = sem limite). A configuração
+# 'RETENTION_MAX_BYTES' (save_setting) tem precedência sobre esta constante.
+RETENTION_MAX_BYTES = None
+# Orçamento de memória do processo para o armazenamento (None ou <= 0 = sem limite). A
+# configuração 'MEMORY_BUDGET_BYTES' tem precedência. Ao excedê-lo, os dados mais
+# antigos são descartados (ver enforce_memory_budget).
+MEMORY_BUDGET_BYTES = None
+# Resolução do histórico de métricas: pontos brutos até RAW_HISTORY_DAYS, rollup
+# por minuto até MINUTE_HISTORY_DAYS e por hora acima disso
+RAW_HISTORY_DAYS = 1
+MINUTE_HISTORY_DAYS = 7
+# Cada processo publica o seu uso de memória aqui (lido pelo /metrics do app.py)
+MEMORY_STATS_DIR = 'log_analysis_stats'
+MEMORY_STATS_INTERVAL = 30  # segundos entre publicações
 
 # --- Estruturas em Memória (Globais) ---
 _AI_CACHE = {}          # message_hash -> {data}
 _SETTINGS = {}          # key -> value
-_COLLECTED_LOGS = []    # List of dicts
-_LOG_HASHES = set()     # Set of hashes for deduplication
+_LOG_STORE = LogStore(dedup_fp_rate=DEDUP_FP_RATE, message_storage=MESSAGE_STORAGE) # Logs em blocos colunares (inclui os digests para deduplicação)
 _METRIC_DEFINITIONS = {} # id -> {definition}
-_METRIC_VALUES = []     # List of {metric_id, timestamp, value}
-_RUM_EVENTS = []        # List of {timestamp, url, type, ...}
+_METRIC_VALUES = MetricStore()  # Buffer circular + rollups por métrica
+_RUM_EVENTS = RumStore()        # Sketches de quantis por minuto + eventos brutos recentes
 _METRIC_ID_COUNTER = 1
 
+# --- Estado do WAL ---
+_WAL = None                 # SegmentWriter aberto sob demanda
+_SNAPSHOT_LSN = 0           # Último LSN coberto pelo snapshot em disco
+_REPLAYING = False          # True enquanto o WAL é reaplicado (não regrava registros)
+_LAST_MEMORY_PUBLISH = 0    # Momento da última publicação do uso de memória
+
 # --- Funções de Banco de Dados (Persistência) ---
 
+def _get_wal():
+    """Retorna o escritor do WAL, abrindo-o na primeira utilização."""
+    global _WAL
+    if _WAL is None:
+        _WAL = SegmentWriter(WAL_DIR)
+        _WAL.last_lsn = max(_WAL.last_lsn, _SNAPSHOT_LSN)
+    return _WAL
+
+def _wal_append(op, payload):
+    """Anexa um registro ao WAL (ignorado durante o replay)."""
+    if _REPLAYING:
+        return
+    try:
+        _get_wal().append(op, payload)
+    except Exception as e:
+        print(f"❌ Erro ao gravar no WAL: {e}")
+        return
+    _maybe_snapshot()
+
+def _wal_append_many(op, payloads):
+    """Anexa um lote de registros do mesmo tipo ao WAL."""
+    if _REPLAYING or not payloads:
+        return
+    try:
+        _get_wal().append_many(op, payloads)
+    except Exception as e:
+        print(f"❌ Erro ao gravar no WAL: {e}")
+        return
+    _maybe_snapshot()
+
+def _maybe_snapshot():
+    """Compacta o WAL em um snapshot quando há registros pendentes demais."""
+    if _get_wal().last_lsn - _SNAPSHOT_LSN >= SNAPSHOT_EVERY_RECORDS:
+        save_to_disk()
+
 def init_db():
     """
     Inicializa as estruturas em memória e carrega dados do disco se existirem.
     """
-    global _AI_CACHE, _SETTINGS, _COLLECTED_LOGS, _LOG_HASHES, _METRIC_DEFINITIONS, _METRIC_VALUES, _RUM_EVENTS, _METRIC_ID_COUNTER
+    load_from_disk()
+
+def _reset_state():
+    """Zera todas as estruturas em memória."""
+    global _AI_CACHE, _SETTINGS, _LOG_STORE, _METRIC_DEFINITIONS, _METRIC_VALUES, _RUM_EVENTS, _METRIC_ID_COUNTER
+    global _SNAPSHOT_LSN
     _AI_CACHE = {}
     _SETTINGS = {}
-    _COLLECTED_LOGS = []
-    _LOG_HASHES = set()
+    _LOG_STORE = LogStore(dedup_fp_rate=DEDUP_FP_RATE, message_storage=MESSAGE_STORAGE)
     _METRIC_DEFINITIONS = {}
-    _METRIC_VALUES = []
-    _RUM_EVENTS = []
+    _METRIC_VALUES = MetricStore()
+    _RUM_EVENTS = RumStore()
     _METRIC_ID_COUNTER = 1
-    
-    load_from_disk()
+    _SNAPSHOT_LSN = 0
 
-def save_to_disk():
-    """Salva o estado atual da memória em um arquivo JSON."""
+def save_to_disk(snapshot_format=None):
+    """
+    Grava um snapshot compactado do estado atual e descarta os segmentos do WAL
+    já cobertos por ele. As alterações do dia a dia vão apenas para o WAL.
+    """
+    global _SNAPSHOT_LSN
+    wal = _get_wal()
+    snapshot_format = snapshot_format or SNAPSHOT_FORMAT
     data = {
         "ai_cache": _AI_CACHE,
         "settings": _SETTINGS,
-        "collected_logs": _COLLECTED_LOGS,
         "metric_definitions": _METRIC_DEFINITIONS,
-        "metric_values": _METRIC_VALUES,
-        "rum_events": _RUM_EVENTS,
-        "metric_id_counter": _METRIC_ID_COUNTER
+        "metric_values": _METRIC_VALUES.to_dict(),
+        "rum_events": _RUM_EVENTS.to_dict(),
+        "metric_id_counter": _METRIC_ID_COUNTER,
+        "wal_lsn": wal.last_lsn
     }
     try:
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, default=str, indent=2)
-        print(f"✅ Dados salvos em {DB_FILE}")
+        if snapshot_format == 'binary':
+            target = _save_binary_snapshot(data)
+        else:
+            target = _save_json_snapshot(data)
+        _SNAPSHOT_LSN = wal.last_lsn
+        wal.checkpoint()
+        print(f"✅ Dados salvos em {target}")
         return True
     except Exception as e:
         print(f"❌ Erro ao salvar dados em disco: {e}")
         return False
 
-def load_from_disk():
-    """Carrega o estado do arquivo JSON para a memória."""
-    global _AI_CACHE, _SETTINGS, _COLLECTED_LOGS, _LOG_HASHES, _METRIC_DEFINITIONS, _METRIC_VALUES, _RUM_EVENTS, _METRIC_ID_COUNTER
-    
+def _save_json_snapshot(data):
+    """Snapshot legado: todo o estado em um único arquivo JSON (escrita atômica)."""
+    data = dict(data, collected_logs=_LOG_STORE.to_frame().to_dict('records'))
+    tmp_file = DB_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, default=str, separators=(',', ':'))
+    os.replace(tmp_file, DB_FILE)
+    _remove_binary_snapshots()
+    return DB_FILE
+
+def _save_binary_snapshot(data):
+    """
+    Snapshot binário: os logs vão para arrays .npy (mapeáveis em memória) e o
+    restante do estado para um meta.json pequeno. Cada snapshot é uma geração
+    nova; o arquivo CURRENT aponta para a geração válida (troca atômica).
+    """
+    global _LOG_STORE
+    generation = f"gen_{data['wal_lsn']:012d}_{int(time.time() * 1000)}"
+    gen_dir = os.path.join(SNAPSHOT_DIR, generation)
+    os.makedirs(gen_dir, exist_ok=True)
+
+    _LOG_STORE.save(os.path.join(gen_dir, 'logs'))
+    with open(os.path.join(gen_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f, default=str, separators=(',', ':'))
+
+    tmp_current = os.path.join(SNAPSHOT_DIR, 'CURRENT.tmp')
+    with open(tmp_current, 'w', encoding='utf-8') as f:
+        f.write(generation)
+    os.replace(tmp_current, os.path.join(SNAPSHOT_DIR, 'CURRENT'))
+
+    # Passa a usar as colunas mapeadas do disco, liberando a cópia em heap
+    _LOG_STORE = LogStore.load(os.path.join(gen_dir, 'logs'), dedup_fp_rate=DEDUP_FP_RATE, message_storage=MESSAGE_STORAGE)
+    _remove_binary_snapshots(keep=generation)
     if os.path.exists(DB_FILE):
+        os.remove(DB_FILE)
+    return gen_dir
+
+def _current_generation():
+    """Retorna o diretório da geração de snapshot binário válida, se houver."""
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, 'CURRENT'), 'r', encoding='utf-8') as f:
+            generation = f.read().strip()
+    except FileNotFoundError:
+        return None
+    gen_dir = os.path.join(SNAPSHOT_DIR, generation)
+    return gen_dir if os.path.isdir(gen_dir) else None
+
+def _remove_binary_snapshots(keep=None):
+    """Remove gerações antigas (falhas são ignoradas: arquivos ainda mapeados no Windows)."""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name.startswith('gen_') and name != keep:
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+    if keep is None:
+        try:
+            os.remove(os.path.join(SNAPSHOT_DIR, 'CURRENT'))
+        except OSError:
+            pass
+
+def load_from_disk():
+    """
+    Carrega o snapshot do disco para a memória e reaplica os registros do WAL
+    gravados depois dele (recuperação após crash ou reinício).
+    O snapshot binário é apenas mapeado em memória; o JSON legado ainda é aceito.
+    """
+    # O estado é sempre reconstruído do zero: snapshot + WAL são a fonte da verdade
+    _reset_state()
+    gen_dir = _current_generation()
+    source = gen_dir or (DB_FILE if os.path.exists(DB_FILE) else None)
+    if source:
         try:
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                _AI_CACHE = data.get("ai_cache", {})
-                _SETTINGS = data.get("settings", {})
-                _COLLECTED_LOGS = data.get("collected_logs", [])
-                _LOG_HASHES = {l['log_hash'] for l in _COLLECTED_LOGS}
-                _METRIC_DEFINITIONS = {int(k): v for k, v in data.get("metric_definitions", {}).items()}
-                _METRIC_VALUES = data.get("metric_values", [])
-                _RUM_EVENTS = data.get("rum_events", [])
-                _METRIC_ID_COUNTER = data.get("metric_id_counter", 1)
-            print(f"✅ Dados carregados de {DB_FILE} ({len(_COLLECTED_LOGS)} logs)")
+            if gen_dir:
+                _load_binary_snapshot(gen_dir)
+            else:
+                _load_json_snapshot()
+            print(f"✅ Dados carregados de {source} ({len(_LOG_STORE)} logs)")
         except Exception as e:
             print(f"⚠️ Erro ao carregar dados do disco: {e}")
 
+    replayed = _replay_wal(_SNAPSHOT_LSN)
+    if replayed:
+        print(f"✅ {replayed} registros reaplicados do WAL")
+
+def _apply_snapshot_meta(data):
+    global _AI_CACHE, _SETTINGS, _METRIC_DEFINITIONS, _METRIC_VALUES, _RUM_EVENTS, _METRIC_ID_COUNTER, _SNAPSHOT_LSN
+    _AI_CACHE = data.get("ai_cache", {})
+    _SETTINGS = data.get("settings", {})
+    _METRIC_DEFINITIONS = {int(k): v for k, v in data.get("metric_definitions", {}).items()}
+    _METRIC_VALUES = MetricStore.from_snapshot(data.get("metric_values", {}))
+    _RUM_EVENTS = RumStore.from_snapshot(data.get("rum_events", {}))
+    _METRIC_ID_COUNTER = data.get("metric_id_counter", 1)
+    _SNAPSHOT_LSN = data.get("wal_lsn", 0)
+
+def _load_binary_snapshot(gen_dir):
+    global _LOG_STORE
+    with open(os.path.join(gen_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+        _apply_snapshot_meta(json.load(f))
+    _LOG_STORE = LogStore.load(os.path.join(gen_dir, 'logs'), dedup_fp_rate=DEDUP_FP_RATE, message_storage=MESSAGE_STORAGE)
+
+def _load_json_snapshot():
+    with open(DB_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    _apply_snapshot_meta(data)
+    logs = data.get("collected_logs", [])
+    if logs:
+        _apply_logs({
+            'log_hash': [l['log_hash'] for l in logs],
+            'timestamp': [l['timestamp'] for l in logs],
+            'source': [l['source'] for l in logs],
+            'message': [l['message'] for l in logs],
+            'ingested_ns': [pd.Timestamp(l.get('ingested_at')).value for l in logs]
+        })
+
+def _replay_wal(after_lsn):
+    """Reaplica no estado em memória os registros do WAL com LSN > after_lsn."""
+    global _REPLAYING
+    wal = _get_wal()
+    wal.last_lsn = max(wal.last_lsn, after_lsn)
+    count = 0
+    _REPLAYING = True
+    try:
+        for _, op, payload in wal.replay(after_lsn):
+            handler = _WAL_HANDLERS.get(op)
+            if handler:
+                handler(payload)
+                count += 1
+    except Exception as e:
+        print(f"⚠️ Erro ao reaplicar o WAL: {e}")
+    finally:
+        _REPLAYING = False
+    return count
+
 def get_cached_ai_analysis(message):
     """Busca no cache uma análise de IA para uma mensagem específica."""
     msg_hash = calculate_log_hash("", "", str(message))
@@ -97,6 +299,7 @@ def update_ai_feedback(message, score):
     msg_hash = calculate_log_hash("", "", str(message))
     if msg_hash in _AI_CACHE:
         _AI_CACHE[msg_hash]['feedback_score'] = score
+        _wal_append('ai_feedback', {'hash': msg_hash, 'score': score})
         return True
     return False
 
@@ -112,15 +315,16 @@ def save_ai_analysis(message, response, user="System"):
     _AI_CACHE[msg_hash] = {
         'original_message': str(message),
         'ai_response': response,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'timestamp': pd.Timestamp(utc_now_ns()).strftime('%Y-%m-%d %H:%M:%S'),
         'requested_by': user,
         'feedback_score': 0
     }
+    _wal_append('ai', {'hash': msg_hash, 'entry': _AI_CACHE[msg_hash]})
 
 def save_setting(key, value):
     """Salva um par chave-valor nas configurações do banco de dados."""
     _SETTINGS[key] = str(value)
-    save_to_disk()
+    _wal_append('setting', {'key': key, 'value': _SETTINGS[key]})
 
 def get_setting(key, default=""):
     """
@@ -133,20 +337,24 @@ def get_setting(key, default=""):
     return os.environ.get(key.upper(), default)
 
 def get_db_stats():
-    """Retorna estatísticas sobre o cache da IA."""
-    if not _AI_CACHE:
-        return {"count": 0, "first": None, "last": None}
-    
-    timestamps = [e['timestamp'] for e in _AI_CACHE.values()]
-    return {
-        "count": len(_AI_CACHE),
-        "first": min(timestamps) if timestamps else None,
-        "last": max(timestamps) if timestamps else None
-    }
+    """Retorna estatísticas sobre o cache da IA, os índices de busca e o uso de memória."""
+    stats = {"count": 0, "first": None, "last": None}
+    if _AI_CACHE:
+        timestamps = [e['timestamp'] for e in _AI_CACHE.values()]
+        stats.update({
+            "count": len(_AI_CACHE),
+            "first": min(timestamps) if timestamps else None,
+            "last": max(timestamps) if timestamps else None
+        })
+    stats.update(_LOG_STORE.index_stats())
+    stats['memory'] = get_memory_usage()
+    stats['memory_budget'] = _memory_budget()
+    return stats
 
 def clear_ai_cache():
     """Limpa completamente a tabela de cache da IA."""
     _AI_CACHE.clear()
+    _wal_append('ai_clear', {})
     return True
 
 def get_all_cached_analyses():
@@ -160,108 +368,314 @@ def calculate_log_hash(timestamp, source, message):
     content = f"{timestamp}{source}{message}"
     return hashlib.md5(content.encode('utf-8')).hexdigest()
 
+def calculate_log_digests(timestamps, sources, messages):
+    """
+    Versão em lote de `calculate_log_hash`: concatena as colunas de uma vez e
+    retorna os digests MD5 binários (16 bytes), compatíveis com os hashes gravados.
+    """
+    content = timestamps + sources + messages
+    md5 = hashlib.md5
+    return [md5(c.encode('utf-8')).digest() for c in content.tolist()]
+
 def ingest_logs_to_db(df):
     """
     Ingestão de logs em memória.
+    Trabalha sobre colunas inteiras: hash em lote, deduplicação vetorizada e
+    gravação dos logs aceitos como blocos colunares.
     """
     if df.empty:
         return 0
     
-    count = 0
     # Garante que as colunas existam
-    if 'timestamp' not in df.columns: df['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if 'timestamp' not in df.columns: df['timestamp'] = pd.Timestamp(utc_now_ns()).strftime('%Y-%m-%d %H:%M:%S')
     if 'source' not in df.columns: df['source'] = 'Unknown'
     if 'message' not in df.columns: df['message'] = ''
 
-    for _, row in df.iterrows():
-        ts = str(row['timestamp'])
-        src = str(row['source'])
-        msg = str(row['message'])
-        log_hash = calculate_log_hash(ts, src, msg)
-        
-        if log_hash not in _LOG_HASHES:
-            _LOG_HASHES.add(log_hash)
-            _COLLECTED_LOGS.append({
-                'log_hash': log_hash,
-                'timestamp': ts,
-                'source': src,
-                'message': msg,
-                'ingested_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
-            count += 1
-    
+    timestamps = df['timestamp'].astype(str)
+    sources = df['source'].astype(str)
+    messages = df['message'].astype(str)
+    batch = {
+        'digests': calculate_log_digests(timestamps, sources, messages),
+        'timestamp': timestamps.tolist(),
+        'source': sources.tolist(),
+        'message': messages.tolist(),
+        'ingested_ns': utc_now_ns()
+    }
+    if 'timestamp_ns' in df.columns:
+        # Timestamp já normalizado no processamento (process_log_data): não reconverte
+        batch['ts_ns'] = as_ns(df['timestamp_ns'])
+
+    new_logs = _apply_logs(batch)
+    count = len(new_logs['log_hash'])
+    if count:
+        _wal_append('logs', new_logs)
+
     # Processa métricas e RUM nos novos logs
     if count > 0:
         extract_and_save_metrics(df)
         extract_rum_data(df)
+        enforce_memory_budget()
+        _publish_memory_usage()
         
     return count
 
+def _apply_logs(batch):
+    """
+    Insere um lote colunar de logs no armazenamento, ignorando duplicatas
+    (usado na ingestão e no replay do WAL). Retorna o lote com os logs aceitos.
+    """
+    # Timestamps convertidos uma única vez; o replay reaproveita o valor gravado no WAL
+    ts_ns = batch.get('ts_ns')
+    ts_ns = parse_timestamps_ns(batch['timestamp']) if ts_ns is None else np.asarray(ts_ns, dtype=np.int64)
+    digests = batch.get('digests')
+    if digests is None:
+        digests = [bytes.fromhex(h) for h in batch['log_hash']]
+    idx = _LOG_STORE.append_batch(batch['timestamp'], ts_ns, batch['source'], batch['message'], batch['ingested_ns'], digests)
+
+    idx = idx.tolist()
+    accepted = {key: [batch[key][i] for i in idx] for key in ('timestamp', 'source', 'message')}
+    accepted['log_hash'] = [digests[i].hex() for i in idx]
+    accepted['ts_ns'] = ts_ns[idx].tolist()
+    accepted['ingested_ns'] = batch['ingested_ns']
+    if isinstance(batch['ingested_ns'], list):
+        accepted['ingested_ns'] = [batch['ingested_ns'][i] for i in idx]
+    return accepted
+
 def get_collected_logs(limit=50000):
     """Recupera os logs mais recentes do banco de dados local."""
-    if not _COLLECTED_LOGS:
+    if not len(_LOG_STORE):
         return pd.DataFrame()
     
     # Retorna os últimos 'limit' logs
-    return pd.DataFrame(_COLLECTED_LOGS[-limit:])
-
-def clean_old_logs(retention_days=30):
-    """Remove logs e dados de métricas/RUM mais antigos que o período de retenção."""
-    # Implementação simplificada: Limpa se a lista ficar muito grande (> 100k)
-    global _COLLECTED_LOGS, _LOG_HASHES
-    if len(_COLLECTED_LOGS) > 100000:
-        removed = len(_COLLECTED_LOGS) - 50000
-        _COLLECTED_LOGS = _COLLECTED_LOGS[-50000:]
-        _LOG_HASHES = {l['log_hash'] for l in _COLLECTED_LOGS}
-        return removed
-    return 0
+    return _LOG_STORE.to_frame(limit)
+
+def clean_old_logs(retention_days=30, max_bytes=None):
+    """
+    Remove logs e dados de métricas/RUM mais antigos que o período de retenção.
+    Descarta janelas horárias inteiras (custo proporcional ao número de partições)
+    e, com um orçamento de bytes (`max_bytes`, a configuração RETENTION_MAX_BYTES
+    ou a constante do módulo), continua pelas janelas mais antigas até caber nele.
+    Retorna a quantidade de logs removidos.
+    """
+    targets = _retention_targets()
+    cutoff_ns = utc_now_ns() - int(retention_days * 86400 * 10**9)
+    expired = {name: [k for k in keys if (k + 1) * bucket_ns <= cutoff_ns] for name, (keys, bucket_ns) in targets.items()}
+
+    max_bytes = _byte_budget('RETENTION_MAX_BYTES', RETENTION_MAX_BYTES) if max_bytes is None else _parse_bytes(max_bytes)
+    if max_bytes is not None:
+        _expire_oldest_windows(expired, max_bytes, lambda store, key: store.nbytes(key))
+
+    removed = _apply_retention(expired)
+    if any(expired.values()):
+        _wal_append('retention', expired)
+    return removed
+
+def _expire_oldest_windows(expired, budget, size_of):
+    """
+    Acrescenta a `expired` as janelas mais antigas (logs, métricas e RUM juntos)
+    até que o tamanho restante, medido por `size_of(store, chave)`, caiba em
+    `budget`. Retorna o tamanho restante.
+    """
+    windows = []
+    for name, (keys, bucket_ns) in _retention_targets().items():
+        store = _retention_store(name)
+        for key in keys[len(expired[name]):]:
+            windows.append((key * bucket_ns, name, key, size_of(store, key)))
+    windows.sort()
+    total = sum(w[3] for w in windows)
+    for _, name, key, size in windows:
+        if total <= budget:
+            break
+        expired[name].append(key)
+        total -= size
+    return total
+
+def _retention_store(name):
+    return {'logs': _LOG_STORE, 'metric_values': _METRIC_VALUES, 'rum_events': _RUM_EVENTS}[name]
+
+def _retention_targets():
+    """{nome: (chaves das janelas, largura da janela em ns)} para logs, métricas e RUM."""
+    return {
+        'logs': (_LOG_STORE.keys(), _LOG_STORE.partition_ns),
+        'metric_values': (_METRIC_VALUES.keys(), _METRIC_VALUES.bucket_ns),
+        'rum_events': (_RUM_EVENTS.keys(), _RUM_EVENTS.bucket_ns)
+    }
+
+def _apply_retention(expired):
+    """Descarta as janelas listadas (usado na retenção e no replay do WAL)."""
+    removed = 0
+    for key in expired.get('logs', []):
+        part = _LOG_STORE.drop_partition(key)
+        removed += len(part) if part is not None else 0
+    for key in expired.get('metric_values', []):
+        _METRIC_VALUES.drop(key)
+    for key in expired.get('rum_events', []):
+        _RUM_EVENTS.drop(key)
+    for message_hash in expired.get('ai_cache', []):
+        _AI_CACHE.pop(message_hash, None)
+    return removed
+
+# --- Governador de Memória ---
+
+def get_memory_usage():
+    """Uso estimado de memória (bytes) por estrutura do armazenamento em memória."""
+    usage = _LOG_STORE.memory_usage()
+    usage['metric_values'] = _METRIC_VALUES.nbytes()
+    usage['rum_events'] = _RUM_EVENTS.nbytes()
+    usage['ai_cache'] = sum(len(h) + record_bytes(e) for h, e in _AI_CACHE.items())
+    usage['total'] = sum(usage.values())
+    return usage
+
+def _parse_bytes(value):
+    """Orçamento em bytes como float; vazio, inválido ou <= 0 significa sem limite (None)."""
+    if value is None or str(value).strip().lower() in ('', 'none'):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        print(f"⚠️ Orçamento de bytes inválido ignorado: {value!r}")
+        return None
+    return value if value > 0 else None
+
+def _byte_budget(key, default):
+    """Orçamento da configuração `key` (gravada como texto por save_setting) ou da constante do módulo."""
+    return _parse_bytes(_SETTINGS.get(key, default))
+
+def _memory_budget():
+    return _byte_budget('MEMORY_BUDGET_BYTES', MEMORY_BUDGET_BYTES)
+
+def enforce_memory_budget(budget=None):
+    """
+    Mantém o armazenamento abaixo do orçamento de memória descartando os dados
+    mais antigos: primeiro janelas horárias de logs/métricas/RUM e, se ainda não
+    bastar, as análises mais antigas do cache da IA. Retorna os bytes liberados.
+    """
+    budget = _memory_budget() if budget is None else _parse_bytes(budget)
+    if budget is None:
+        return 0
+    usage = get_memory_usage()
+    if usage['total'] <= budget:
+        return 0
+
+    expired = {name: [] for name in _retention_targets()}
+    remaining = _expire_oldest_windows(expired, budget - usage['ai_cache'], lambda store, key: store.memory_bytes(key))
+    excess = remaining + usage['ai_cache'] - budget
+    expired['ai_cache'] = []
+    for message_hash, entry in sorted(_AI_CACHE.items(), key=lambda item: str(item[1].get('timestamp', ''))):
+        if excess <= 0:
+            break
+        expired['ai_cache'].append(message_hash)
+        excess -= len(message_hash) + record_bytes(entry)
+
+    _apply_retention(expired)
+    if any(expired.values()):
+        _wal_append('retention', expired)
+    freed = usage['total'] - get_memory_usage()['total']
+    print(f"⚠️ Orçamento de memória excedido: {freed / 1024 / 1024:.1f} MB liberados.")
+    _publish_memory_usage(force=True)
+    return freed
+
+def _publish_memory_usage(force=False):
+    """Grava o uso de memória deste processo para o endpoint /metrics (no máximo a cada MEMORY_STATS_INTERVAL s)."""
+    global _LAST_MEMORY_PUBLISH
+    now = time.time()
+    if not force and now - _LAST_MEMORY_PUBLISH < MEMORY_STATS_INTERVAL:
+        return
+    _LAST_MEMORY_PUBLISH = now
+    process = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+    path = os.path.join(MEMORY_STATS_DIR, f"{process}_{os.getpid()}.json")
+    try:
+        os.makedirs(MEMORY_STATS_DIR, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'process': process, 'pid': os.getpid(), 'updated_at': now,
+                       'budget': _memory_budget(), 'usage': get_memory_usage()}, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"⚠️ Não foi possível publicar o uso de memória: {e}")
+
+def read_memory_usage(max_age_seconds=900):
+    """Lê o uso de memória publicado pelos processos (ignora publicações antigas)."""
+    if not os.path.isdir(MEMORY_STATS_DIR):
+        return []
+    reports = []
+    now = time.time()
+    for name in os.listdir(MEMORY_STATS_DIR):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(MEMORY_STATS_DIR, name), 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if now - report.get('updated_at', 0) <= max_age_seconds:
+            reports.append(report)
+    return reports
 
 def search_logs_in_db(query=None, start_date=None, end_date=None, source=None, limit=10000):
     """
-    Realiza uma busca avançada na lista de logs em memória.
+    Realiza uma busca avançada nos logs em memória.
+    Apenas as partições temporais que se sobrepõem ao período são consultadas.
+
+    A consulta usa o índice invertido (ex: "error AND timeout", "NOT debug",
+    "time*", "\"sql server\"") e o de trigramas para substrings ("*NullRef",
+    "api.lockton"); expressões regulares só varrem as linhas que contêm os
+    trigramas dos seus literais obrigatórios.
     """
-    if not _COLLECTED_LOGS:
+    if not len(_LOG_STORE):
         return pd.DataFrame()
-    
-    df = pd.DataFrame(_COLLECTED_LOGS)
-    
-    # Filtros
-    if source and source != "Todos":
-        df = df[df['source'] == source]
-    
-    if query:
-        df = df[df['message'].str.contains(query, case=False, na=False)]
-        
-    if start_date:
-        df = df[pd.to_datetime(df['timestamp']) >= pd.to_datetime(start_date)]
-        
+
+    start_ns = _date_to_ns(start_date) if start_date else None
+    end_ns = None
     if end_date:
         # Ajusta para o final do dia
-        end_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-        df = df[pd.to_datetime(df['timestamp']) <= end_dt]
-        
-    return df.tail(limit)
+        end_ns = _date_to_ns(end_date) + pd.Timedelta(days=1).value - pd.Timedelta(seconds=1).value
+
+    predicate = None
+    text_query = search_index.parse_query(query) if query else None
+    if query and text_query is None:
+        def predicate(block, idx):
+            messages = pd.Series(block.messages(idx))
+            return idx[messages.str.contains(query, case=False, na=False).to_numpy()]
+
+    return _LOG_STORE.query(
+        start_ns=start_ns, end_ns=end_ns,
+        source=source if source and source != "Todos" else None,
+        limit=limit, predicate=predicate, text_query=text_query,
+        regex=query if predicate is not None else None
+    )
+
+def _date_to_ns(value):
+    """Converte uma data/datetime de filtro para int64 (ns, UTC) no mesmo eixo do armazenamento."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.value
 
 def get_unique_sources_from_db():
     """Retorna uma lista de 'sources' únicos do banco para uso em filtros."""
-    if not _COLLECTED_LOGS:
+    if not len(_LOG_STORE):
         return []
-    return sorted(list(set(l['source'] for l in _COLLECTED_LOGS)))
+    return _LOG_STORE.unique_sources()
 
 def save_metric_definition(name, regex, metric_type="counter", threshold=0.0):
     """Salva uma nova definição de métrica customizada no banco."""
-    global _METRIC_ID_COUNTER
-    metric_id = _METRIC_ID_COUNTER
-    _METRIC_DEFINITIONS[metric_id] = {
-        'id': metric_id,
+    definition = {
+        'id': _METRIC_ID_COUNTER,
         'name': name,
         'regex': regex,
         'type': metric_type,
         'threshold': threshold
     }
-    _METRIC_ID_COUNTER += 1
+    _apply_metric_definition(definition)
+    _wal_append('metric_def', definition)
     return True, "Métrica salva em memória."
 
+def _apply_metric_definition(definition):
+    global _METRIC_ID_COUNTER
+    metric_id = int(definition['id'])
+    _METRIC_DEFINITIONS[metric_id] = definition
+    _METRIC_ID_COUNTER = max(_METRIC_ID_COUNTER, metric_id + 1)
+
 def get_metric_definitions():
     """Retorna todas as definições de métricas customizadas como um DataFrame."""
     if not _METRIC_DEFINITIONS:
@@ -273,8 +687,8 @@ def delete_metric_definition(metric_id):
     if metric_id in _METRIC_DEFINITIONS:
         del _METRIC_DEFINITIONS[metric_id]
         # Remove valores associados
-        global _METRIC_VALUES
-        _METRIC_VALUES = [v for v in _METRIC_VALUES if v['metric_id'] != metric_id]
+        _METRIC_VALUES.delete(metric_id)
+        _wal_append('metric_del', {'id': metric_id})
 
 def extract_and_save_metrics(df):
     """
@@ -283,7 +697,7 @@ def extract_and_save_metrics(df):
     if df.empty or not _METRIC_DEFINITIONS:
         return 0
     
-    count = 0
+    new_values = []
     for m_id, m_def in _METRIC_DEFINITIONS.items():
         regex = m_def['regex']
         m_type = m_def['type']
@@ -299,21 +713,38 @@ def extract_and_save_metrics(df):
                 matches['value'] = 1.0
             
             for _, row in matches.iterrows():
-                _METRIC_VALUES.append({
+                new_values.append({
                     'metric_id': m_id,
-                    'timestamp': row['timestamp'],
-                    'value': row['value']
+                    'timestamp': str(row['timestamp']),
+                    'value': float(row['value'])
                 })
-                count += 1
-    return count
+    _METRIC_VALUES.extend(new_values)
+    _wal_append_many('metric_value', new_values)
+    return len(new_values)
 
-def get_metric_history(metric_id, days=7):
-    """Recupera o histórico de valores de uma métrica para visualização."""
-    if not _METRIC_VALUES:
-        return pd.DataFrame()
-    
-    values = [v for v in _METRIC_VALUES if v['metric_id'] == metric_id]
-    return pd.DataFrame(values)
+def get_metric_history(metric_id, days=7, resolution=None):
+    """
+    Recupera o histórico de valores de uma métrica para visualização.
+    Até um dia retorna os pontos brutos; períodos maiores vêm dos rollups
+    (1 minuto até uma semana, 1 hora acima disso), com count/sum/min/max e
+    `value` = soma (counter) ou média (gauge) do balde.
+    """
+    start_ns = utc_now_ns() - int(days * 86400 * 10**9)
+    if resolution is None:
+        series = _METRIC_VALUES.series.get(metric_id)
+        if days <= RAW_HISTORY_DAYS and series is not None and series.covers(start_ns):
+            resolution = 'raw'
+        else:
+            resolution = '1min' if days <= MINUTE_HISTORY_DAYS else '1h'
+
+    history = _METRIC_VALUES.history(metric_id, start_ns, resolution)
+    if history.empty:
+        return history
+    if resolution != 'raw':
+        is_gauge = _METRIC_DEFINITIONS.get(metric_id, {}).get('type') == 'gauge'
+        history['value'] = history['sum'] / history['count'] if is_gauge else history['sum']
+    history.insert(0, 'metric_id', metric_id)
+    return history
 
 def extract_rum_data(df):
     """
@@ -323,26 +754,80 @@ def extract_rum_data(df):
     
     # Regex simples para capturar vitals (LCP=123)
     rum_pattern = r'(LCP|CLS|INP|FID)[:=]\s*(\d+(?:\.\d+)?)'
+    df = df.reset_index(drop=True)
     extracted = df['message'].astype(str).str.extractall(rum_pattern)
     
-    count = 0
-    for idx, row in extracted.iterrows():
-        # idx[0] é o index do log original
-        log_idx = idx[0]
-        if log_idx in df.index:
-            ts = df.loc[log_idx, 'timestamp']
-            _RUM_EVENTS.append({
-                'timestamp': ts,
-                'type': 'vital',
-                'name': row[0],
-                'value': float(row[1]),
-                'url': 'Unknown'
-            })
-            count += 1
-    return count
+    # O primeiro nível do índice é a posição do log original
+    stamps = df['timestamp'].astype(str).to_numpy()[extracted.index.get_level_values(0)]
+    new_events = [
+        {'timestamp': ts, 'type': 'vital', 'name': name, 'value': float(value), 'url': 'Unknown'}
+        for ts, name, value in zip(stamps.tolist(), extracted[0].tolist(), extracted[1].tolist())
+    ]
+    _RUM_EVENTS.extend(new_events)
+    _wal_append_many('rum', new_events)
+    return len(new_events)
 
 def get_rum_stats(days=7):
-    """Recupera estatísticas de RUM do banco de dados."""
-    if not _RUM_EVENTS:
-        return pd.DataFrame()
-    return pd.DataFrame(_RUM_EVENTS)
+    """
+    Recupera os eventos brutos de RUM dos últimos `days` dias. Eventos brutos
+    são mantidos só por uma janela curta; para períodos longos use
+    get_rum_percentiles.
+    """
+    start_ns = utc_now_ns() - int(days * 86400 * 10**9)
+    events = pd.DataFrame(list(_RUM_EVENTS))
+    if events.empty:
+        return events
+    stamps = parse_timestamps_ns(events['timestamp'])
+    return events[(stamps == NAT_NS) | (stamps >= start_ns)].reset_index(drop=True)
+
+def get_rum_percentiles(days=7, quantiles=(0.5, 0.75, 0.95), per_minute=False):
+    """
+    Percentis dos Web Vitals dos últimos `days` dias, calculados a partir dos
+    sketches por minuto (erro relativo de ~1%). Retorna uma linha por vital
+    (ou por vital e minuto) com count, mean, min, max e p50/p75/p95.
+    """
+    start_ns = utc_now_ns() - int(days * 86400 * 10**9)
+    return _RUM_EVENTS.quantiles(start_ns, qs=quantiles, per_minute=per_minute)
+
+
+# --- Replay do WAL ---
+
+def _replay_ai_clear(payload):
+    _AI_CACHE.clear()
+
+def _replay_ai_feedback(payload):
+    if payload['hash'] in _AI_CACHE:
+        _AI_CACHE[payload['hash']]['feedback_score'] = payload['score']
+
+def _replay_setting(payload):
+    _SETTINGS[payload['key']] = payload['value']
+
+def _replay_ai(payload):
+    _AI_CACHE[payload['hash']] = payload['entry']
+
+def _replay_metric_value(payload):
+    _METRIC_VALUES.append(payload)
+
+def _replay_rum(payload):
+    _RUM_EVENTS.append(payload)
+
+def _replay_retention(payload):
+    _apply_retention(payload)
+
+def _replay_metric_delete(payload):
+    metric_id = int(payload['id'])
+    _METRIC_DEFINITIONS.pop(metric_id, None)
+    _METRIC_VALUES.delete(metric_id)
+
+_WAL_HANDLERS = {
+    'logs': _apply_logs,
+    'setting': _replay_setting,
+    'ai': _replay_ai,
+    'ai_feedback': _replay_ai_feedback,
+    'ai_clear': _replay_ai_clear,
+    'metric_def': _apply_metric_definition,
+    'metric_del': _replay_metric_delete,
+    'metric_value': _replay_metric_value,
+    'rum': _replay_rum,
+    'retention': _replay_retention,
+}
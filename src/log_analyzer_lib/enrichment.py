@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Colunas derivadas compartilhadas por versão do dataset.
+
+As análises (padrões, incidentes, padrões raros, comparação, stack traces,
+volume) recalculavam cada uma o texto da mensagem, o texto em minúsculas, a
+assinatura com números/UUIDs mascarados, o template, os campos extraídos por
+regex (latência, IPs, trace ids, HTTP) e o timestamp convertido. Aqui cada
+coluna derivada é calculada uma única vez, sob demanda, para o DataFrame
+inteiro e reaproveitada por todas as funções que recebem o mesmo DataFrame.
+
+A "versão" do dataset é o próprio objeto DataFrame (mais tamanho e dtypes de
+message/timestamp): um DataFrame novo (cópia, filtro, concat) ganha um cache
+novo; o cache some quando o DataFrame é coletado. Quem alterar message ou
+timestamp no mesmo objeto deve chamar invalidate().
+"""
+import weakref
+import numpy as np
+import pandas as pd
+
+from .log_parser import NUM_PATTERN, UUID_PATTERN
+from .template_miner import TemplateMiner
+from .field_extraction import extract_fields
+from .timestamps import ns_to_datetime, parse_timestamps_ns
+
+_CACHE = {}     # id(DataFrame) -> DatasetEnrichment
+
+
+def _text(enrichment, df):
+    return df['message'].astype(str)
+
+
+def _lower(enrichment, df):
+    return enrichment['text'].str.lower()
+
+
+def _signature(enrichment, df):
+    """Números e UUIDs mascarados (agrupamento de mensagens similares)."""
+    sigs = enrichment['text'].str.replace(NUM_PATTERN, '<NUM>', regex=True)
+    return sigs.str.replace(UUID_PATTERN, '<UUID>', regex=True)
+
+
+def _template_id(enrichment, df):
+    """
+    Id do template no minerador do próprio dataset (ver template_miner.py): as
+    análises são só leitura e não treinam o minerador do processo.
+    """
+    return pd.Series(enrichment.miner.add_messages(enrichment['text'].to_numpy()), index=df.index)
+
+
+def _template(enrichment, df):
+    return pd.Series(enrichment.miner.templates_of(enrichment['template_id'].to_numpy()), index=df.index)
+
+
+def _fields(enrichment, df):
+    """Campos da extração em passada única (ExtractedFields, por posição; ver field_extraction.py)."""
+    return extract_fields(enrichment['text'].tolist())
+
+
+def _timestamp(enrichment, df):
+    """Timestamp em UTC (sem fuso): coluna timestamp_ns do process_log_data quando existir, sem reconverter."""
+    if 'timestamp_ns' in df.columns:
+        return ns_to_datetime(df['timestamp_ns'], index=df.index)
+    return ns_to_datetime(parse_timestamps_ns(df['timestamp']), index=df.index)
+
+
+DERIVED_COLUMNS = {
+    'text': _text,
+    'lower': _lower,
+    'signature': _signature,
+    'template_id': _template_id,
+    'template': _template,
+    'fields': _fields,
+    'timestamp': _timestamp
+}
+
+
+def _version(df):
+    dtypes = tuple(str(df[col].dtype) if col in df.columns else None for col in ('message', 'timestamp'))
+    return (len(df), dtypes)
+
+
+class DatasetEnrichment:
+    """Colunas derivadas de um DataFrame, alinhadas ao seu índice."""
+
+    def __init__(self, df):
+        self._df = weakref.ref(df)
+        self.version = _version(df)
+        self.columns = {}
+        self.miner = TemplateMiner()    # Ids de template válidos só para este dataset
+
+    def __getitem__(self, name):
+        series = self.columns.get(name)
+        if series is None:
+            df = self._df()
+            if df is None:
+                raise ReferenceError("DataFrame do cache de enriquecimento já foi coletado.")
+            series = self.columns[name] = DERIVED_COLUMNS[name](self, df)
+        return series
+
+    def take(self, name, mask):
+        """Coluna derivada só nas linhas de `mask` (posicional; funciona com índices duplicados)."""
+        return self[name].iloc[np.flatnonzero(np.asarray(mask))]
+
+
+def enrich(df):
+    """Cache de colunas derivadas do DataFrame (criado na primeira chamada)."""
+    key = id(df)
+    entry = _CACHE.get(key)
+    if entry is None or entry._df() is not df or entry.version != _version(df):
+        entry = _CACHE[key] = DatasetEnrichment(df)
+        weakref.finalize(df, _discard, key, entry)
+    return entry
+
+
+def _discard(key, entry):
+    if _CACHE.get(key) is entry:
+        del _CACHE[key]
+
+
+def invalidate(df):
+    """Descarta as colunas derivadas de `df` (após alterar message/timestamp no lugar)."""
+    _CACHE.pop(id(df), None)
+
+
+def timestamp_frame(df):
+    """DataFrame só com o timestamp convertido e sem nulos (base das séries de volume)."""
+    return pd.DataFrame({'timestamp': enrich(df)['timestamp']}).dropna(subset=['timestamp'])
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Extração de campos em passada única.
+
+Latência, IPs, UUIDs, TraceId W3C, método/endpoint HTTP, RequestPath, status
+e hosts de URLs eram extraídos por regexes separadas, cada uma percorrendo o
+DataFrame inteiro a cada análise (~12 passadas por dataset). Aqui uma única
+passada visita cada mensagem uma vez e aplica o conjunto de padrões, gerando
+uma tabela tipada que as análises consomem (via enrichment.py, uma vez por
+versão do dataset).
+
+Cada padrão só roda nas mensagens que contêm a sua palavra-chave (teste de
+substring no texto em minúsculas, bem mais barato que a regex). Uma regex
+única com todas as alternativas em lookahead foi medida e ficou mais lenta:
+o lookahead desliga a busca por prefixo literal do módulo re. O resultado é o
+mesmo das regexes separadas: primeira ocorrência para os campos de valor
+único (como str.extract) e todas as ocorrências para IPs e hosts (como
+str.findall).
+"""
+import re
+import numpy as np
+import pandas as pd
+
+# Campo -> regex (mesmos padrões que as análises usavam)
+FIELD_PATTERNS = {
+    'latency': re.compile(r'(?:duration|time|took)[:=]\s*(\d+(?:\.\d+)?)(?:\s*(ms|s|us|µs))?', re.IGNORECASE),
+    'trace': re.compile(r'TraceId[:=]\s*([a-f0-9]{32})', re.IGNORECASE),
+    'request_path': re.compile(r'RequestPath[:=]\s*([^\s,"]+)', re.IGNORECASE),
+    'method': re.compile(r'(GET|POST|PUT|DELETE|PATCH|HEAD|OPTIONS)\s+([^\s?]+)', re.IGNORECASE),
+    'status': re.compile(r'(?:^|\s|status[:=]\s*)([1-5]\d{2})(?:\s|$)', re.IGNORECASE),
+    'uuid': re.compile(r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})', re.IGNORECASE),
+    'ip': re.compile(r'(?<!\d)\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}(?!\d)'),
+    'url': re.compile(r'https?://([\w\-\.]+)(?::\d+)?'),
+}
+_DIGIT = re.compile(r'\d')     # Status, latência e IP exigem dígito
+
+
+def _latency_ms(value, unit):
+    latency = float(value)
+    if unit == 's':
+        latency *= 1000
+    elif unit in ('us', 'µs'):
+        latency /= 1000
+    return latency
+
+
+class ExtractedFields:
+    """
+    Campos extraídos de um conjunto de mensagens, por posição.
+    `rows`: DataFrame com latency_ms, uuid, w3c_trace_id, method, endpoint,
+    request_path e status_code (NaN/None quando ausente).
+    `ips` / `hosts`: tabelas longas (row, ip) / (row, host), na ordem das mensagens.
+    """
+
+    def __init__(self, rows, ips, hosts):
+        self.rows = rows
+        self.ips = ips
+        self.hosts = hosts
+
+
+def extract_fields(messages):
+    """Percorre as mensagens uma única vez e extrai todos os campos."""
+    n = len(messages)
+    latency = np.full(n, np.nan)
+    single = {name: [None] * n for name in ('uuid', 'w3c_trace_id', 'method', 'endpoint', 'request_path', 'status_code')}
+    uuid, trace, method, endpoint = single['uuid'], single['w3c_trace_id'], single['method'], single['endpoint']
+    request_path, status = single['request_path'], single['status_code']
+    ip_rows, ips, host_rows, hosts = [], [], [], []
+
+    latency_re, trace_re, request_path_re = FIELD_PATTERNS['latency'], FIELD_PATTERNS['trace'], FIELD_PATTERNS['request_path']
+    method_re, status_re, uuid_re = FIELD_PATTERNS['method'], FIELD_PATTERNS['status'], FIELD_PATTERNS['uuid']
+    ip_re, url_re = FIELD_PATTERNS['ip'], FIELD_PATTERNS['url']
+    has_digit = _DIGIT.search
+    for i, text in enumerate(messages):
+        # Cada padrão só roda se a mensagem tiver a palavra-chave/caractere que ele exige
+        low = text.lower()
+        if has_digit(text):
+            m = status_re.search(text)
+            if m:
+                status[i] = m.group(1)
+            if 'time' in low or 'took' in low or 'duration' in low:
+                m = latency_re.search(text)
+                if m:
+                    latency[i] = _latency_ms(m.group(1), m.group(2))
+            if '.' in text:
+                found = ip_re.findall(text)
+                if found:
+                    ip_rows.extend([i] * len(found))
+                    ips.extend(found)
+        if 'traceid' in low:
+            m = trace_re.search(text)
+            if m:
+                trace[i] = m.group(1)
+        if 'requestpath' in low:
+            m = request_path_re.search(text)
+            if m:
+                request_path[i] = m.group(1)
+        if ('get' in low or 'post' in low or 'put' in low or 'delete' in low or 'patch' in low
+                or 'head' in low or 'options' in low):
+            m = method_re.search(text)
+            if m:
+                method[i] = m.group(1).upper()
+                endpoint[i] = m.group(2)
+        if '-' in text:
+            m = uuid_re.search(text)
+            if m:
+                uuid[i] = m.group(1)
+        if 'http' in low:
+            found = url_re.findall(text)
+            if found:
+                host_rows.extend([i] * len(found))
+                hosts.extend(found)
+
+    rows = pd.DataFrame({'latency_ms': latency, **{name: pd.Series(values, dtype=object) for name, values in single.items()}})
+    return ExtractedFields(
+        rows,
+        pd.DataFrame({'row': np.asarray(ip_rows, dtype=np.int64), 'ip': pd.Series(ips, dtype=object)}),
+        pd.DataFrame({'row': np.asarray(host_rows, dtype=np.int64), 'host': pd.Series(hosts, dtype=object)})
+    )
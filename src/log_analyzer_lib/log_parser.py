@@ -6,6 +6,10 @@ import re
 import numpy as np
 import json
 
+from .categorization import UNCATEGORIZED, get_engine
+from .structured_fields import loads
+from .template_miner import TemplateMiner
+
 # --- Regex Pré-compiladas para Performance ---
 CPF_PATTERN = re.compile(r'\d{3}\.\d{3}\.\d{3}-\d{2}')
 EMAIL_PATTERN = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
@@ -13,6 +17,23 @@ IP_PATTERN = re.compile(r'(?<!\d)\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}(?!\d)')
 NUM_PATTERN = re.compile(r'\d+')
 UUID_PATTERN = re.compile(r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})', re.IGNORECASE)
 
+# Tabela de códigos estável dos níveis de log (extras entram ordenados no fim)
+LOG_LEVEL_CATEGORIES = ['Critical', 'Debug', 'Error', 'Fail', 'Fatal', 'Info', 'Warning', 'Não identificado']
+LEVEL_KEYWORDS = {'fail:': 'Fail', 'error:': 'Error', 'warning:': 'Warning'}
+LOG_LEVEL_PATTERN = r'(?i)"?LogLevel"?\s*[:=]\s*"?(\w+)"?'
+
+try:
+    import pyarrow  # noqa: F401
+    MESSAGE_DTYPE = 'string[pyarrow]'
+except ImportError:
+    MESSAGE_DTYPE = object
+
+def _as_categorical(values, categories):
+    """Converte para categórico com a tabela `categories` + valores extras ordenados no fim."""
+    values = pd.Series(values)
+    extras = sorted(set(values.dropna().unique()) - set(categories), key=str)
+    return pd.Categorical(values, categories=list(categories) + extras)
+
 def process_log_data(df, config):
     """
     Processa um DataFrame de logs, adicionando colunas de categoria, nível de log e tamanho da mensagem.
@@ -30,48 +51,56 @@ def process_log_data(df, config):
     df_proc['message'] = df_proc['message'].astype(str)
     
     df_proc['message_length'] = df_proc['message'].str.len()
-    df_proc['log_level'] = extract_log_level(df_proc)
-    df_proc['category'] = categorize_log(df_proc, config)
-    
+
+    # Nível e categoria saem de uma única passada do motor de categorização
+    engine = get_engine(config, LEVEL_KEYWORDS)
+    bits, level_hits, has_loglevel = engine.scan(df_proc['message'].tolist())
+    levels = _levels_from_scan(df_proc['message'], engine, level_hits, has_loglevel)
+
+    # Colunas de baixa cardinalidade como categóricos com tabelas estáveis
+    df_proc['log_level'] = _as_categorical(levels, LOG_LEVEL_CATEGORIES)
+    codes = engine.assign_categories(bits, df_proc['log_level'].str.lower())
+    df_proc['category'] = pd.Categorical.from_codes(codes, categories=engine.category_names)
+    df_proc['source'] = df_proc['source'].astype('category')
+    df_proc['message'] = df_proc['message'].astype(MESSAGE_DTYPE)
+
     output_cols = ['timestamp', 'source', 'message', 'category', 'log_level', 'message_length']
-    return df_proc[output_cols], df_proc['category'].value_counts().to_dict()
+    counts = df_proc['category'].value_counts()
+    return df_proc[output_cols], counts[counts > 0].to_dict()
 
 def categorize_log(df, config):
     """
     Categoriza logs com base em keywords e níveis de log definidos no arquivo de configuração.
     """
-    categories = pd.Series('Não categorizado', index=df.index)
     if 'categories' not in config:
-        return categories
-
-    for cat in config['categories']:
-        cat_mask = pd.Series(False, index=df.index)
-        if 'log_levels' in cat:
-            cat_mask |= df['log_level'].astype(str).str.lower().isin([l.lower() for l in cat['log_levels']])
-        if 'keywords' in cat:
-            pattern = '|'.join(map(re.escape, cat.get('keywords', [])))
-            cat_mask |= df['message'].astype(str).str.contains(pattern, case=False, regex=True, na=False)
-        
-        categories[cat_mask & (categories == 'Não categorizado')] = cat['name']
-    return categories
+        return pd.Series(UNCATEGORIZED, index=df.index)
+
+    engine = get_engine(config, LEVEL_KEYWORDS)
+    bits, _, _ = engine.scan(df['message'].astype(str).tolist())
+    codes = engine.assign_categories(bits, df['log_level'].astype(str).str.lower())
+    return pd.Series(np.array(engine.category_names, dtype=object)[codes], index=df.index)
 
 def extract_log_level(df):
     """
     Extrai o nível de log das mensagens de forma vetorizada para performance.
     """
-    levels = pd.Series('Não Identificado', index=df.index)
-    extracted = df['message'].astype(str).str.extract(r'(?i)"?LogLevel"?\s*[:=]\s*"?(\w+)"?', expand=False)
-    levels[extracted.notna()] = extracted[extracted.notna()]
-    
-    msg_lower = df['message'].astype(str).str.lower()
-    for key, label in {'fail:': 'Fail', 'error:': 'Error', 'warning:': 'Warning'}.items():
-        mask = (levels == 'Não Identificado') & msg_lower.str.contains(key, regex=False)
-        levels[mask] = label
-        
-    return levels.astype(str).str.capitalize()
+    messages = df['message'].astype(str)
+    engine = get_engine({}, LEVEL_KEYWORDS)
+    _, level_hits, has_loglevel = engine.scan(messages.tolist())
+    return _levels_from_scan(messages, engine, level_hits, has_loglevel)
+
+def _levels_from_scan(messages, engine, level_hits, has_loglevel):
+    """LogLevel explícito (regex só nas linhas que citam LogLevel), senão a keyword de nível."""
+    levels = pd.Series('Não Identificado', index=messages.index, dtype=object)
+    if has_loglevel.any():
+        extracted = messages[has_loglevel].str.extract(LOG_LEVEL_PATTERN, expand=False).dropna()
+        levels[extracted.index] = extracted
+    unknown = (levels == 'Não Identificado').to_numpy()
+    levels[unknown] = engine.level_from_keywords(level_hits[unknown], 'Não Identificado')
+    return levels.str.capitalize()
 
 def mask_sensitive_data(df):
-    """Ofusca dados sensíveis (CPF, email, IP) para conformidade com LGPD."""
+    """Ofusca dados sensíveis (CPF, email, IP) para conformidade com LGPD; devolve uma cópia."""
     if df.empty: return df
     df_masked = df.copy()
     msg = df_masked['message'].astype(str)
@@ -83,27 +112,26 @@ def mask_sensitive_data(df):
 
 def parse_log_entry(message):
     """Tenta decodificar uma mensagem de log como JSON, senão a retorna como texto."""
-    try:
-        return json.loads(message)
-    except (json.JSONDecodeError, TypeError):
-        return {'message_text': str(message)}
+    parsed = loads(message) if isinstance(message, (str, bytes)) else None
+    return parsed if parsed is not None else {'message_text': str(message)}
 
 def generate_log_patterns(df):
     """Gera padrões de log para agrupar mensagens similares."""
     if df.empty: return pd.DataFrame()
     
-    sigs = df['message'].astype(str).str.replace(NUM_PATTERN, '[NUM]', regex=True)
-    sigs = sigs.str.replace(UUID_PATTERN, '[UUID]', regex=True)
-    df['signature'] = sigs.str.slice(0, 200)
+    miner = TemplateMiner()     # Minerador do dataset: a análise não treina o do processo
+    df['template_id'] = miner.add_messages(df['message'].astype(str).to_numpy())
     
-    patterns = df.groupby('signature').agg(
+    patterns = df.groupby('template_id').agg(
         count=('timestamp', 'size'),
         first_seen=('timestamp', 'min'),
         last_seen=('timestamp', 'max'),
         example_message=('message', 'first'),
         log_level=('log_level', 'first'),
         sources=('source', lambda x: list(set(x)))
-    ).reset_index().sort_values('count', ascending=False)
+    ).reset_index()
+    patterns.insert(0, 'signature', miner.templates_of(patterns['template_id']))
+    patterns = patterns.sort_values('count', ascending=False)
     
     patterns['percent'] = (patterns['count'] / len(df)) * 100
     return patterns
\ No newline at end of file
@@ -0,0 +1,616 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento colunar dos logs coletados.
+
+Os logs ficam em partições temporais (uma por hora) formadas por blocos de
+colunas: timestamps em int64, códigos de source, offsets para um blob de
+mensagens e digests MD5 binários de 16 bytes. Blocos gravados em snapshot são
+abertos via memory-map, então carregar 100k+ logs custa praticamente o mesmo
+que carregar 10.
+
+O estado de deduplicação também é por partição (digests + filtro de Bloom) e
+expira junto com ela, sem reconstruções globais.
+"""
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from .search_index import InvertedIndex, TrigramIndex, evaluate
+from .bloom import ScalableBloomFilter, DEFAULT_FP_RATE
+from .message_templates import TemplateDictionary
+from .timestamps import NAT_NS, parse_timestamps_ns
+
+HASH_DTYPE = 'S16'
+PARTITION_NS = 3600 * 10**9     # Uma partição por hora
+MAX_PARTITION_BLOCKS = 16       # Lotes pequenos são fundidos a partir deste número de blocos
+
+_BLOCK_ARRAYS = ('ts_ns', 'source_codes', 'msg_offsets', 'ts_offsets', 'ingested_ns', 'hashes', 'hash_order')
+_BLOCK_BLOBS = ('msg_blob', 'ts_blob')
+
+
+def _encode_strings(values):
+    """Codifica uma lista de strings como (offsets int64, blob utf-8)."""
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum(np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _decode_strings(offsets, blob, idx):
+    """Decodifica as strings nas posições `idx` de uma coluna (offsets, blob)."""
+    starts = offsets[idx]
+    ends = offsets[np.asarray(idx) + 1]
+    return [bytes(blob[s:e]).decode('utf-8') for s, e in zip(starts.tolist(), ends.tolist())]
+
+
+class LogBlock:
+    """Bloco imutável de logs em formato colunar (em memória ou mapeado do disco)."""
+
+    def __init__(self, ts_ns, source_codes, msg_offsets, msg_blob, ts_offsets, ts_blob, ingested_ns, hashes,
+                 hash_order=None, msg_templates=None, templates=None):
+        self.ts_ns = ts_ns
+        self.source_codes = source_codes
+        self.msg_offsets = msg_offsets
+        self.msg_blob = msg_blob
+        self.ts_offsets = ts_offsets
+        self.ts_blob = ts_blob
+        self.ingested_ns = ingested_ns
+        self.hashes = hashes
+        # Permutação que ordena os digests (4 bytes/log em vez de uma cópia ordenada de 16)
+        self.hash_order = np.argsort(hashes).astype(np.uint32) if hash_order is None else hash_order
+        # Modo template: msg_offsets/msg_blob guardam os parâmetros e msg_templates o id do template
+        self.msg_templates = msg_templates
+        self.templates = templates
+
+    def __len__(self):
+        return len(self.ts_ns)
+
+    @classmethod
+    def from_columns(cls, ts_text, source_codes, messages, ingested_ns, hashes, ts_ns=None, templates=None):
+        msg_templates = None
+        if templates is not None:
+            msg_templates, messages = templates.encode(messages)
+        msg_offsets, msg_blob = _encode_strings(messages)
+        ts_offsets, ts_blob = _encode_strings(ts_text)
+        return cls(
+            ts_ns=parse_timestamps_ns(ts_text) if ts_ns is None else np.asarray(ts_ns, dtype=np.int64),
+            source_codes=np.asarray(source_codes, dtype=np.int32),
+            msg_offsets=msg_offsets, msg_blob=msg_blob,
+            ts_offsets=ts_offsets, ts_blob=ts_blob,
+            ingested_ns=np.asarray(ingested_ns, dtype=np.int64),
+            hashes=np.asarray(hashes, dtype=HASH_DTYPE),
+            msg_templates=msg_templates, templates=templates
+        )
+
+    def with_templates(self, templates):
+        """Mesmo bloco com as mensagens no modo template (blocos antigos em texto puro)."""
+        if self.msg_templates is not None or templates is None:
+            return self
+        idx = np.arange(len(self))
+        return LogBlock.from_columns(
+            self.timestamps_text(idx), np.asarray(self.source_codes), self.messages(idx),
+            np.asarray(self.ingested_ns), np.asarray(self.hashes), ts_ns=np.asarray(self.ts_ns), templates=templates
+        )
+
+    @classmethod
+    def concat(cls, blocks):
+        """Concatena blocos em um único bloco (usado ao gravar snapshots)."""
+        blocks = [b for b in blocks if len(b)]
+        if not blocks:
+            return cls.from_columns([], [], [], [], [])
+        if len(blocks) == 1:
+            return blocks[0]
+        templates = next((b.templates for b in blocks if b.msg_templates is not None), None)
+        blocks = [b.with_templates(templates) for b in blocks]
+
+        def _concat_strings(offsets_list, blobs):
+            shift = np.cumsum([0] + [len(b) for b in blobs[:-1]])
+            parts = [offsets_list[0]] + [o[1:] + s for o, s in zip(offsets_list[1:], shift[1:])]
+            return np.concatenate(parts), np.concatenate(blobs)
+
+        msg_offsets, msg_blob = _concat_strings([b.msg_offsets for b in blocks], [b.msg_blob for b in blocks])
+        ts_offsets, ts_blob = _concat_strings([b.ts_offsets for b in blocks], [b.ts_blob for b in blocks])
+        return cls(
+            ts_ns=np.concatenate([b.ts_ns for b in blocks]),
+            source_codes=np.concatenate([b.source_codes for b in blocks]),
+            msg_offsets=msg_offsets, msg_blob=msg_blob,
+            ts_offsets=ts_offsets, ts_blob=ts_blob,
+            ingested_ns=np.concatenate([b.ingested_ns for b in blocks]),
+            hashes=np.concatenate([b.hashes for b in blocks]),
+            msg_templates=np.concatenate([b.msg_templates for b in blocks]) if templates is not None else None,
+            templates=templates
+        )
+
+    def contains(self, digests):
+        """Teste de pertinência vetorizado (busca binária nos digests ordenados)."""
+        digests = np.asarray(digests, dtype=HASH_DTYPE)
+        if not len(self.hashes) or not len(digests):
+            return np.zeros(len(digests), dtype=bool)
+        order = np.asarray(self.hash_order)
+        pos = np.searchsorted(self.hashes, digests, sorter=order)
+        pos[pos >= len(order)] = 0
+        return np.asarray(self.hashes[order[pos]]) == digests
+
+    @property
+    def nbytes(self):
+        total = sum(getattr(self, name).nbytes for name in _BLOCK_ARRAYS + _BLOCK_BLOBS)
+        return total + (0 if self.msg_templates is None else self.msg_templates.nbytes)
+
+    def messages(self, idx):
+        if self.msg_templates is None:
+            return _decode_strings(self.msg_offsets, self.msg_blob, idx)
+        return self.templates.decode(self.msg_templates[idx], _decode_strings(self.msg_offsets, self.msg_blob, idx))
+
+    def timestamps_text(self, idx):
+        return _decode_strings(self.ts_offsets, self.ts_blob, idx)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in _BLOCK_ARRAYS + _BLOCK_BLOBS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        if self.msg_templates is not None:
+            np.save(os.path.join(path, "msg_templates.npy"), self.msg_templates)
+
+    @classmethod
+    def load(cls, path, mmap=True, templates=None):
+        mode = 'r' if mmap else None
+        arrays = {}
+        for name in _BLOCK_ARRAYS + _BLOCK_BLOBS + ('msg_templates',):
+            file = os.path.join(path, f"{name}.npy")
+            # Snapshots antigos gravavam a cópia ordenada dos digests no lugar da permutação;
+            # msg_templates só existe em blocos gravados no modo template
+            if name in ('hash_order', 'msg_templates') and not os.path.exists(file):
+                continue
+            arrays[name] = np.load(file, mmap_mode=mode)
+        return cls(templates=templates, **arrays)
+
+
+class LogPartition:
+    """
+    Partição temporal (uma hora por padrão) formada por blocos colunares
+    imutáveis. Cada lote ingerido vira um bloco; os blocos são fundidos quando
+    passam de MAX_PARTITION_BLOCKS ou quando a partição é lida por inteiro.
+    """
+
+    def __init__(self, key, fp_rate=DEFAULT_FP_RATE, templates=None):
+        self.key = key
+        self.fp_rate = fp_rate
+        self.templates = templates  # Dicionário de templates do LogStore (modo template)
+        self._blocks = []
+        self.min_ts = None
+        self.max_ts = None
+        self.source_path = None     # Diretório de origem enquanto não houver alterações
+        self._lazy = None           # (caminho, linhas, mmap) de um bloco ainda não aberto
+        self._lazy_bytes = 0        # Tamanho do bloco ainda não aberto
+        self._index = None          # Índice invertido, carregado/construído sob demanda
+        self._trigrams = None       # Índice de trigramas, idem
+        self._bloom = None          # Filtro de Bloom dos digests, idem
+
+    @property
+    def blocks(self):
+        """Blocos da partição; o bloco do snapshot só é mapeado no primeiro acesso."""
+        if self._lazy is not None:
+            path, _, mmap = self._lazy
+            self._lazy = None
+            self._blocks.append(LogBlock.load(path, mmap=mmap, templates=self.templates))
+        return self._blocks
+
+    @blocks.setter
+    def blocks(self, value):
+        self._lazy = None
+        self._blocks = value
+
+    @property
+    def index(self):
+        """Índice invertido das mensagens; vem do snapshot ou é reconstruído uma vez."""
+        if self._index is None:
+            if InvertedIndex.exists(self.source_path):
+                self._index = InvertedIndex.load(self.source_path)
+            else:
+                block = self.block()
+                self._index = InvertedIndex.from_messages(block.messages(np.arange(len(block))))
+        return self._index
+
+    @property
+    def trigrams(self):
+        """Índice de trigramas das mensagens; vem do snapshot ou é reconstruído uma vez."""
+        if self._trigrams is None:
+            if TrigramIndex.exists(self.source_path):
+                self._trigrams = TrigramIndex.load(self.source_path)
+            else:
+                block = self.block()
+                self._trigrams = TrigramIndex.from_messages(block.messages(np.arange(len(block))))
+        return self._trigrams
+
+    @property
+    def bloom(self):
+        """Filtro de Bloom dos digests; vem do snapshot ou é reconstruído uma vez."""
+        if self._bloom is None:
+            if ScalableBloomFilter.exists(self.source_path):
+                self._bloom = ScalableBloomFilter.load(self.source_path)
+            else:
+                self._bloom = ScalableBloomFilter(fp_rate=self.fp_rate)
+                for block in self.blocks:
+                    self._bloom.add_many(block.hashes)
+        return self._bloom
+
+    def __len__(self):
+        if self._lazy is not None:
+            return self._lazy[1] + sum(len(b) for b in self._blocks)
+        return sum(len(b) for b in self._blocks)
+
+    @property
+    def nbytes(self):
+        """Tamanho das colunas da partição (sem abrir o bloco do snapshot)."""
+        lazy = self._lazy_bytes if self._lazy is not None else 0
+        return lazy + sum(b.nbytes for b in self._blocks)
+
+    def memory_usage(self):
+        """Bytes por estrutura: colunas dos logs, digests (+ filtro de Bloom) e índices de busca."""
+        hashes = sum(b.hashes.nbytes + b.hash_order.nbytes for b in self._blocks)
+        usage = {
+            'logs': self.nbytes - hashes,
+            'hashes': hashes + (self._bloom.memory_bytes() if self._bloom is not None else 0),
+            'indexes': sum(i.memory_bytes() for i in (self._index, self._trigrams) if i is not None)
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def _update_bounds(self, ts_ns):
+        valid = ts_ns[ts_ns != NAT_NS]
+        if len(valid):
+            lo, hi = int(valid.min()), int(valid.max())
+            self.min_ts = lo if self.min_ts is None else min(self.min_ts, lo)
+            self.max_ts = hi if self.max_ts is None else max(self.max_ts, hi)
+
+    def overlaps(self, start_ns, end_ns):
+        if self.min_ts is None:
+            return False
+        return self.max_ts >= start_ns and self.min_ts <= end_ns
+
+    def contains(self, digests):
+        """
+        Teste vetorizado: quais digests (16 bytes) já estão armazenados na partição.
+        O filtro de Bloom descarta os logs novos; só os positivos tocam os digests.
+        """
+        digests = np.asarray(digests, dtype=HASH_DTYPE)
+        found = np.zeros(len(digests), dtype=bool)
+        maybe = np.flatnonzero(self.bloom.might_contain(digests))
+        if not len(maybe):
+            return found
+        hits = np.zeros(len(maybe), dtype=bool)
+        for block in self.blocks:
+            hits |= block.contains(digests[maybe])
+        found[maybe] = hits
+        return found
+
+    def append_block(self, block, messages):
+        """Anexa um lote já deduplicado e atualiza os índices de busca."""
+        # Os índices anteriores precisam existir antes do lote entrar na partição
+        index, trigrams, bloom = self.index, self.trigrams, self.bloom
+        start = len(self)
+        self.add_block(block)
+        self.source_path = None
+        rows = np.arange(start, start + len(block))
+        index.add_many(rows, messages)
+        trigrams.add_many(rows, messages)
+        bloom.add_many(block.hashes)
+        if len(self._blocks) > MAX_PARTITION_BLOCKS:
+            self.blocks = [LogBlock.concat(self._blocks)]
+
+    def add_block(self, block):
+        self.blocks.append(block)
+        self._update_bounds(np.asarray(block.ts_ns))
+
+    def block(self):
+        """Retorna a partição inteira como um único bloco (funde os blocos)."""
+        if len(self.blocks) > 1:
+            self.blocks = [LogBlock.concat(self.blocks)]
+        return self.blocks[0] if self.blocks else LogBlock.concat([])
+
+    def save(self, path):
+        """Grava a partição; partições intactas desde o load são reaproveitadas via hard link."""
+        if self.source_path and (self._lazy is not None or len(self._blocks) == 1):
+            os.makedirs(path, exist_ok=True)
+            for name in os.listdir(self.source_path):
+                src = os.path.join(self.source_path, name)
+                dst = os.path.join(path, name)
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copyfile(src, dst)
+            if self._index is not None and not InvertedIndex.exists(path):
+                self._index.save(path)
+            if self._trigrams is not None and not TrigramIndex.exists(path):
+                self._trigrams.save(path)
+            if self._bloom is not None and not ScalableBloomFilter.exists(path):
+                self._bloom.save(path)
+        else:
+            self.block().save(path)
+            self.index.save(path)
+            self.trigrams.save(path)
+            self.bloom.save(path)
+
+    def describe(self):
+        return {'key': self.key, 'rows': len(self), 'bytes': self.nbytes, 'min_ts': self.min_ts, 'max_ts': self.max_ts}
+
+    @classmethod
+    def load(cls, info, path, mmap=True, fp_rate=DEFAULT_FP_RATE, templates=None):
+        """Registra a partição do snapshot sem abrir os arquivos (abertura sob demanda)."""
+        part = cls(info['key'], fp_rate=fp_rate, templates=templates)
+        part.min_ts = info['min_ts']
+        part.max_ts = info['max_ts']
+        part.source_path = path
+        part._lazy = (path, info['rows'], mmap)
+        part._lazy_bytes = info.get('bytes', 0)
+        return part
+
+
+class LogStore:
+    """
+    Logs organizados em partições temporais colunares. Os timestamps são
+    convertidos para int64 uma única vez, na ingestão, e as consultas por
+    período só tocam as partições que se sobrepõem ao intervalo pedido.
+    """
+
+    def __init__(self, partition_ns=PARTITION_NS, dedup_fp_rate=DEFAULT_FP_RATE, message_storage='plain'):
+        self.partition_ns = partition_ns
+        self.dedup_fp_rate = dedup_fp_rate
+        # 'plain' guarda o texto das mensagens; 'templates' guarda (template, parâmetros)
+        self.templates = TemplateDictionary() if message_storage == 'templates' else None
+        self.sources = []           # código -> nome do source
+        self._source_codes = {}     # nome do source -> código
+        self.partitions = {}        # chave (início da janela // partition_ns) -> LogPartition
+
+    def __len__(self):
+        return sum(len(p) for p in self.partitions.values())
+
+    def source_code(self, source):
+        code = self._source_codes.get(source)
+        if code is None:
+            code = len(self.sources)
+            self.sources.append(source)
+            self._source_codes[source] = code
+        return code
+
+    def append_batch(self, ts_text, ts_ns, sources, messages, ingested_ns, digests):
+        """
+        Anexa um lote de logs de forma vetorizada, ignorando duplicatas. Como o hash
+        inclui o timestamp, um duplicado sempre cai na mesma partição, então só ela
+        é consultada. A exceção são os logs sem timestamp válido: ficam na partição
+        do horário de ingestão, que muda a cada reingestão, e por isso são
+        conferidos contra todas as partições. Cada partição tocada recebe o seu
+        trecho como um bloco colunar. Retorna os índices (no lote) dos logs aceitos.
+        """
+        n = len(digests)
+        if not n:
+            return np.empty(0, dtype=np.int64)
+        digests = np.asarray(digests, dtype=HASH_DTYPE)
+        ts = np.asarray(ts_ns, dtype=np.int64)
+        ingested = np.broadcast_to(np.asarray(ingested_ns, dtype=np.int64), (n,))
+        # Logs sem timestamp válido ficam na partição do horário de ingestão
+        keys = np.where(ts == NAT_NS, ingested, ts) // self.partition_ns
+
+        # Duplicatas dentro do próprio lote: mantém a primeira ocorrência
+        _, first = np.unique(digests, return_index=True)
+        candidates = np.sort(first)
+        candidates = candidates[~self._stored_elsewhere(digests, candidates[ts[candidates] == NAT_NS], candidates)]
+        if not len(candidates):
+            return np.empty(0, dtype=np.int64)
+
+        factor, uniques = pd.factorize(np.asarray(sources, dtype=object))
+        codes = np.array([self.source_code(s) for s in uniques], dtype=np.int32)[factor]
+        ts_text = np.asarray(ts_text, dtype=object)
+        messages = np.asarray(messages, dtype=object)
+
+        accepted = []
+        order = candidates[np.argsort(keys[candidates], kind='stable')]
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for sel in np.split(order, bounds):
+            key = int(keys[sel[0]])
+            part = self.partitions.get(key)
+            if part is None:
+                part = self.partitions[key] = LogPartition(key, fp_rate=self.dedup_fp_rate, templates=self.templates)
+            else:
+                sel = sel[~part.contains(digests[sel])]
+                if not len(sel):
+                    continue
+            batch_messages = messages[sel].tolist()
+            part.append_block(LogBlock.from_columns(
+                ts_text[sel].tolist(), codes[sel], batch_messages,
+                ingested[sel], digests[sel], ts_ns=ts[sel], templates=self.templates
+            ), batch_messages)
+            accepted.append(sel)
+        return np.sort(np.concatenate(accepted)) if accepted else np.empty(0, dtype=np.int64)
+
+    def _stored_elsewhere(self, digests, nat, candidates):
+        """Máscara (sobre `candidates`) dos logs sem timestamp já presentes em qualquer partição."""
+        stored = np.zeros(len(candidates), dtype=bool)
+        if not len(nat) or not self.partitions:
+            return stored
+        found = np.zeros(len(nat), dtype=bool)
+        for part in self.partitions.values():
+            pending = np.flatnonzero(~found)
+            if not len(pending):
+                break
+            found[pending] = part.contains(digests[nat[pending]])
+        stored[np.isin(candidates, nat[found])] = True
+        return stored
+
+    def keys(self, start_ns=None, end_ns=None):
+        """Chaves das partições (em ordem cronológica) que se sobrepõem ao intervalo."""
+        keys = sorted(self.partitions)
+        if start_ns is None and end_ns is None:
+            return keys
+        start_ns = NAT_NS + 1 if start_ns is None else start_ns
+        end_ns = np.iinfo(np.int64).max if end_ns is None else end_ns
+        return [k for k in keys if self.partitions[k].overlaps(start_ns, end_ns)]
+
+    def drop_partition(self, key):
+        return self.partitions.pop(key, None)
+
+    def nbytes(self, key=None):
+        if key is None:
+            return sum(p.nbytes for p in self.partitions.values())
+        part = self.partitions.get(key)
+        return part.nbytes if part is not None else 0
+
+    def memory_bytes(self, key=None):
+        """Como `nbytes`, mas incluindo digests, filtros e índices carregados."""
+        if key is None:
+            return sum(p.memory_usage()['total'] for p in self.partitions.values())
+        part = self.partitions.get(key)
+        return part.memory_usage()['total'] if part is not None else 0
+
+    def memory_usage(self):
+        usage = {'logs': 0, 'hashes': 0, 'indexes': 0}
+        for part in self.partitions.values():
+            for name, value in part.memory_usage().items():
+                if name in usage:
+                    usage[name] += value
+        if self.templates is not None:
+            usage['logs'] += self.templates.nbytes()
+        return usage
+
+    def index_stats(self):
+        """Memória dos índices de busca e dos filtros de deduplicação (sem abrir partições)."""
+        token_bytes = sum(p._index.memory_bytes() for p in self.partitions.values() if p._index is not None)
+        trigram_bytes = sum(p._trigrams.memory_bytes() for p in self.partitions.values() if p._trigrams is not None)
+        bloom_bytes = sum(p._bloom.memory_bytes() for p in self.partitions.values() if p._bloom is not None)
+        return {
+            "logs": len(self), "token_index_bytes": token_bytes,
+            "trigram_index_bytes": trigram_bytes, "dedup_filter_bytes": bloom_bytes
+        }
+
+    def unique_sources(self):
+        used = set()
+        for part in self.partitions.values():
+            used.update(np.unique(part.block().source_codes).tolist())
+        return sorted(self.sources[c] for c in used)
+
+    def to_frame(self, limit=None):
+        """Materializa os `limit` logs mais recentes (por partição temporal) como DataFrame."""
+        remaining = len(self) if limit is None else min(limit, len(self))
+        parts = []
+        for key in reversed(sorted(self.partitions)):
+            if remaining <= 0:
+                break
+            block = self.partitions[key].block()
+            take = min(remaining, len(block))
+            parts.append((block, np.arange(len(block) - take, len(block))))
+            remaining -= take
+        if not parts:
+            return pd.DataFrame()
+        return blocks_frame(parts[::-1], self.sources)
+
+    def query(self, start_ns=None, end_ns=None, source=None, limit=None, predicate=None, text_query=None, regex=None):
+        """
+        Consulta por período/source. `text_query` (árvore de `search_index.parse_query`)
+        é resolvida nos índices de cada partição; `predicate(block, idx)` refina as
+        linhas candidatas por varredura, pré-filtradas pelos trigramas dos literais
+        de `regex` quando informada. Percorre as partições da mais recente para a
+        mais antiga e para ao atingir `limit`.
+        """
+        code = None
+        if source is not None:
+            code = self._source_codes.get(source)
+            if code is None:
+                return pd.DataFrame()
+
+        parts = []
+        remaining = limit
+        for key in reversed(self.keys(start_ns, end_ns)):
+            part = self.partitions[key]
+            block = part.block()
+            ts = np.asarray(block.ts_ns)
+            mask = np.ones(len(block), dtype=bool)
+            if start_ns is not None:
+                mask &= (ts >= start_ns) & (ts != NAT_NS)
+            if end_ns is not None:
+                mask &= (ts <= end_ns) & (ts != NAT_NS)
+            if code is not None:
+                mask &= np.asarray(block.source_codes) == code
+            hits = None
+            if text_query is not None:
+                hits = evaluate(text_query, part.index, len(block), block.messages, part.trigrams)
+            elif regex is not None:
+                hits = part.trigrams.regex_candidates(regex)
+            if hits is not None:
+                hit_mask = np.zeros(len(block), dtype=bool)
+                hit_mask[hits] = True
+                mask &= hit_mask
+            idx = np.flatnonzero(mask)
+            if predicate is not None and len(idx):
+                idx = predicate(block, idx)
+            if not len(idx):
+                continue
+            if remaining is not None:
+                idx = idx[-remaining:]
+                remaining -= len(idx)
+            parts.append((block, idx))
+            if remaining is not None and remaining <= 0:
+                break
+        if not parts:
+            return pd.DataFrame()
+        return blocks_frame(parts[::-1], self.sources)
+
+    # --- Snapshot binário ---
+
+    def save(self, path):
+        """Grava cada partição em um subdiretório próprio de `path`."""
+        os.makedirs(path, exist_ok=True)
+        infos = []
+        for key in sorted(k for k, p in self.partitions.items() if len(p)):
+            part = self.partitions[key]
+            part.save(os.path.join(path, f"p_{key}"))
+            infos.append(part.describe())
+        if self.templates is not None:
+            self.templates.save(path)
+        with open(os.path.join(path, 'store.json'), 'w', encoding='utf-8') as f:
+            json.dump({'sources': self.sources, 'partition_ns': self.partition_ns, 'partitions': infos}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=True, dedup_fp_rate=DEFAULT_FP_RATE, message_storage='plain'):
+        """
+        Carrega o snapshot. Um snapshot gravado no modo template continua nele;
+        `message_storage='templates'` também liga o modo em snapshots em texto
+        puro (os blocos antigos são convertidos quando forem fundidos).
+        """
+        with open(os.path.join(path, 'store.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        store = cls(partition_ns=meta.get('partition_ns', PARTITION_NS), dedup_fp_rate=dedup_fp_rate, message_storage=message_storage)
+        if TemplateDictionary.exists(path):
+            store.templates = TemplateDictionary.load(path)
+        store.sources = meta['sources']
+        store._source_codes = {s: i for i, s in enumerate(store.sources)}
+        for info in meta['partitions']:
+            key = info['key']
+            store.partitions[key] = LogPartition.load(info, os.path.join(path, f"p_{key}"), mmap=mmap,
+                                                      fp_rate=dedup_fp_rate, templates=store.templates)
+        return store
+
+
+def blocks_frame(parts, sources):
+    """Monta o DataFrame (formato público dos logs) para as seleções [(bloco, idx)], em ordem."""
+    hashes, timestamps, ts_ns, codes, messages, ingested = [], [], [], [], [], []
+    for block, idx in parts:
+        idx = np.asarray(idx, dtype=np.int64)
+        # O dtype S16 remove bytes nulos finais; o ljust restaura o digest completo
+        hashes.extend(h.ljust(16, b'\0').hex() for h in np.asarray(block.hashes[idx]).tolist())
+        timestamps.extend(block.timestamps_text(idx))
+        ts_ns.append(np.asarray(block.ts_ns[idx]))
+        codes.append(np.asarray(block.source_codes[idx]))
+        messages.extend(block.messages(idx))
+        ingested.append(np.asarray(block.ingested_ns[idx]))
+    codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+    ingested = np.concatenate(ingested) if ingested else np.empty(0, dtype=np.int64)
+    return pd.DataFrame({
+        'log_hash': hashes,
+        'timestamp': timestamps,
+        'timestamp_ns': np.concatenate(ts_ns) if ts_ns else np.empty(0, dtype=np.int64),
+        'source': [sources[c] for c in codes.tolist()],
+        'message': messages,
+        'ingested_at': pd.to_datetime(ingested, unit='ns').strftime('%Y-%m-%d %H:%M:%S')
+    })
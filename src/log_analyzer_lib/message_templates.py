@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento de mensagens comprimido por template.
+
+A maior parte dos logs é um punhado de templates com números, UUIDs e ids
+hexadecimais variando (os mesmos campos que generate_log_patterns mascara).
+Cada mensagem vira (id do template, parâmetros): o texto fixo fica uma única
+vez no dicionário compartilhado e a linha guarda só os valores variáveis.
+A reconstrução intercala os parâmetros nos buracos do template, então o
+texto lido é idêntico ao ingerido.
+"""
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+# Campos variáveis: UUIDs, ids hexadecimais (com letra e dígito), 0x... e números
+VARIABLE_PATTERN = (
+    r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+    r'|0x[0-9a-fA-F]+'
+    r'|(?<![\w-])(?=[0-9a-fA-F]*[0-9])(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}(?![\w-])'
+    r'|\d+(?:\.\d+)?'
+)
+# Caracteres de controle reservados (não NUL: o factorize do pandas trunca strings em \x00)
+SLOT = '\x1e'           # Marca a posição de um parâmetro no template
+SEPARATOR = '\x1f'      # Separa os parâmetros de uma linha
+LITERAL_ID = 0          # Template SLOT: a mensagem inteira é o único parâmetro
+MAX_TEMPLATES = 200000  # Acima disso, mensagens de templates novos são guardadas literais
+_VARIABLE_RE = re.compile(f'({VARIABLE_PATTERN})')
+_UNSAFE = re.compile('[\x00\x1e\x1f]')
+
+
+class TemplateDictionary:
+    """Dicionário template -> id compartilhado por todos os blocos de um LogStore."""
+
+    def __init__(self, templates=None):
+        self.templates = []
+        self._ids = {}
+        self._parts = []        # Template já quebrado nos trechos fixos entre os parâmetros
+        for template in templates or [SLOT]:
+            self._add(template)
+
+    def __len__(self):
+        return len(self.templates)
+
+    def _add(self, template):
+        self._ids[template] = len(self.templates)
+        self.templates.append(template)
+        self._parts.append(template.split(SLOT))
+        return self._ids[template]
+
+    def _id(self, template):
+        tid = self._ids.get(template)
+        if tid is None:
+            if len(self.templates) >= MAX_TEMPLATES:
+                return None
+            tid = self._add(template)
+        return tid
+
+    def encode(self, messages):
+        """Retorna (ids dos templates em uint32, lista de parâmetros serializados)."""
+        if not len(messages):
+            return np.empty(0, dtype=np.uint32), []
+        # Uma única passada da regex: com o grupo de captura, o split intercala
+        # os trechos fixos (posições pares) e os parâmetros (posições ímpares)
+        split, unsafe = _VARIABLE_RE.split, _UNSAFE.search
+        templates, params = [], []
+        for message in messages:
+            message = str(message)
+            if unsafe(message):
+                # Mensagens com os caracteres reservados (ou NUL) são guardadas literais
+                templates.append(SLOT)
+                params.append(message)
+                continue
+            parts = split(message)
+            templates.append(SLOT.join(parts[::2]))
+            params.append(SEPARATOR.join(parts[1::2]))
+
+        codes, uniques = pd.factorize(np.asarray(templates, dtype=object))
+        ids = np.array([self._id(t) for t in uniques], dtype=object)
+        overflow = np.flatnonzero(pd.isna(ids))
+        if len(overflow):
+            for i in np.flatnonzero(np.isin(codes, overflow)).tolist():
+                params[i] = str(messages[i])
+            ids[overflow] = LITERAL_ID
+        return ids.astype(np.uint32)[codes], params
+
+    def decode(self, ids, params):
+        """Reconstrói as mensagens originais."""
+        out = []
+        parts = self._parts
+        for tid, values in zip(np.asarray(ids).tolist(), params):
+            fixed = parts[tid]
+            if len(fixed) == 1:
+                out.append(fixed[0])
+            elif len(fixed) == 2:
+                out.append(fixed[0] + values + fixed[1])
+            else:
+                pieces = [fixed[0]]
+                for value, text in zip(values.split(SEPARATOR, len(fixed) - 2), fixed[1:]):
+                    pieces.append(value)
+                    pieces.append(text)
+                out.append(''.join(pieces))
+        return out
+
+    def nbytes(self):
+        return sum(len(t.encode('utf-8')) for t in self.templates)
+
+    def save(self, path):
+        with open(os.path.join(path, 'templates.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.templates, f, ensure_ascii=False)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, 'templates.json'))
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'templates.json'), 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
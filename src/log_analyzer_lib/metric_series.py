@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Histórico das métricas customizadas.
+
+Cada métrica tem o seu próprio buffer circular de pontos brutos (timestamps em
+int64 ns + valores float64) e dois rollups automáticos (1 minuto e 1 hora) com
+count/sum/min/max. Os rollups são indexados pelo tempo: o balde `b` ocupa o
+slot `b % capacidade`, então pontos fora de ordem (backfill) também são
+agregados em O(1). Consultas longas (uma semana) leem os rollups, não os
+pontos brutos, e apagar uma métrica é só descartar o seu objeto.
+"""
+import numpy as np
+import pandas as pd
+
+from .log_store import NAT_NS, PARTITION_NS, parse_timestamps_ns
+from .timestamps import utc_now_ns
+
+MINUTE_NS = 60 * 10**9
+HOUR_NS = 3600 * 10**9
+RAW_CAPACITY = 100_000          # Pontos brutos por métrica (os mais antigos são sobrescritos)
+MINUTE_SLOTS = 8 * 24 * 60      # 8 dias de rollup por minuto
+HOUR_SLOTS = 400 * 24           # ~13 meses de rollup por hora
+EMPTY_BUCKET = np.iinfo(np.int64).min
+RESOLUTIONS = {'1min': MINUTE_NS, '1h': HOUR_NS}
+
+
+class RawRing:
+    """Buffer circular de (timestamp, valor); cresce sob demanda até `capacity`."""
+
+    def __init__(self, capacity=RAW_CAPACITY):
+        self.capacity = capacity
+        self.ts = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.size = 0
+        self.head = 0           # Próxima posição sobrescrita quando o buffer está cheio
+        self.wrapped = False    # True depois que algum ponto foi sobrescrito
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, size):
+        if size <= len(self.ts):
+            return
+        allocated = min(self.capacity, max(size, 2 * len(self.ts), 64))
+        for name in ('ts', 'values'):
+            old = getattr(self, name)
+            grown = np.empty(allocated, dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def extend(self, ts, values):
+        if len(ts) > self.capacity:
+            self.wrapped = True
+            ts, values = ts[-self.capacity:], values[-self.capacity:]
+        fill = min(len(ts), self.capacity - self.size)
+        if fill:
+            self._reserve(self.size + fill)
+            self.ts[self.size:self.size + fill] = ts[:fill]
+            self.values[self.size:self.size + fill] = values[:fill]
+            self.size += fill
+        rest = len(ts) - fill
+        if rest:
+            pos = (self.head + np.arange(rest)) % self.capacity
+            self.ts[pos] = ts[fill:]
+            self.values[pos] = values[fill:]
+            self.head = int((self.head + rest) % self.capacity)
+            self.wrapped = True
+
+    def ordered(self):
+        """(timestamps, valores) em ordem de inserção."""
+        order = np.r_[self.head:self.size, 0:self.head]
+        return self.ts[order], self.values[order]
+
+    def keep(self, mask):
+        """Mantém apenas os pontos (em ordem de inserção) onde `mask` é True."""
+        ts, values = self.ordered()
+        self.ts, self.values = ts[mask], values[mask]
+        self.size = len(self.ts)
+        self.head = 0
+
+    def nbytes(self):
+        return self.ts.nbytes + self.values.nbytes
+
+
+class Rollup:
+    """Agregados count/sum/min/max por balde de `width_ns`, em slots indexados pelo tempo."""
+
+    def __init__(self, width_ns, slots):
+        self.width_ns = width_ns
+        self.slots = slots
+        self.ids = None         # Alocados no primeiro ponto
+
+    def _allocate(self):
+        self.ids = np.full(self.slots, EMPTY_BUCKET, dtype=np.int64)
+        self.count = np.zeros(self.slots, dtype=np.int64)
+        self.sum = np.zeros(self.slots, dtype=np.float64)
+        self.min = np.zeros(self.slots, dtype=np.float64)
+        self.max = np.zeros(self.slots, dtype=np.float64)
+
+    def add(self, ts, values):
+        if not len(ts):
+            return
+        if self.ids is None:
+            self._allocate()
+        buckets, inv = np.unique(ts // self.width_ns, return_inverse=True)
+        count = np.bincount(inv, minlength=len(buckets))
+        total = np.bincount(inv, weights=values, minlength=len(buckets))
+        low = np.full(len(buckets), np.inf)
+        high = np.full(len(buckets), -np.inf)
+        np.minimum.at(low, inv, values)
+        np.maximum.at(high, inv, values)
+        self._merge(buckets, count, total, low, high)
+
+    def _merge(self, buckets, count, total, low, high):
+        slots = buckets % self.slots
+        # Dois baldes do mesmo lote no mesmo slot: fica o mais recente (`buckets` está ordenado)
+        order = np.argsort(slots, kind='stable')
+        last = np.r_[slots[order][1:] != slots[order][:-1], True]
+        keep = order[last]
+        buckets, slots, count, total, low, high = (a[keep] for a in (buckets, slots, count, total, low, high))
+
+        current = self.ids[slots]
+        newer = buckets > current
+        reset = slots[newer]
+        self.ids[reset] = buckets[newer]
+        self.count[reset] = 0
+        self.sum[reset] = 0.0
+        self.min[reset] = np.inf
+        self.max[reset] = -np.inf
+        # Baldes mais antigos que o ocupante do slot já saíram da janela do rollup
+        live = buckets >= current
+        s = slots[live]
+        self.count[s] += count[live]
+        self.sum[s] += total[live]
+        self.min[s] = np.minimum(self.min[s], low[live])
+        self.max[s] = np.maximum(self.max[s], high[live])
+
+    def _occupied(self):
+        if self.ids is None:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.ids != EMPTY_BUCKET)
+
+    def frame(self, start_ns=None):
+        """DataFrame (timestamp, count, sum, min, max) dos baldes a partir de `start_ns`."""
+        slots = self._occupied()
+        if start_ns is not None:
+            slots = slots[self.ids[slots] >= start_ns // self.width_ns]
+        slots = slots[np.argsort(self.ids[slots], kind='stable')]
+        return pd.DataFrame({
+            'timestamp': pd.to_datetime(self.ids[slots] * self.width_ns),
+            'count': self.count[slots],
+            'sum': self.sum[slots],
+            'min': self.min[slots],
+            'max': self.max[slots]
+        })
+
+    def window_keys(self, window_ns):
+        slots = self._occupied()
+        return self.ids[slots] * self.width_ns // window_ns
+
+    def drop_window(self, start_ns, end_ns):
+        slots = self._occupied()
+        starts = self.ids[slots] * self.width_ns
+        self.ids[slots[(starts >= start_ns) & (starts < end_ns)]] = EMPTY_BUCKET
+
+    def slot_bytes(self):
+        return 40   # ids, count, sum, min, max (8 bytes cada)
+
+    def nbytes(self):
+        return 0 if self.ids is None else self.slots * self.slot_bytes()
+
+    def to_dict(self):
+        slots = self._occupied()
+        return {name: getattr(self, name)[slots].tolist() for name in ('ids', 'count', 'sum', 'min', 'max')}
+
+    def load_dict(self, data):
+        if not data.get('ids'):
+            return
+        if self.ids is None:
+            self._allocate()
+        self._merge(np.asarray(data['ids'], dtype=np.int64), np.asarray(data['count'], dtype=np.int64),
+                    np.asarray(data['sum'], dtype=np.float64), np.asarray(data['min'], dtype=np.float64),
+                    np.asarray(data['max'], dtype=np.float64))
+
+
+class MetricSeries:
+    """Pontos brutos + rollups de uma única métrica."""
+
+    def __init__(self, raw_capacity=RAW_CAPACITY):
+        self.raw = RawRing(raw_capacity)
+        self.rollups = {'1min': Rollup(MINUTE_NS, MINUTE_SLOTS), '1h': Rollup(HOUR_NS, HOUR_SLOTS)}
+
+    def add(self, ts, values):
+        self.raw.extend(ts, values)
+        for rollup in self.rollups.values():
+            rollup.add(ts, values)
+
+    def covers(self, start_ns):
+        """True se os pontos brutos ainda têm todo o período a partir de `start_ns`."""
+        if not self.raw.wrapped:
+            return True
+        ts, _ = self.raw.ordered()
+        return len(ts) > 0 and ts.min() <= start_ns
+
+    def nbytes(self):
+        return self.raw.nbytes() + sum(r.nbytes() for r in self.rollups.values())
+
+
+class MetricStore:
+    """
+    Séries de todas as métricas customizadas. Expõe a mesma interface de janelas
+    de TimeBuckets (keys/drop/nbytes), usada pela retenção e pelo governador
+    de memória.
+    """
+
+    def __init__(self, bucket_ns=PARTITION_NS, raw_capacity=RAW_CAPACITY):
+        self.bucket_ns = bucket_ns
+        self.raw_capacity = raw_capacity
+        self.series = {}        # metric_id -> MetricSeries
+
+    def __len__(self):
+        return sum(len(s.raw) for s in self.series.values())
+
+    def __iter__(self):
+        """Pontos brutos como registros {metric_id, timestamp, value}."""
+        for metric_id, series in self.series.items():
+            ts, values = series.raw.ordered()
+            stamps = pd.to_datetime(ts).astype(str).tolist()
+            for stamp, value in zip(stamps, values.tolist()):
+                yield {'metric_id': metric_id, 'timestamp': stamp, 'value': value}
+
+    def _series(self, metric_id):
+        series = self.series.get(metric_id)
+        if series is None:
+            series = self.series[metric_id] = MetricSeries(self.raw_capacity)
+        return series
+
+    def extend(self, records):
+        """Adiciona registros {metric_id, timestamp, value}, agrupados por métrica."""
+        if not records:
+            return
+        frame = pd.DataFrame(records, columns=['metric_id', 'timestamp', 'value'])
+        ts = parse_timestamps_ns(frame['timestamp'].tolist())
+        ts = np.where(ts == NAT_NS, utc_now_ns(), ts)
+        values = pd.to_numeric(frame['value'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        ids = frame['metric_id'].astype(int).to_numpy()
+        for metric_id in pd.unique(ids).tolist():
+            mask = ids == metric_id
+            self._series(metric_id).add(ts[mask], values[mask])
+
+    def append(self, record):
+        self.extend([record])
+
+    def delete(self, metric_id):
+        """Remove todo o histórico de uma métrica."""
+        return self.series.pop(metric_id, None) is not None
+
+    def history(self, metric_id, start_ns=None, resolution='raw'):
+        """
+        Histórico de uma métrica a partir de `start_ns`. Em 'raw' retorna os
+        pontos (timestamp, value); em '1min'/'1h' os agregados do rollup.
+        """
+        series = self.series.get(metric_id)
+        if series is None:
+            return pd.DataFrame()
+        if resolution != 'raw':
+            return series.rollups[resolution].frame(start_ns)
+        ts, values = series.raw.ordered()
+        if start_ns is not None:
+            mask = ts >= start_ns
+            ts, values = ts[mask], values[mask]
+        order = np.argsort(ts, kind='stable')
+        return pd.DataFrame({'timestamp': pd.to_datetime(ts[order]), 'value': values[order]})
+
+    # --- Interface de janelas (retenção / governador de memória) ---
+
+    def keys(self):
+        keys = [np.empty(0, dtype=np.int64)]
+        for series in self.series.values():
+            ts, _ = series.raw.ordered()
+            keys.append(ts // self.bucket_ns)
+            keys.extend(r.window_keys(self.bucket_ns) for r in series.rollups.values())
+        return np.unique(np.concatenate(keys)).tolist()
+
+    def drop(self, key):
+        """Descarta pontos e baldes de rollup da janela `key`; retorna quantos pontos saíram."""
+        start, end = key * self.bucket_ns, (key + 1) * self.bucket_ns
+        removed = 0
+        for series in self.series.values():
+            ts, _ = series.raw.ordered()
+            inside = (ts >= start) & (ts < end)
+            if inside.any():
+                series.raw.keep(~inside)
+                removed += int(inside.sum())
+            for rollup in series.rollups.values():
+                rollup.drop_window(start, end)
+        return removed
+
+    def nbytes(self, key=None):
+        if key is None:
+            return sum(s.nbytes() for s in self.series.values())
+        total = 0
+        for series in self.series.values():
+            ts, _ = series.raw.ordered()
+            total += int((ts // self.bucket_ns == key).sum()) * 16
+            for rollup in series.rollups.values():
+                total += int((rollup.window_keys(self.bucket_ns) == key).sum()) * rollup.slot_bytes()
+        return total
+
+    memory_bytes = nbytes
+
+    # --- Snapshot ---
+
+    def to_dict(self):
+        data = {}
+        for metric_id, series in self.series.items():
+            ts, values = series.raw.ordered()
+            data[str(metric_id)] = {
+                'ts': ts.tolist(),
+                'value': values.tolist(),
+                'rollups': {name: r.to_dict() for name, r in series.rollups.items()}
+            }
+        return data
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Reconstrói a partir do snapshot (aceita também a lista plana de registros antiga)."""
+        store = cls()
+        if isinstance(data, list):
+            store.extend(data)
+            return store
+        for metric_id, entry in (data or {}).items():
+            series = store._series(int(metric_id))
+            series.raw.extend(np.asarray(entry['ts'], dtype=np.int64), np.asarray(entry['value'], dtype=np.float64))
+            for name, rollup in entry.get('rollups', {}).items():
+                series.rollups[name].load_dict(rollup)
+        return store
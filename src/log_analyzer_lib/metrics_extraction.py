@@ -5,23 +5,20 @@ import pandas as pd
 import re
 import numpy as np
 
+from .enrichment import enrich
+
 LATENCY_PATTERN = re.compile(r'(?:duration|time|took)[:=]\s*(\d+(?:\.\d+)?)(?:\s*(ms|s|us|µs))?', re.IGNORECASE)
 
 def extract_latency_metrics(df):
     """Extrai métricas de latência (duration, time, took) das mensagens."""
     if df.empty: return pd.DataFrame()
+    # Latência já convertida para ms pela extração em passada única (enrichment.py)
+    latency = enrich(df)['fields'].rows['latency_ms']
     work_df = df.reset_index(drop=True)
-    extracted = work_df['message'].astype(str).str.extract(LATENCY_PATTERN)
-    if extracted.empty: return pd.DataFrame()
 
-    extracted.columns = ['value', 'unit']
-    valid = extracted['value'].notna()
+    valid = latency.notna()
     result = work_df.loc[valid, ['timestamp', 'source']].copy()
-    result['latency_ms'] = pd.to_numeric(extracted.loc[valid, 'value'], errors='coerce')
-    
-    # Converte unidades para ms
-    result.loc[extracted.loc[valid, 'unit'] == 's', 'latency_ms'] *= 1000
-    result.loc[extracted.loc[valid, 'unit'].isin(['us', 'µs']), 'latency_ms'] /= 1000
+    result['latency_ms'] = latency[valid]
     
     return result
 
@@ -33,7 +30,7 @@ def detect_bottlenecks(df, threshold_ms=1000):
     slow_logs = latency_df[latency_df['latency_ms'] > threshold_ms]
     if slow_logs.empty: return pd.DataFrame()
     
-    return slow_logs.groupby('source').agg(
+    return slow_logs.groupby('source', observed=True).agg(
         slow_count=('latency_ms', 'size'),
         avg_latency=('latency_ms', 'mean'),
         max_latency=('latency_ms', 'max')
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Armazenamento dos eventos de RUM (Web Vitals).
+
+Cada vital (LCP, CLS, INP, FID) ganha, por minuto, um DDSketch: histograma
+em baldes logarítmicos com erro relativo garantido nos quantis e que pode ser
+somado a outros sketches. P75/P95 de vários dias saem da fusão de alguns KB
+de sketches; os eventos brutos ficam apenas numa janela curta.
+"""
+import math
+import numpy as np
+import pandas as pd
+
+from .log_store import NAT_NS, PARTITION_NS, parse_timestamps_ns
+from .time_buckets import TimeBuckets
+from .timestamps import utc_now_ns
+
+RELATIVE_ACCURACY = 0.01                # Erro relativo máximo dos quantis (1%)
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_POSITIVE = 1e-9                     # Valores abaixo disso caem no balde do zero (ex: CLS=0)
+MINUTE_NS = 60 * 10**9
+RAW_WINDOW_NS = 24 * 3600 * 10**9       # Eventos brutos mantidos por 24h
+DEFAULT_QUANTILES = (0.5, 0.75, 0.95)
+
+
+class DDSketch:
+    """DDSketch (Masson et al., 2019) com baldes em arrays ordenados."""
+
+    def __init__(self):
+        self.index = np.empty(0, dtype=np.int32)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _merge_bins(self, index, counts):
+        merged, inv = np.unique(np.concatenate([self.index, index]), return_inverse=True)
+        self.counts = np.bincount(inv, weights=np.concatenate([self.counts, counts]), minlength=len(merged)).astype(np.int64)
+        self.index = merged.astype(np.int32)
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        positive = values > MIN_POSITIVE
+        self.zero_count += int((~positive).sum())
+        if positive.any():
+            index = np.ceil(np.log(values[positive]) / LOG_GAMMA).astype(np.int32)
+            uniq, counts = np.unique(index, return_counts=True)
+            self._merge_bins(uniq, counts)
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        if other.count:
+            self._merge_bins(other.index, other.counts)
+            self.zero_count += other.zero_count
+            self.count += other.count
+            self.sum += other.sum
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return max(self.min, 0.0)
+        pos = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        pos = min(pos, len(self.index) - 1)
+        value = 2 * GAMMA ** float(self.index[pos]) / (GAMMA + 1)
+        return min(max(value, self.min), self.max)
+
+    def nbytes(self):
+        return self.index.nbytes + self.counts.nbytes + 64
+
+    def to_list(self):
+        return [self.index.tolist(), self.counts.tolist(), self.zero_count, self.count, self.sum, self.min, self.max]
+
+    @classmethod
+    def from_list(cls, data):
+        sketch = cls()
+        index, counts, sketch.zero_count, sketch.count, sketch.sum, sketch.min, sketch.max = data
+        sketch.index = np.asarray(index, dtype=np.int32)
+        sketch.counts = np.asarray(counts, dtype=np.int64)
+        return sketch
+
+
+class RumStore:
+    """
+    Sketches por (minuto, vital) + eventos brutos recentes. Expõe a interface
+    de janelas de TimeBuckets (keys/drop/nbytes) usada pela retenção e pelo
+    governador de memória; len() é o total de eventos resumidos nos sketches.
+    """
+
+    def __init__(self, bucket_ns=PARTITION_NS, raw_window_ns=RAW_WINDOW_NS):
+        self.bucket_ns = bucket_ns
+        self.raw_window_ns = raw_window_ns
+        self.raw = TimeBuckets(bucket_ns)
+        self.sketches = {}      # minuto -> {vital: DDSketch}
+
+    def __len__(self):
+        return sum(s.count for minute in self.sketches.values() for s in minute.values())
+
+    def __iter__(self):
+        """Eventos brutos ainda na janela curta."""
+        return iter(self.raw)
+
+    def extend(self, records):
+        if not records:
+            return
+        self.raw.extend(records)
+        vitals = [r for r in records if r.get('type', 'vital') == 'vital']
+        if vitals:
+            ts = parse_timestamps_ns([r.get('timestamp') for r in vitals])
+            ts = np.where(ts == NAT_NS, utc_now_ns(), ts)
+            frame = pd.DataFrame({
+                'minute': ts // MINUTE_NS,
+                'name': [r.get('name') for r in vitals],
+                'value': pd.to_numeric(pd.Series([r.get('value') for r in vitals]), errors='coerce').to_numpy()
+            }).dropna(subset=['value'])
+            for (minute, name), group in frame.groupby(['minute', 'name'], sort=False):
+                by_name = self.sketches.setdefault(int(minute), {})
+                by_name.setdefault(name, DDSketch()).add_many(group['value'].to_numpy())
+        self.trim_raw()
+
+    def append(self, record):
+        self.extend([record])
+
+    def trim_raw(self, now_ns=None):
+        """Descarta as janelas de eventos brutos mais antigas que `raw_window_ns`."""
+        now_ns = utc_now_ns() if now_ns is None else now_ns
+        oldest = (now_ns - self.raw_window_ns) // self.bucket_ns
+        for key in self.raw.keys():
+            if key < oldest:
+                self.raw.drop(key)
+
+    def quantiles(self, start_ns=None, end_ns=None, qs=DEFAULT_QUANTILES, per_minute=False):
+        """
+        Quantis por vital (e por minuto, se `per_minute`) no intervalo
+        [start_ns, end_ns), fundindo os sketches.
+        """
+        merged = {}
+        for minute, by_name in self.sketches.items():
+            minute_ns = minute * MINUTE_NS
+            if (start_ns is not None and minute_ns < start_ns) or (end_ns is not None and minute_ns >= end_ns):
+                continue
+            for name, sketch in by_name.items():
+                key = (name, minute) if per_minute else (name,)
+                merged.setdefault(key, DDSketch()).merge(sketch)
+
+        rows = []
+        for key, sketch in sorted(merged.items()):
+            row = {'name': key[0]}
+            if per_minute:
+                row['timestamp'] = pd.Timestamp(key[1] * MINUTE_NS)
+            row.update({'count': sketch.count, 'mean': sketch.sum / sketch.count, 'min': sketch.min, 'max': sketch.max})
+            for q in qs:
+                row[f'p{round(q * 100):g}'] = sketch.quantile(q)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    # --- Interface de janelas (retenção / governador de memória) ---
+
+    def _window(self, minute):
+        return minute * MINUTE_NS // self.bucket_ns
+
+    def keys(self):
+        return sorted(set(self.raw.keys()) | {self._window(m) for m in self.sketches})
+
+    def drop(self, key):
+        """Descarta eventos brutos e sketches da janela; retorna quantos eventos saíram."""
+        self.raw.drop(key)
+        removed = 0
+        for minute in [m for m in self.sketches if self._window(m) == key]:
+            removed += sum(s.count for s in self.sketches.pop(minute).values())
+        return removed
+
+    def nbytes(self, key=None):
+        total = self.raw.nbytes(key)
+        for minute, by_name in self.sketches.items():
+            if key is None or self._window(minute) == key:
+                total += sum(s.nbytes() for s in by_name.values())
+        return total
+
+    memory_bytes = nbytes
+
+    # --- Snapshot ---
+
+    def to_dict(self):
+        return {
+            'raw': list(self.raw),
+            'sketches': [[minute, name, s.to_list()] for minute, by_name in self.sketches.items() for name, s in by_name.items()]
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Reconstrói a partir do snapshot (a lista plana antiga de eventos vira sketches)."""
+        store = cls()
+        if isinstance(data, list):
+            store.extend(data)
+            return store
+        store.raw.extend((data or {}).get('raw', []))
+        for minute, name, sketch in (data or {}).get('sketches', []):
+            store.sketches.setdefault(int(minute), {})[name] = DDSketch.from_list(sketch)
+        store.trim_raw()
+        return store
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+Índices de busca textual nos logs: índice invertido (token -> lista de postings)
+e índice de trigramas para substrings e expressões regulares.
+
+Cada partição do armazenamento mantém os seus índices, atualizados a cada
+ingestão. As consultas aceitam a sintaxe booleana anunciada na busca da Base
+Local: ``error AND timeout``, ``OR``, ``NOT``, parênteses, frases entre aspas e
+``*`` (ex: ``time*``, ``*NullRef``). Todo termo é buscado como substring sem
+diferenciar maiúsculas (como a busca original com str.contains: ``error``
+encontra "TimeoutError" e "errors"); os índices só reduzem as linhas
+candidatas, que são confirmadas na mensagem. Várias palavras sem operador
+(``connection refused``) são uma única substring, como na busca original;
+para combinar termos é preciso o AND explícito.
+"""
+import os
+import re
+import json
+from itertools import chain
+import numpy as np
+import pandas as pd
+
+try:
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+TOKEN_PATTERN = re.compile(r'\w+')
+QUERY_TOKEN_PATTERN = re.compile(r'\(|\)|"[^"]*"|[^\s()]+')
+# Metacaracteres que indicam uma expressão regular (a busca usa a varredura completa)
+REGEX_HINT_PATTERN = re.compile(r'[\\^$|?+{}\[\]]|\.\*|(?<=[^\s(])\*(?=[^\s)])')
+OPERATORS = {'AND', 'OR', 'NOT'}
+
+
+def tokenize(text):
+    """Tokens normalizados (minúsculos) de uma mensagem."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    Índice invertido de uma partição (token -> ids de linha crescentes), em formato
+    CSR: `vocab` (tokens ordenados), `offsets` e `rows`. Cada lote ingerido fica
+    pendente como pares (token, linha) e é fundido na primeira consulta.
+    """
+
+    def __init__(self):
+        self.vocab = np.empty(0, dtype=object)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.uint32)
+        self._pending = []
+
+    @classmethod
+    def from_messages(cls, messages):
+        index = cls()
+        index.add_many(np.arange(len(messages)), messages)
+        return index
+
+    def add_many(self, rows, messages):
+        """Tokeniza um lote de mensagens (as repetições são removidas na fusão)."""
+        if not len(messages):
+            return
+        tokens = pd.Series(messages, dtype=object).str.lower().str.findall(TOKEN_PATTERN)
+        lengths = tokens.str.len().fillna(0).to_numpy(dtype=np.int64)
+        flat = np.fromiter(chain.from_iterable(tokens.dropna()), dtype=object, count=int(lengths.sum()))
+        self._pending.append((flat, np.repeat(np.asarray(rows, dtype=np.int64), lengths)))
+
+    def _compact(self):
+        if not self._pending:
+            return
+        tokens = np.concatenate([np.repeat(self.vocab, np.diff(self.offsets))] + [t for t, _ in self._pending])
+        rows = np.concatenate([self.rows.astype(np.int64)] + [r for _, r in self._pending])
+        self._pending = []
+        # Tokens viram o seu posto na ordem alfabética para ordenar (token, linha) como int64
+        codes, uniques = pd.factorize(tokens)
+        order = np.argsort(uniques)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        keys = _sorted_unique((rank[codes] << 32) | rows)
+        token_rank = keys >> 32
+        starts = np.flatnonzero(np.r_[True, token_rank[1:] != token_rank[:-1]])
+        self.vocab = np.asarray(uniques, dtype=object)[order]
+        self.offsets = np.append(starts, len(keys)).astype(np.int64)
+        self.rows = (keys & 0xFFFFFFFF).astype(np.uint32)
+
+    def lookup(self, token):
+        self._compact()
+        i = int(np.searchsorted(self.vocab, token))
+        if i >= len(self.vocab) or self.vocab[i] != token:
+            return np.empty(0, dtype=np.uint32)
+        return np.asarray(self.rows[self.offsets[i]:self.offsets[i + 1]])
+
+    def lookup_substring(self, fragment):
+        """Linhas com algum token que contém `fragment` (superconjunto das que contêm a substring)."""
+        self._compact()
+        if not len(self.vocab):
+            return np.empty(0, dtype=np.uint32)
+        matches = np.flatnonzero(pd.Series(self.vocab, dtype=object).str.contains(fragment, regex=False).to_numpy())
+        if not len(matches):
+            return np.empty(0, dtype=np.uint32)
+        return _sorted_unique(np.concatenate([np.asarray(self.rows[self.offsets[i]:self.offsets[i + 1]]) for i in matches]))
+
+    def memory_bytes(self):
+        """Tamanho aproximado do índice em memória (tokens + postings)."""
+        self._compact()
+        vocab_bytes = sum(len(t) + 49 for t in self.vocab) + self.vocab.nbytes
+        return vocab_bytes + self.offsets.nbytes + self.rows.nbytes
+
+    def save(self, path):
+        self._compact()
+        with open(os.path.join(path, 'index_tokens.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.vocab.tolist(), f, ensure_ascii=False)
+        np.save(os.path.join(path, 'index_offsets.npy'), self.offsets)
+        np.save(os.path.join(path, 'index_postings.npy'), self.rows)
+
+    @staticmethod
+    def exists(path):
+        return path is not None and os.path.exists(os.path.join(path, 'index_tokens.json'))
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(os.path.join(path, 'index_tokens.json'), 'r', encoding='utf-8') as f:
+            index.vocab = np.array(json.load(f), dtype=object)
+        index.offsets = np.load(os.path.join(path, 'index_offsets.npy'))
+        index.rows = np.load(os.path.join(path, 'index_postings.npy'), mmap_mode='r')
+        return index
+
+
+class TrigramIndex:
+    """
+    Índice de trigramas (bytes UTF-8 em minúsculas) -> ids de linha, em formato CSR:
+    `codes` (trigramas ordenados), `offsets` e `rows`. Lotes novos ficam pendentes
+    como pares (trigrama << 32 | linha) e são fundidos na primeira consulta.
+    """
+
+    def __init__(self):
+        self.codes = np.empty(0, dtype=np.uint32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.uint32)
+        self._pending = []
+
+    @classmethod
+    def from_messages(cls, messages):
+        index = cls()
+        index.add_many(np.arange(len(messages)), messages)
+        return index
+
+    def add_many(self, rows, messages):
+        """Indexa um lote de mensagens de forma vetorizada."""
+        encoded = [str(m).lower().encode('utf-8') for m in messages]
+        if not encoded:
+            return
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64)
+        if len(blob) < 3:
+            return
+        codes = (blob[:-2] << 16) | (blob[1:-1] << 8) | blob[2:]
+        ends = np.cumsum(lengths)
+        owner = np.repeat(np.arange(len(encoded)), lengths)[:len(codes)]
+        # Descarta trigramas que atravessam a fronteira entre duas mensagens
+        valid = ends[owner] - np.arange(len(codes)) >= 3
+        row_ids = np.asarray(rows, dtype=np.int64)[owner[valid]]
+        self._pending.append((codes[valid] << 32) | row_ids)
+
+    def _compact(self):
+        if not self._pending:
+            return
+        existing = (np.repeat(self.codes.astype(np.int64), np.diff(self.offsets)) << 32) | self.rows.astype(np.int64)
+        keys = _sorted_unique(np.concatenate([existing] + self._pending))
+        self._pending = []
+        codes = keys >> 32
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        self.codes = codes[starts].astype(np.uint32)
+        self.offsets = np.append(starts, len(keys)).astype(np.int64)
+        self.rows = (keys & 0xFFFFFFFF).astype(np.uint32)
+
+    def candidates(self, needle):
+        """
+        Linhas que contêm todos os trigramas de `needle` (superconjunto das que
+        contêm a substring). Retorna None se o texto for curto demais para filtrar.
+        """
+        data = needle.lower().encode('utf-8')
+        if len(data) < 3:
+            return None
+        self._compact()
+        raw = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+        wanted = np.unique((raw[:-2] << 16) | (raw[1:-1] << 8) | raw[2:])
+        pos = np.searchsorted(self.codes, wanted)
+        if (pos >= len(self.codes)).any() or (self.codes[np.minimum(pos, len(self.codes) - 1)] != wanted).any():
+            return np.empty(0, dtype=np.uint32)
+        postings = sorted((self.rows[self.offsets[p]:self.offsets[p + 1]] for p in pos), key=len)
+        result = np.asarray(postings[0])
+        for posting in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, posting, assume_unique=True)
+        return result
+
+    def regex_candidates(self, pattern):
+        """Aplica `candidates` a cada literal obrigatório da regex; None se não houver filtro."""
+        result = None
+        for literal in required_literals(pattern):
+            rows = self.candidates(literal)
+            if rows is None:
+                continue
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def memory_bytes(self):
+        self._compact()
+        return self.codes.nbytes + self.offsets.nbytes + self.rows.nbytes
+
+    def save(self, path):
+        self._compact()
+        np.save(os.path.join(path, 'trigram_codes.npy'), self.codes)
+        np.save(os.path.join(path, 'trigram_offsets.npy'), self.offsets)
+        np.save(os.path.join(path, 'trigram_rows.npy'), self.rows)
+
+    @staticmethod
+    def exists(path):
+        return path is not None and os.path.exists(os.path.join(path, 'trigram_codes.npy'))
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        index.codes = np.load(os.path.join(path, 'trigram_codes.npy'), mmap_mode='r')
+        index.offsets = np.load(os.path.join(path, 'trigram_offsets.npy'), mmap_mode='r')
+        index.rows = np.load(os.path.join(path, 'trigram_rows.npy'), mmap_mode='r')
+        return index
+
+
+def _sorted_unique(values):
+    """np.unique por ordenação (mais rápido que o unique por hash para int64 grandes)."""
+    values = np.sort(values)
+    if len(values) < 2:
+        return values
+    return values[np.r_[True, values[1:] != values[:-1]]]
+
+
+def required_literals(pattern):
+    """
+    Trechos literais que toda ocorrência da regex precisa conter (ex: 'Timeout.*sql'
+    -> ['Timeout', 'sql']). Alternâncias no nível superior anulam o filtro.
+    """
+    try:
+        runs = _literal_runs(sre_parse.parse(pattern))
+    except (re.error, TypeError, OverflowError):
+        return []
+    return [run for run in runs or [] if len(run) >= 3]
+
+
+def _literal_runs(parsed):
+    runs, current = [], []
+    for op, arg in parsed:
+        if op is sre_constants.LITERAL:
+            current.append(chr(arg))
+            continue
+        if op is sre_constants.BRANCH:
+            return None
+        if current:
+            runs.append(''.join(current))
+            current = []
+        if op is sre_constants.SUBPATTERN:
+            # Grupo obrigatório: aproveita os literais internos (se não houver alternância)
+            runs.extend(_literal_runs(arg[-1]) or [])
+    if current:
+        runs.append(''.join(current))
+    return runs
+
+
+# --- Consulta booleana ---
+
+def parse_query(query):
+    """
+    Converte a consulta em uma árvore ('and'|'or', [filhos]), ('not', filho) ou
+    ('term', texto). Retorna None quando a consulta parece uma regex, caso em que
+    a busca deve cair na varredura completa.
+    """
+    if not query or not query.strip() or REGEX_HINT_PATTERN.search(query):
+        return None
+    tokens = QUERY_TOKEN_PATTERN.findall(query)
+    if not any(t in OPERATORS or t in ('(', ')') or t.startswith('"') for t in tokens):
+        # Sem operadores: o texto inteiro é uma substring (ex: "connection refused")
+        return ('term', query.strip())
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        children = [parse_and()]
+        while peek() == 'OR':
+            take()
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def parse_and():
+        children = [parse_not()]
+        # Só AND/NOT explícitos combinam termos ("a NOT b" = a AND NOT b, como no FTS5);
+        # termos apenas justapostos invalidam a consulta
+        while peek() in ('AND', 'NOT'):
+            if peek() == 'AND':
+                take()
+            children.append(parse_not())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def parse_not():
+        if peek() == 'NOT':
+            take()
+            return ('not', parse_not())
+        return parse_atom()
+
+    def parse_atom():
+        token = take() if peek() is not None else None
+        if token is None or token in OPERATORS or token == ')':
+            raise ValueError("Consulta incompleta")
+        if token == '(':
+            node = parse_or()
+            if peek() != ')':
+                raise ValueError("Parêntese não fechado")
+            take()
+            return node
+        return ('term', token.strip('"'))
+
+    try:
+        tree = parse_or()
+    except (ValueError, IndexError):
+        return None
+    return tree if pos == len(tokens) else None
+
+
+def evaluate(tree, index, total_rows, messages_fn, trigrams=None):
+    """
+    Avalia a árvore sobre os índices de uma partição e retorna os ids de linha
+    (ordenados). `messages_fn(idx)` fornece as mensagens para verificar termos
+    buscados como substring (frases, caminhos como api/survey, fragmentos).
+    """
+    kind = tree[0]
+    if kind == 'and':
+        # Avalia primeiro os filhos positivos; NOT vira diferença de conjuntos
+        positives = [c for c in tree[1] if c[0] != 'not']
+        negatives = [c[1] for c in tree[1] if c[0] == 'not']
+        if positives:
+            result = evaluate(positives[0], index, total_rows, messages_fn, trigrams)
+            for child in positives[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, evaluate(child, index, total_rows, messages_fn, trigrams), assume_unique=True)
+        else:
+            result = np.arange(total_rows, dtype=np.uint32)
+        for child in negatives:
+            result = np.setdiff1d(result, evaluate(child, index, total_rows, messages_fn, trigrams), assume_unique=True)
+        return result
+    if kind == 'or':
+        parts = [evaluate(c, index, total_rows, messages_fn, trigrams) for c in tree[1]]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.uint32)
+    if kind == 'not':
+        return np.setdiff1d(np.arange(total_rows, dtype=np.uint32), evaluate(tree[1], index, total_rows, messages_fn, trigrams), assume_unique=True)
+    return _evaluate_term(tree[1], index, total_rows, messages_fn, trigrams)
+
+
+def _evaluate_term(text, index, total_rows, messages_fn, trigrams=None):
+    # Todo termo é substring (com ou sem '*'); os índices só filtram as candidatas
+    text = text.strip('*')
+    if not text:
+        return np.empty(0, dtype=np.uint32)
+
+    result = trigrams.candidates(text) if trigrams is not None else None
+    if result is None:
+        # Sem trigramas (ou termo curto): cada token do termo está dentro de algum token da mensagem
+        tokens = tokenize(text)
+        if not tokens:
+            result = np.arange(total_rows, dtype=np.uint32)
+        else:
+            result = index.lookup_substring(tokens[0])
+            for token in tokens[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, index.lookup_substring(token), assume_unique=True)
+
+    if len(result):
+        needle = text.lower()
+        messages = messages_fn(result)
+        keep = np.fromiter((needle in m.lower() for m in messages), dtype=bool, count=len(messages))
+        result = np.asarray(result)[keep]
+    return result
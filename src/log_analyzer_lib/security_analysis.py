@@ -4,6 +4,8 @@
 import pandas as pd
 import re
 
+from .enrichment import enrich
+
 IP_PATTERN = re.compile(r'(?<!\d)\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}(?!\d)')
 
 def analyze_security_threats(df):
@@ -12,11 +14,12 @@ def analyze_security_threats(df):
     
     # Reset index to avoid shape mismatch if df has duplicate indices
     work_df = df.reset_index(drop=True)
-    ips = work_df['message'].astype(str).str.findall(IP_PATTERN).explode().dropna()
+    # IPs da extração em passada única (enrichment.py): uma linha por ocorrência
+    ips = enrich(df)['fields'].ips
     if ips.empty: return pd.DataFrame()
 
-    sec_df = work_df.loc[ips.index].copy()
-    sec_df['ip'] = ips.values
+    sec_df = work_df.loc[ips['row'].to_numpy()].copy()
+    sec_df['ip'] = ips['ip'].to_numpy()
     
     stats = sec_df.groupby('ip').agg(
         total_logs=('timestamp', 'size'),
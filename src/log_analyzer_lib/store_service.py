@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Serviço local de armazenamento (escritor único).
+
+Um único processo é dono do armazenamento em memória (database.py: WAL,
+snapshots, partições de logs, métricas e RUM). O scheduler, o coletor e o
+dashboard falam com ele por HTTP no loopback: escritas chegam em lotes
+colunares e as consultas voltam em colunas, sem que cada processo precise
+recarregar o estado inteiro do disco nem disputar a gravação dos arquivos.
+
+Execução: `python store_service.py` (em src/) ou `python -m log_analyzer_lib.store_service`.
+"""
+import os
+import json
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import requests
+
+from . import database
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_URL = f'http://{DEFAULT_HOST}:{DEFAULT_PORT}'
+CLIENT_TIMEOUT = 30                 # segundos
+INGEST_BATCH_ROWS = 50000           # Linhas por requisição de ingestão
+
+# O database.py não é thread-safe: o servidor atende em threads, mas todas as
+# operações sobre o armazenamento passam por este lock.
+_STORE_LOCK = threading.RLock()
+
+
+def frame_to_columns(df):
+    """Serializa um DataFrame em formato colunar ({coluna: lista})."""
+    if df is None or df.empty:
+        return {}
+    return {col: df[col].astype(object).where(df[col].notna(), None).tolist() for col in df.columns}
+
+
+def columns_to_frame(columns):
+    return pd.DataFrame(columns or {})
+
+
+# --- Servidor ---
+
+def _ingest(body):
+    return {'inserted': database.ingest_logs_to_db(columns_to_frame(body.get('columns')))}
+
+
+def _search(body):
+    df = database.search_logs_in_db(
+        query=body.get('query'), start_date=body.get('start_date'), end_date=body.get('end_date'),
+        source=body.get('source'), limit=body.get('limit', 10000)
+    )
+    return {'columns': frame_to_columns(df)}
+
+
+def _logs(params):
+    return {'columns': frame_to_columns(database.get_collected_logs(int(params.get('limit', 50000))))}
+
+
+def _sources(params):
+    return {'sources': database.get_unique_sources_from_db()}
+
+
+def _stats(params):
+    return {'stats': database.get_db_stats(), 'logs': len(database._LOG_STORE)}
+
+
+def _retention(body):
+    return {'removed': database.clean_old_logs(body.get('retention_days', 30), body.get('max_bytes'))}
+
+
+def _snapshot(body):
+    return {'saved': bool(database.save_to_disk())}
+
+
+_GET_ROUTES = {'/logs': _logs, '/sources': _sources, '/stats': _stats}
+_POST_ROUTES = {'/ingest': _ingest, '/search': _search, '/retention': _retention, '/snapshot': _snapshot}
+
+
+class StoreRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, routes, arg_fn):
+        path = urlparse(self.path).path
+        if path == '/health':
+            return self._reply(200, {'status': 'ok', 'pid': os.getpid()})
+        handler = routes.get(path)
+        if handler is None:
+            return self._reply(404, {'error': f'Rota desconhecida: {path}'})
+        try:
+            arg = arg_fn()
+            with _STORE_LOCK:
+                result = handler(arg)
+            self._reply(200, result)
+        except Exception as e:
+            print(f"❌ Erro no serviço de armazenamento ({path}): {e}")
+            self._reply(500, {'error': str(e)})
+
+    def do_GET(self):
+        self._dispatch(_GET_ROUTES, lambda: {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()})
+
+    def do_POST(self):
+        def body():
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+        self._dispatch(_POST_ROUTES, body)
+
+    def log_message(self, format, *args):
+        pass    # Sem log por requisição (o scheduler envia lotes a cada ciclo)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Carrega o armazenamento do disco e cria o servidor HTTP (porta 0 = porta livre)."""
+    with _STORE_LOCK:
+        database.init_db()
+    server = ThreadingHTTPServer((host, port), StoreRequestHandler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Atende requisições até SIGTERM/SIGINT; grava um snapshot ao sair."""
+    server = make_server(host, port)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"✅ Serviço de armazenamento ouvindo em http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with _STORE_LOCK:
+            database.save_to_disk()
+        print("✅ Serviço de armazenamento encerrado (snapshot gravado).")
+
+
+def main():
+    url = urlparse(os.getenv('STORE_SERVICE_URL', DEFAULT_URL))
+    serve(url.hostname or DEFAULT_HOST, url.port or DEFAULT_PORT)
+
+
+# --- Cliente ---
+
+class StoreClient:
+    """Cliente do serviço de armazenamento, usado pelo scheduler e pelo dashboard."""
+
+    def __init__(self, base_url=DEFAULT_URL, timeout=CLIENT_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _get(self, path, **params):
+        response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _post(self, path, payload):
+        data = json.dumps(payload, default=str)
+        response = self.session.post(self.base_url + path, data=data, timeout=self.timeout,
+                                     headers={'Content-Type': 'application/json'})
+        response.raise_for_status()
+        return response.json()
+
+    def is_available(self):
+        try:
+            return self._get('/health').get('status') == 'ok'
+        except requests.RequestException:
+            return False
+
+    def ingest(self, df):
+        """Envia os logs em lotes colunares; retorna quantos eram novos."""
+        if df is None or df.empty:
+            return 0
+        inserted = 0
+        for start in range(0, len(df), INGEST_BATCH_ROWS):
+            chunk = df.iloc[start:start + INGEST_BATCH_ROWS]
+            inserted += self._post('/ingest', {'columns': frame_to_columns(chunk)})['inserted']
+        return inserted
+
+    def search(self, query=None, start_date=None, end_date=None, source=None, limit=10000):
+        payload = {'query': query, 'start_date': start_date, 'end_date': end_date, 'source': source, 'limit': limit}
+        return columns_to_frame(self._post('/search', payload)['columns'])
+
+    def get_logs(self, limit=50000):
+        return columns_to_frame(self._get('/logs', limit=limit)['columns'])
+
+    def sources(self):
+        return self._get('/sources')['sources']
+
+    def stats(self):
+        return self._get('/stats')
+
+    def clean(self, retention_days=30, max_bytes=None):
+        return self._post('/retention', {'retention_days': retention_days, 'max_bytes': max_bytes})['removed']
+
+    def snapshot(self):
+        return self._post('/snapshot', {})['saved']
+
+
+if __name__ == '__main__':
+    main()
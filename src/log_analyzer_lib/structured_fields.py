@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Campos de logs estruturados (JSON) extraídos uma única vez.
+
+Mensagens que são um objeto JSON (o padrão dos serviços .NET via Serilog/
+GELF) são decodificadas no processamento e os campos conhecidos viram
+colunas tipadas. Os extratores (trace, latência, API) usam essas colunas e
+só recorrem à regex nas linhas sem o campo.
+"""
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _DECODE_ERRORS = (orjson.JSONDecodeError, TypeError)
+except ImportError:
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, TypeError)
+
+# Campo JSON -> (coluna materializada, tipo)
+JSON_FIELDS = {
+    'LogLevel': ('json_log_level', 'str'),
+    'Category': ('logger_category', 'category'),
+    'RequestPath': ('request_path', 'category'),
+    'TraceId': ('trace_id', 'str'),
+    'ElapsedMilliseconds': ('elapsed_ms', 'float')
+}
+# Colunas que o process_log_data pode acrescentar (o nível vai para log_level)
+JSON_COLUMNS = [name for name, _ in JSON_FIELDS.values() if name != 'json_log_level']
+
+
+def loads(text):
+    """json.loads (orjson quando disponível); None se não for JSON válido."""
+    try:
+        return _loads(text)
+    except _DECODE_ERRORS:
+        return None
+
+
+def extract_json_fields(messages, fields=JSON_FIELDS):
+    """
+    Decodifica as mensagens que começam com '{' e retorna (máscara das linhas
+    JSON, {coluna: valores}). Colunas de campos ausentes em todas as linhas
+    não são geradas.
+    """
+    n = len(messages)
+    is_json = np.zeros(n, dtype=bool)
+    values = {key: [None] * n for key in fields}
+    for i, text in enumerate(messages):
+        if not text.startswith('{'):
+            text = text.lstrip()
+            if not text.startswith('{'):
+                continue
+        record = loads(text)
+        if not isinstance(record, dict):
+            continue
+        is_json[i] = True
+        for key, column in values.items():
+            value = record.get(key)
+            if value is not None:
+                column[i] = value
+
+    columns = {}
+    if not is_json.any():
+        return is_json, columns
+    for key, (name, kind) in fields.items():
+        raw = values[key]
+        if all(v is None for v in raw):
+            continue
+        if kind == 'float':
+            columns[name] = pd.to_numeric(pd.Series(raw, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            series = pd.Series([None if v is None else str(v) for v in raw], dtype=object)
+            columns[name] = pd.Categorical(series) if kind == 'category' else series.to_numpy()
+    return is_json, columns
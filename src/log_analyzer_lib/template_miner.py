@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Minerador incremental de templates de log (estilo Drain).
+
+Cada mensagem é quebrada em tokens (tokens com dígitos viram o curinga <*>)
+e desce uma árvore de profundidade fixa: primeiro pelo número de tokens,
+depois pelos primeiros tokens. Na folha, entra no cluster cujo template é
+mais parecido (fração de tokens iguais >= SIMILARITY); as posições que
+divergem viram <*> no template. Sem cluster parecido, nasce um novo.
+
+O id do cluster é o id do template: estável enquanto o minerador viver,
+mesmo que o texto do template fique mais genérico com mensagens novas.
+O minerador do processo (get_miner) só aprende com a ingestão; as análises,
+que são só leitura, usam um minerador próprio por dataset (ver enrichment.py).
+Ao contrário das assinaturas por regex truncadas em 100–200 caracteres,
+mensagens que só compartilham o prefixo não se misturam (o tamanho e os
+tokens da mensagem inteira contam).
+"""
+import re
+import threading
+import numpy as np
+import pandas as pd
+
+WILDCARD = '<*>'
+DEPTH = 4               # Raiz, tamanho, 1 token de prefixo e folha (como no Drain)
+SIMILARITY = 0.4        # Fração mínima de tokens iguais para entrar num cluster
+MAX_CHILDREN = 100      # Filhos por nó; acima disso os tokens novos descem pelo curinga
+MAX_TOKENS = 80         # Stack traces longos: só os primeiros tokens definem o template
+MAX_CLUSTERS = 50000    # Acima disso, mensagens de templates novos vão para OTHER_ID
+OTHER_ID = 0            # Template "<*>": mensagens sem cluster depois do limite
+MAX_CACHED_SEQUENCES = 200000
+
+# Token com algum dígito (o lookbehind só tenta a partir do início de cada token)
+_PARAM_TOKEN = re.compile(r'(?<!\S)\S*?\d\S*')
+_LEAF = None            # Chave da lista de clusters dentro do nó folha
+
+_MINER = None
+_MINER_LOCK = threading.Lock()
+
+
+def tokenize(message):
+    """Tokens da mensagem, com os que contêm dígitos trocados pelo curinga."""
+    return tuple(_PARAM_TOKEN.sub(WILDCARD, message).split()[:MAX_TOKENS])
+
+
+class TemplateMiner:
+    """Árvore de parse de profundidade fixa com os clusters de templates."""
+
+    def __init__(self, depth=DEPTH, similarity=SIMILARITY, max_children=MAX_CHILDREN, max_clusters=MAX_CLUSTERS):
+        self.prefix_depth = max(depth - 3, 1)
+        self.similarity = similarity
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self.templates = [[WILDCARD]]   # id -> tokens do template
+        self.texts = [WILDCARD]         # id -> texto do template
+        self._root = {}
+        self._sequences = {}            # tokens -> id (sequência já vista cai sempre no mesmo cluster)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.templates)
+
+    def _leaf(self, tokens):
+        node = self._root.setdefault(len(tokens), {})
+        for token in tokens[:self.prefix_depth]:
+            child = node.get(token)
+            if child is None:
+                if token != WILDCARD and len(node) < self.max_children - 1:
+                    child = node[token] = {}
+                else:
+                    child = node.setdefault(WILDCARD, {})
+            node = child
+        return node.setdefault(_LEAF, [])
+
+    def _match(self, leaf, tokens):
+        best, best_sim, best_params = None, -1.0, -1
+        n = len(tokens) or 1
+        for cid in leaf:
+            same = params = 0
+            for a, b in zip(self.templates[cid], tokens):
+                if a == b:
+                    same += 1
+                elif a == WILDCARD:
+                    params += 1
+            sim = same / n
+            if sim > best_sim or (sim == best_sim and params > best_params):
+                best, best_sim, best_params = cid, sim, params
+        if best is not None and (best_sim >= self.similarity or not tokens):
+            return best
+        return None
+
+    def _add(self, tokens):
+        cid = self._sequences.get(tokens)
+        if cid is not None:
+            return cid
+        leaf = self._leaf(tokens)
+        cid = self._match(leaf, tokens)
+        if cid is None:
+            if len(self.templates) >= self.max_clusters:
+                return OTHER_ID
+            cid = len(self.templates)
+            leaf.append(cid)
+            self.templates.append(list(tokens))
+            self.texts.append(' '.join(tokens))
+        else:
+            template = self.templates[cid]
+            if any(a != b and a != WILDCARD for a, b in zip(template, tokens)):
+                self.templates[cid] = template = [a if a == b else WILDCARD for a, b in zip(template, tokens)]
+                self.texts[cid] = ' '.join(template)
+        if len(self._sequences) >= MAX_CACHED_SEQUENCES:
+            self._sequences.clear()
+        self._sequences[tokens] = cid
+        return cid
+
+    def restore(self, template):
+        """
+        Recoloca na árvore um template já conhecido (ex.: gravado no registro) e
+        retorna o id local. Template idêntico a um cluster existente não duplica.
+        """
+        tokens = tuple(template.split())
+        with self._lock:
+            cid = self._sequences.get(tokens)
+            if cid is None:
+                if len(self.templates) >= self.max_clusters:
+                    return OTHER_ID
+                cid = len(self.templates)
+                self._leaf(tokens).append(cid)
+                self.templates.append(list(tokens))
+                self.texts.append(' '.join(tokens))
+                self._sequences[tokens] = cid
+            return cid
+
+    def add_messages(self, messages):
+        """
+        Classifica um lote de mensagens (aprendendo templates novos) e retorna
+        o id do template de cada uma, na ordem do lote. Mensagens repetidas são
+        tokenizadas uma única vez.
+        """
+        codes, uniques = pd.factorize(np.asarray(messages, dtype=object), use_na_sentinel=False)
+        with self._lock:
+            ids = np.fromiter((self._add(tokenize(str(m))) for m in uniques), dtype=np.int32, count=len(uniques))
+        return ids[codes]
+
+    def templates_of(self, ids):
+        """Texto atual do template de cada id."""
+        return np.asarray(self.texts, dtype=object)[np.asarray(ids, dtype=np.int64)]
+
+
+def get_miner():
+    """Minerador compartilhado pelo processo, alimentado pela ingestão (ver template_registry.py)."""
+    global _MINER
+    with _MINER_LOCK:
+        if _MINER is None:
+            _MINER = TemplateMiner()
+        return _MINER
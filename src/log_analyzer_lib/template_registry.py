@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Registro persistente de templates de log.
+
+Cada lote ingerido passa pelo minerador (template_miner.py) e atualiza, por
+template: texto, primeira/última ocorrência, contagem acumulada, mensagem de
+exemplo, nível e contagem por source. O registro fica no mesmo banco SQLite
+dos logs e é gravado na mesma transação da inserção, contando só as linhas
+realmente inseridas (duplicatas ignoradas não entram).
+
+O texto do template é único no banco (índice UNIQUE) e o id local do
+minerador é resolvido pelo texto: dois processos escritores que minerarem o
+mesmo template somam na mesma linha. Como cada processo tem o seu minerador,
+mensagens parecidas ainda podem gerar textos diferentes (e linhas diferentes)
+em processos diferentes. Os ids sobrevivem a reinícios: ao abrir o banco, o
+minerador do processo recebe de volta os templates gravados e o mapeamento
+id local -> id do registro. As telas de padrões e incidentes podem ler o
+registro em O(templates) em vez de reagrupar as linhas.
+"""
+import numpy as np
+import pandas as pd
+
+from .categorization import get_engine
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS log_templates (
+        template_id INTEGER PRIMARY KEY,
+        template TEXT NOT NULL,
+        first_seen TEXT,
+        last_seen TEXT,
+        count INTEGER NOT NULL DEFAULT 0,
+        example_message TEXT,
+        log_level TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS log_template_sources (
+        template_id INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (template_id, source)
+    ) WITHOUT ROWID""",
+]
+UNIQUE_INDEX = 'idx_log_templates_template'
+ERROR_LEVELS = ['Error', 'Fail', 'Critical', 'Fatal']
+NO_LEVEL = 'Não identificado'
+LOOKUP_CHUNK = 500      # Textos por SELECT ... IN (limite de parâmetros do SQLite)
+
+# Upsert pelo texto: a linha pode ter sido criada por outro processo ou numa transação desfeita
+_UPSERT_TEMPLATE = """INSERT INTO log_templates (template, first_seen, last_seen, count, example_message, log_level)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(template) DO UPDATE SET
+        first_seen = min(first_seen, excluded.first_seen),
+        last_seen = max(last_seen, excluded.last_seen),
+        count = count + excluded.count,
+        log_level = coalesce(log_level, excluded.log_level)"""
+# Template que ficou mais genérico: renomeia a linha, a menos que o texto novo já exista
+_RENAME_TEMPLATE = """UPDATE log_templates SET template = ?
+    WHERE template_id = ? AND NOT EXISTS (SELECT 1 FROM log_templates WHERE template = ?)"""
+_UPSERT_SOURCE = """INSERT INTO log_template_sources (template_id, source, count) VALUES (?, ?, ?)
+    ON CONFLICT(template_id, source) DO UPDATE SET count = count + excluded.count"""
+
+
+def ensure_unique_templates(conn):
+    """
+    Cria o índice UNIQUE do texto do template. Bancos gravados antes dele podem
+    ter o mesmo template em várias linhas: elas são fundidas na de menor id.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (UNIQUE_INDEX,)).fetchone():
+        return
+    duplicates = conn.execute("""SELECT t.template_id, k.keep_id FROM log_templates t
+        JOIN (SELECT template, min(template_id) AS keep_id FROM log_templates GROUP BY template HAVING count(*) > 1) k
+        ON t.template = k.template AND t.template_id != k.keep_id""").fetchall()
+    for template_id, keep_id in duplicates:
+        conn.execute("""UPDATE log_templates SET
+                first_seen = min(first_seen, (SELECT first_seen FROM log_templates WHERE template_id = ?)),
+                last_seen = max(last_seen, (SELECT last_seen FROM log_templates WHERE template_id = ?)),
+                count = count + (SELECT count FROM log_templates WHERE template_id = ?)
+            WHERE template_id = ?""", (template_id, template_id, template_id, keep_id))
+        for source, count in conn.execute("SELECT source, count FROM log_template_sources WHERE template_id = ?", (template_id,)).fetchall():
+            conn.execute(_UPSERT_SOURCE, (keep_id, source, count))
+        conn.execute("DELETE FROM log_template_sources WHERE template_id = ?", (template_id,))
+        conn.execute("DELETE FROM log_templates WHERE template_id = ?", (template_id,))
+    conn.execute(f"CREATE UNIQUE INDEX {UNIQUE_INDEX} ON log_templates (template)")
+
+
+class TemplateRegistry:
+    """Ids persistentes dos templates de um minerador e estatísticas acumuladas no banco."""
+
+    def __init__(self, miner):
+        self.miner = miner
+        self._registry_ids = {}     # id local (minerador) -> template_id gravado
+
+    def __len__(self):
+        return len(self._registry_ids)
+
+    def load(self, conn):
+        """Reconstrói no minerador os templates gravados. Retorna quantos foram carregados."""
+        for template_id, template in conn.execute("SELECT template_id, template FROM log_templates ORDER BY template_id"):
+            self._registry_ids.setdefault(self.miner.restore(template), template_id)
+        return len(self._registry_ids)
+
+    def record(self, conn, messages, timestamps, sources, log_levels=None):
+        """
+        Classifica as linhas recém-inseridas e grava o resumo do lote. Deve rodar
+        dentro da transação da inserção. Cada template é somado à linha do seu
+        texto (criada se preciso) e o id local passa a apontar para ela.
+        Retorna os ids do registro por linha.
+        """
+        if not len(messages):
+            return np.empty(0, dtype=np.int64)
+        local_ids = self.miner.add_messages(messages)
+        batch = pd.DataFrame({'local_id': local_ids, 'timestamp': timestamps, 'source': sources, 'message': messages})
+        if log_levels is not None:
+            batch['log_level'] = pd.Series(log_levels, dtype=object).astype(str).to_numpy()
+        summary = batch.groupby('local_id', sort=False).agg(
+            first_seen=('timestamp', 'min'),
+            last_seen=('timestamp', 'max'),
+            count=('timestamp', 'size'),
+            example_message=('message', 'first'),
+            **({'log_level': ('log_level', 'first')} if log_levels is not None else {})
+        )
+        texts = self.miner.templates_of(summary.index).tolist()
+        local = summary.index.tolist()
+
+        if log_levels is not None:
+            levels = summary['log_level'].tolist()
+        else:
+            # Nível pelas keywords (fail:, error:, ...) da mensagem de exemplo
+            engine = get_engine({})
+            levels = engine.level_from_keywords(engine.scan(summary['example_message'].tolist())[1], NO_LEVEL).tolist()
+
+        conn.executemany(_RENAME_TEMPLATE, [
+            (text, self._registry_ids[local_id], text) for local_id, text in zip(local, texts) if local_id in self._registry_ids
+        ])
+        conn.executemany(_UPSERT_TEMPLATE, [
+            (text, row.first_seen, row.last_seen, int(row.count), row.example_message, level)
+            for text, row, level in zip(texts, summary.itertuples(index=False), levels)
+        ])
+        ids_by_text = {}
+        for start in range(0, len(texts), LOOKUP_CHUNK):
+            chunk = texts[start:start + LOOKUP_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            ids_by_text.update(conn.execute(f"SELECT template, template_id FROM log_templates WHERE template IN ({placeholders})", chunk))
+        for local_id, text in zip(local, texts):
+            self._registry_ids[local_id] = ids_by_text[text]
+
+        template_ids = np.array([self._registry_ids[i] for i in local_ids.tolist()], dtype=np.int64)
+        per_source = pd.DataFrame({'template_id': template_ids, 'source': batch['source'].to_numpy()})
+        per_source = per_source.groupby(['template_id', 'source'], sort=False).size()
+        conn.executemany(_UPSERT_SOURCE, [(int(t), s, int(c)) for (t, s), c in per_source.items()])
+        return template_ids
+
+
+def patterns_frame(templates, sources):
+    """
+    Padrões acumulados no registro, com as mesmas colunas de generate_log_patterns
+    (mais source_counts). `templates` e `sources` são as tabelas do registro.
+    """
+    if templates.empty:
+        return pd.DataFrame()
+    source_counts = {}      # template_id -> {source: contagem}, da mais frequente para a menos
+    for template_id, source, count in sources.sort_values('count', ascending=False, kind='stable').itertuples(index=False):
+        source_counts.setdefault(template_id, {})[source] = count
+
+    patterns = templates.rename(columns={'template': 'signature'})
+    patterns['sources'] = patterns['template_id'].map(lambda t: list(source_counts.get(t, {})))
+    patterns['source_counts'] = patterns['template_id'].map(lambda t: source_counts.get(t, {}))
+    patterns['percent'] = patterns['count'] / patterns['count'].sum() * 100
+    return patterns.sort_values(['count', 'first_seen'], ascending=[False, True]).reset_index(drop=True)
+
+
+def incidents_frame(patterns):
+    """Incidentes acumulados: padrões do registro com nível de erro (colunas de group_incidents)."""
+    if patterns.empty:
+        return pd.DataFrame()
+    incidents = patterns[patterns['log_level'].isin(ERROR_LEVELS)]
+    incidents = incidents[['signature', 'template_id', 'count', 'first_seen', 'last_seen', 'example_message', 'sources']].copy()
+    incidents['sources'] = incidents['sources'].map(lambda s: s[:3])
+    return incidents.reset_index(drop=True)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Registros leves (valores de métricas, eventos de RUM) agrupados em janelas de
+tempo, no mesmo eixo das partições de logs. A retenção descarta janelas
+inteiras, sem copiar listas.
+"""
+import sys
+import numpy as np
+import pandas as pd
+
+from .log_store import NAT_NS, PARTITION_NS, parse_timestamps_ns
+from .timestamps import utc_now_ns
+
+
+def record_bytes(record):
+    """Estimativa do tamanho em memória de um registro (dict raso)."""
+    return sys.getsizeof(record) + sum(sys.getsizeof(v) for v in record.values())
+
+
+class TimeBuckets:
+    """
+    Lista de registros com campo 'timestamp', particionada por janela de tempo.
+    Registros sem timestamp válido ficam na janela do horário de inserção.
+    """
+
+    def __init__(self, bucket_ns=PARTITION_NS):
+        self.bucket_ns = bucket_ns
+        self.buckets = {}       # chave da janela -> lista de registros
+        self._bytes = {}        # chave da janela -> bytes estimados
+
+    def __len__(self):
+        return sum(len(b) for b in self.buckets.values())
+
+    def __iter__(self):
+        for key in sorted(self.buckets):
+            yield from self.buckets[key]
+
+    def _keys_for(self, records):
+        if len(records) == 1:
+            try:
+                ts = pd.Timestamp(records[0].get('timestamp'))
+                if ts.tzinfo is not None:
+                    ts = ts.tz_convert('UTC').tz_localize(None)
+                values = np.array([NAT_NS if pd.isna(ts) else ts.value], dtype=np.int64)
+            except (ValueError, TypeError):
+                values = np.array([NAT_NS], dtype=np.int64)
+        else:
+            values = parse_timestamps_ns([r.get('timestamp') for r in records])
+        now_ns = utc_now_ns()
+        return (np.where(values == NAT_NS, now_ns, values) // self.bucket_ns).tolist()
+
+    def extend(self, records):
+        if not records:
+            return
+        for key, record in zip(self._keys_for(records), records):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = []
+                self._bytes[key] = 0
+            bucket.append(record)
+            self._bytes[key] += record_bytes(record)
+
+    def append(self, record):
+        self.extend([record])
+
+    def remove_where(self, predicate):
+        """Remove os registros que satisfazem `predicate`; retorna quantos saíram."""
+        removed = 0
+        for key in list(self.buckets):
+            kept = [r for r in self.buckets[key] if not predicate(r)]
+            removed += len(self.buckets[key]) - len(kept)
+            if kept:
+                self.buckets[key] = kept
+                self._bytes[key] = sum(record_bytes(r) for r in kept)
+            else:
+                self.drop(key)
+        return removed
+
+    def keys(self):
+        return sorted(self.buckets)
+
+    def drop(self, key):
+        """Descarta uma janela inteira; retorna quantos registros saíram."""
+        self._bytes.pop(key, None)
+        return len(self.buckets.pop(key, ()))
+
+    def nbytes(self, key=None):
+        if key is None:
+            return sum(self._bytes.values())
+        return self._bytes.get(key, 0)
+
+    # Registros não têm índices auxiliares: o tamanho em memória é o próprio nbytes
+    memory_bytes = nbytes
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Normalização de timestamps com cache de formato.
+
+Os timestamps chegam como texto em poucos formatos fixos por origem: ISO 8601
+do Graylog (2024-01-01T10:00:00.000Z), o do coletor/logging do Python
+(2024-01-01 10:00:00,123) e o de CSVs e do banco local (2024-01-01 10:00:00).
+Sem formato explícito, o pandas infere a cada chamada; no formato do coletor
+a inferência falha e cada valor passa pelo parser genérico (~15x mais lento).
+
+Aqui o formato é detectado uma única vez por "forma" do texto (dígitos
+trocados por 0, ex. 0000-00-00 00:00:00,000) e fica em cache: as conversões
+seguintes com a mesma forma usam direto o formato explícito. O resultado é
+int64 (ns, UTC; NAT_NS para inválidos), gravado pelo process_log_data em
+timestamp_ns e reaproveitado pelas análises, pela ingestão e pelas buscas.
+"""
+import threading
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:     # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+NAT_NS = np.iinfo(np.int64).min
+# Formatos conhecidos, testados nesta ordem (o ISO também cobre CSV/banco: 2024-01-01 10:00:00)
+KNOWN_FORMATS = {
+    'graylog': 'ISO8601',
+    'collector': '%Y-%m-%d %H:%M:%S,%f',
+}
+MIXED = 'mixed'             # Sem formato único: parser genérico valor a valor
+SAMPLE_SIZE = 32            # Valores da mesma forma usados para validar o formato detectado
+MAX_CACHED_SHAPES = 1024
+
+_SHAPE = str.maketrans('0123456789', '0000000000')
+_FORMATS = {}               # forma do texto -> formato
+_FORMATS_LOCK = threading.Lock()
+
+
+def detect_format(sample):
+    """
+    Formato que converte todos os valores da amostra: os conhecidos primeiro,
+    depois o palpite do pandas para o primeiro valor; 'mixed' se nenhum servir.
+    """
+    sample = pd.Series(sample, dtype=object)
+    candidates = list(KNOWN_FORMATS.values())
+    guessed = guess_datetime_format(sample.iloc[0])
+    if guessed:
+        candidates.append(guessed)
+    for fmt in candidates:
+        if pd.to_datetime(sample, errors='coerce', utc=True, format=fmt).notna().all():
+            return fmt
+    return MIXED
+
+
+def format_of(values):
+    """Formato (em cache pela forma do primeiro valor) para uma sequência de textos."""
+    shape = values[0].translate(_SHAPE)
+    fmt = _FORMATS.get(shape)
+    if fmt is None:
+        sample = [v for v in values[:SAMPLE_SIZE * 4] if v.translate(_SHAPE) == shape][:SAMPLE_SIZE]
+        fmt = detect_format(sample)
+        with _FORMATS_LOCK:
+            if len(_FORMATS) >= MAX_CACHED_SHAPES:
+                _FORMATS.clear()
+            _FORMATS[shape] = fmt
+    return fmt
+
+
+def _to_ns(parsed):
+    return parsed.dt.tz_localize(None).astype('datetime64[ns]').to_numpy().view(np.int64)
+
+
+def parse_timestamps_ns(values):
+    """Converte timestamps (texto ou datetime) para int64 (ns, UTC). Valores inválidos viram NAT_NS."""
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _to_ns(pd.Series(pd.to_datetime(values, utc=True)))
+
+    text = pd.Series(values, dtype=object).astype(str).to_numpy()
+    result = np.full(len(text), NAT_NS, dtype=np.int64)
+    pending = np.arange(len(text))
+    tried = set()
+    # Um formato por forma encontrada no lote; forma repetida sem sucesso vai para o parser genérico
+    while len(pending):
+        fmt = format_of(text[pending])
+        if fmt in tried:
+            fmt = MIXED
+        tried.add(fmt)
+        result[pending] = _to_ns(pd.to_datetime(pd.Series(text[pending], dtype=object), errors='coerce', utc=True, format=fmt))
+        if fmt == MIXED:
+            break
+        pending = pending[result[pending] == NAT_NS]
+    return result
+
+
+def as_ns(values):
+    """Coluna timestamp_ns como int64 (nulos, ex. após concat com frames sem a coluna, viram NAT_NS)."""
+    values = np.asarray(values)
+    if values.dtype != np.int64:
+        values = pd.array(values, dtype='Int64').fillna(NAT_NS).to_numpy(dtype=np.int64)
+    return values
+
+
+def ns_to_datetime(values, index=None):
+    """Série datetime64[ns] (UTC, sem fuso) a partir de int64 ns; NAT_NS/nulos viram NaT."""
+    return pd.Series(as_ns(values).view('datetime64[ns]'), index=index)
+
+
+def utc_now_ns():
+    """Instante atual em int64 (ns, UTC), no mesmo eixo de timestamp_ns."""
+    return pd.Timestamp.now(tz='UTC').value
+
+
+def utc_timestamp(value):
+    """Um único valor (texto, date, datetime) como pd.Timestamp em UTC sem fuso (NaT se inválido)."""
+    return ns_to_datetime(parse_timestamps_ns([value])).iloc[0]
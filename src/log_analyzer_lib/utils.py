@@ -6,6 +6,9 @@ import json
 import pandas as pd
 import os
 
+from .categorization import load_config_file
+from .timestamps import ns_to_datetime, parse_timestamps_ns, utc_timestamp
+
 try:
     import streamlit as st
 except ImportError:
@@ -27,10 +30,9 @@ def get_secret(key, default=""):
     return default
 
 def load_config(config_path='config.json'):
-    """Carrega o arquivo de configuração JSON de forma segura."""
+    """Carrega o arquivo de configuração JSON de forma segura (em cache até o arquivo mudar)."""
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f), None
+        return load_config_file(config_path), None
     except FileNotFoundError:
         return None, f"Erro: Arquivo de configuração '{config_path}' não encontrado."
     except json.JSONDecodeError:
@@ -52,10 +54,11 @@ def get_context_logs(df, target_timestamp, source, window_seconds=300):
     if df_source.empty:
         return pd.DataFrame()
         
-    # Trabalha com uma cópia apenas do subconjunto
+    # Trabalha com uma cópia apenas do subconjunto; timestamp_ns (process_log_data) evita reconverter o texto
     df_ctx = df_source.copy()
-    df_ctx['timestamp'] = pd.to_datetime(df_ctx['timestamp'], errors='coerce')
-    target_ts = pd.to_datetime(target_timestamp)
+    ts_ns = df_ctx['timestamp_ns'] if 'timestamp_ns' in df_ctx.columns else parse_timestamps_ns(df_ctx['timestamp'])
+    df_ctx['timestamp'] = ns_to_datetime(ts_ns, index=df_ctx.index)
+    target_ts = utc_timestamp(target_timestamp)
     
     # Filtra por source e janela de tempo (+/- 5 min por padrão)
     start_time = target_ts - pd.Timedelta(seconds=window_seconds)
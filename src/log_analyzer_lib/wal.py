@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Write-ahead log (WAL) segmentado e append-only para o armazenamento em memória.
+
+Cada alteração do banco em memória vira um registro compacto (uma linha JSON
+``[lsn, op, payload]``) anexado ao segmento corrente. Os segmentos rolam por
+tamanho e são descartados após um snapshot compactado (checkpoint), de modo que
+o custo de persistência é proporcional aos registros novos e não ao banco todo.
+"""
+import os
+import json
+
+SEGMENT_PREFIX = 'segment_'
+SEGMENT_SUFFIX = '.wal'
+DEFAULT_SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+
+
+def _segment_name(first_lsn):
+    return f"{SEGMENT_PREFIX}{first_lsn:012d}{SEGMENT_SUFFIX}"
+
+
+def _encode(lsn, op, payload):
+    return json.dumps([lsn, op, payload], separators=(',', ':'), ensure_ascii=False, default=str) + '\n'
+
+
+class SegmentWriter:
+    """
+    Escritor de segmentos do WAL.
+
+    O nome de cada segmento carrega o LSN do seu primeiro registro, o que mantém
+    a numeração contínua mesmo depois que segmentos antigos são apagados.
+    """
+
+    def __init__(self, wal_dir, segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES, fsync=False):
+        self.wal_dir = wal_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self.last_lsn = 0
+        self._fh = None
+        self._current_path = None
+
+    # --- Descoberta de segmentos ---
+
+    def list_segments(self):
+        """Retorna [(first_lsn, caminho)] ordenado pelo LSN inicial."""
+        if not os.path.isdir(self.wal_dir):
+            return []
+        segments = []
+        for name in os.listdir(self.wal_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    first_lsn = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                segments.append((first_lsn, os.path.join(self.wal_dir, name)))
+        return sorted(segments)
+
+    @staticmethod
+    def _repair_tail(path):
+        """Remove uma última linha incompleta (escrita interrompida por crash)."""
+        size = os.path.getsize(path)
+        if size == 0:
+            return
+        with open(path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+            # Procura o último '\n' e trunca logo após ele
+            pos = size
+            chunk = 4096
+            while pos > 0:
+                start = max(0, pos - chunk)
+                f.seek(start)
+                data = f.read(pos - start)
+                idx = data.rfind(b'\n')
+                if idx != -1:
+                    f.truncate(start + idx + 1)
+                    return
+                pos = start
+            f.truncate(0)
+
+    @staticmethod
+    def _read_segment(path):
+        """Lê os registros válidos de um segmento, parando no primeiro registro corrompido."""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                try:
+                    lsn, op, payload = json.loads(line)
+                except (ValueError, TypeError):
+                    break
+                yield lsn, op, payload
+
+    # --- Escrita ---
+
+    def open(self):
+        """Abre (ou cria) o segmento corrente para escrita, recuperando o último LSN."""
+        if self._fh is not None:
+            return
+        os.makedirs(self.wal_dir, exist_ok=True)
+        segments = self.list_segments()
+        if not segments:
+            self._start_segment(self.last_lsn + 1)
+            return
+
+        first_lsn, path = segments[-1]
+        self._repair_tail(path)
+        last_lsn = first_lsn - 1
+        for lsn, _, _ in self._read_segment(path):
+            last_lsn = lsn
+        self.last_lsn = max(self.last_lsn, last_lsn)
+        self._current_path = path
+        self._fh = open(path, 'a', encoding='utf-8')
+
+    def _start_segment(self, first_lsn):
+        if self._fh is not None:
+            self._fh.close()
+        self._current_path = os.path.join(self.wal_dir, _segment_name(first_lsn))
+        self._fh = open(self._current_path, 'a', encoding='utf-8')
+
+    def _flush(self):
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+        if self._fh.tell() >= self.segment_max_bytes:
+            self._start_segment(self.last_lsn + 1)
+
+    def append(self, op, payload):
+        """Anexa um registro e retorna o seu LSN."""
+        self.open()
+        self.last_lsn += 1
+        self._fh.write(_encode(self.last_lsn, op, payload))
+        self._flush()
+        return self.last_lsn
+
+    def append_many(self, op, payloads):
+        """Anexa vários registros do mesmo tipo em uma única escrita."""
+        if not payloads:
+            return self.last_lsn
+        self.open()
+        lines = []
+        for payload in payloads:
+            self.last_lsn += 1
+            lines.append(_encode(self.last_lsn, op, payload))
+        self._fh.write(''.join(lines))
+        self._flush()
+        return self.last_lsn
+
+    # --- Leitura / Recuperação ---
+
+    def replay(self, after_lsn=0):
+        """Itera sobre (lsn, op, payload) de todos os registros com LSN > after_lsn."""
+        if self._fh is not None:
+            self._fh.flush()
+        segments = self.list_segments()
+        for i, (first_lsn, path) in enumerate(segments):
+            # Segmento inteiramente coberto pelo snapshot: pula sem ler
+            next_first = segments[i + 1][0] if i + 1 < len(segments) else None
+            if next_first is not None and next_first - 1 <= after_lsn:
+                continue
+            for lsn, op, payload in self._read_segment(path):
+                if lsn > after_lsn:
+                    self.last_lsn = max(self.last_lsn, lsn)
+                    yield lsn, op, payload
+
+    def checkpoint(self):
+        """
+        Inicia um segmento novo e apaga os anteriores.
+        Deve ser chamado logo após um snapshot que cobre todos os LSNs até `last_lsn`.
+        """
+        self.open()
+        self._start_segment(self.last_lsn + 1)
+        for _, path in self.list_segments():
+            if path != self._current_path:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"⚠️ Não foi possível remover o segmento {path}: {e}")
+
+    def pending_bytes(self):
+        """Total de bytes em segmentos ainda não compactados."""
+        return sum(os.path.getsize(p) for _, p in self.list_segments())
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -2,6 +2,7 @@ import os
 import re
 import time
 from datetime import datetime, timezone
+import pandas as pd
 
 try:
     from dotenv import load_dotenv
@@ -21,6 +22,12 @@ INFLUXDB_BUCKET = os.getenv("DOCKER_INFLUXDB_INIT_BUCKET")
 
 LOG_FILE_PATH = "app.log"
 
+# Com STORAGE_BACKEND=service as linhas também vão, em lotes, para o serviço de armazenamento
+STORE_BATCH_SIZE = 500
+STORE_FLUSH_SECONDS = 5
+# Com o serviço fora do ar, guarda no máximo estas linhas (descarta as mais antigas)
+STORE_MAX_PENDING = 50000
+
 LOG_REGEX = re.compile(
     r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - '
     r'(?P<level>\w+) - '
@@ -50,6 +57,31 @@ def parse_log_line(line):
             'duration': None
         }
 
+# --- Store Service ---
+def get_store_client():
+    """Cliente do serviço de armazenamento, se ele for o backend configurado."""
+    if os.getenv("STORAGE_BACKEND", "").lower() != "service":
+        return None
+    from log_analyzer_lib.store_service import StoreClient, DEFAULT_URL
+    return StoreClient(os.getenv("STORE_SERVICE_URL", DEFAULT_URL))
+
+def flush_to_store(store_client, pending):
+    """
+    Envia o lote pendente ao serviço; mantém as linhas para a próxima tentativa se
+    ele estiver fora, até STORE_MAX_PENDING (as mais antigas são descartadas).
+    """
+    if store_client is None or not pending:
+        return
+    try:
+        store_client.ingest(pd.DataFrame(pending))
+        pending.clear()
+    except Exception as e:
+        print(f"⚠️ Error sending logs to store service: {e}")
+        if len(pending) > STORE_MAX_PENDING:
+            dropped = len(pending) - STORE_MAX_PENDING
+            del pending[:dropped]
+            print(f"⚠️ Store service backlog full: {dropped} oldest lines dropped.")
+
 # --- Main Application ---
 def main():
     global INFLUXDB_URL
@@ -64,8 +96,16 @@ def main():
         
         client = None
         write_api = None
+        store_client = get_store_client()
+        store_pending = []
+        last_store_flush = time.time()
 
         while True:
+            # O lote do serviço de armazenamento é enviado mesmo enquanto o InfluxDB reconecta
+            if store_pending and (len(store_pending) >= STORE_BATCH_SIZE or time.time() - last_store_flush >= STORE_FLUSH_SECONDS):
+                flush_to_store(store_client, store_pending)
+                last_store_flush = time.time()
+
             # Lógica de Conexão / Reconexão Persistente
             if client is None:
                 try:
@@ -108,6 +148,13 @@ def main():
                 continue
             
             parsed_data = parse_log_line(line)
+            if store_client is not None:
+                store_pending.append({
+                    # Formato do app.log, com milissegundos (o mesmo texto entra no hash de deduplicação)
+                    "timestamp": parsed_data['timestamp'].strftime('%Y-%m-%d %H:%M:%S,%f')[:-3],
+                    "source": parsed_data.get('source') or 'unknown',
+                    "message": parsed_data['message']
+                })
 
             point = Point("log_entry") \
                 .time(parsed_data['timestamp']) \
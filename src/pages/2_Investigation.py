@@ -17,7 +17,8 @@ from dashboard.caching import (
     cached_infer_service_dependencies, 
     cached_process_log_data, 
     cached_generate_stack_trace_metrics,
-    cached_prepare_explorer_data
+    cached_prepare_explorer_data,
+    cached_mask_sensitive_data
 )
 
 # --- Lógica de Callback para Feedback (Definida aqui para uso em ambos os modos) ---
@@ -40,8 +41,17 @@ def render_explorer_sub_tab(display_df, raw_df, enable_masking):
         st.markdown("#### 🧩 Padrões de Log (Clustering)")
         st.write("Agrupamento inteligente de logs similares. Útil para identificar ruído e erros frequentes.")
         
-        # Usa display_df (que respeita os filtros globais)
-        patterns = cached_generate_log_patterns(display_df).copy()
+        # Usa display_df (que respeita os filtros globais) ou o histórico acumulado do registro de templates
+        use_registry = st.checkbox("🗂️ Histórico acumulado (todas as ingestões)", value=False, key="patterns_from_registry",
+                                 help="Lê os padrões do registro de templates gravado na ingestão, em vez de reagrupar os logs filtrados.")
+        if use_registry:
+            patterns = lam.get_template_patterns()
+            if enable_masking and not patterns.empty:
+                # O registro guarda as mensagens originais: mascara como o display_df
+                for col in ('example_message', 'signature'):
+                    patterns[col] = cached_mask_sensitive_data(pd.DataFrame({'message': patterns[col]}))['message']
+        else:
+            patterns = cached_generate_log_patterns(display_df).copy()
         
         if not patterns.empty:
             # Ordenação personalizada: Locksp-swarm4 > Locksp-swarm2 > Locksp-swarm1 > Locksp-swarm3 > Outros
@@ -87,6 +97,8 @@ def render_explorer_sub_tab(display_df, raw_df, enable_masking):
                     "sources": "Origens",
                     "log_level": "Nível",
                     "example_message": "Exemplo",
+                    "template_id": None,
+                    "source_counts": None,
                     "priority": None, # Oculta a coluna de prioridade
                     "first_seen": None,
                     "last_seen": "Última Ocorrência"
@@ -104,10 +104,15 @@ def render_ml_sub_tab(filtered_df, time_series_df, z_score_threshold, rarity_thr
     st.subheader("🔔 Agrupamento de Incidentes (AIOps)")
     st.write("Agrupa erros similares em incidentes únicos para evitar fadiga de alertas.")
     
-    incidents = cached_group_incidents(filtered_df)
+    if st.checkbox("🗂️ Histórico acumulado (todas as ingestões)", value=False, key="incidents_from_registry",
+                 help="Lê os incidentes do registro de templates gravado na ingestão, em vez de reagrupar os logs filtrados."):
+        incidents = lam.get_template_incidents()
+    else:
+        incidents = cached_group_incidents(filtered_df)
     if not incidents.empty:
         if enable_masking:
-            incidents['example_message'] = cached_mask_sensitive_data(pd.DataFrame(incidents['example_message'], columns=['message']))['message']
+            for col in ('example_message', 'signature'):
+                incidents[col] = cached_mask_sensitive_data(pd.DataFrame({'message': incidents[col]}))['message']
         st.dataframe(incidents, use_container_width=True)
     else:
         st.success("Nenhum incidente agrupável encontrado nos logs filtrados (Níveis: Error, Fail, Critical ou palavras-chave de erro).")
@@ -349,7 +354,7 @@ def render_latency_sub_tab(filtered_df):
         with col_lat_2:
             st.subheader("Latência por Origem (Top 10)")
             # Agrupa por source e pega a média e p95
-            source_stats = latency_df.groupby('source')['latency_ms'].agg(['mean', 'count', lambda x: x.quantile(0.95)]).reset_index()
+            source_stats = latency_df.groupby('source', observed=True)['latency_ms'].agg(['mean', 'count', lambda x: x.quantile(0.95)]).reset_index()
             source_stats.columns = ['source', 'mean', 'count', 'p95']
             source_stats = source_stats.sort_values('mean', ascending=False).head(10)
             
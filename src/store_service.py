@@ -0,0 +1,9 @@
+# store_service.py
+"""
+Processo escritor único do armazenamento local (logs, métricas, RUM).
+O scheduler e o dashboard acessam os dados por ele com STORAGE_BACKEND=service.
+"""
+from log_analyzer_lib.store_service import main
+
+if __name__ == "__main__":
+    main()
@@ -89,5 +89,5 @@ def cached_prepare_explorer_data(df):
     sorted_df = sorted_df.sort_values(by=['priority', 'timestamp'], ascending=[True, False])
     
     # Cria ID único
-    sorted_df['log_id'] = sorted_df['timestamp'].astype(str) + "_" + sorted_df['source'] + "_" + sorted_df['message'].str.slice(0, 50)
+    sorted_df['log_id'] = sorted_df['timestamp'].astype(str) + "_" + sorted_df['source'].astype(str) + "_" + sorted_df['message'].astype(str).str.slice(0, 50)
     return sorted_df
\ No newline at end of file
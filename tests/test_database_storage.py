@@ -0,0 +1,444 @@
+import unittest
+import numpy as np
+import pandas as pd
+import tempfile
+import shutil
+import sys
+import os
+
+# Adiciona o diretório src ao path para importar o pacote log_analyzer_lib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from log_analyzer_lib import database as db
+from log_analyzer_lib.bloom import ScalableBloomFilter
+from log_analyzer_lib.metric_series import MetricSeries
+from log_analyzer_lib.message_templates import TemplateDictionary
+from log_analyzer_lib.log_store import LogStore, PARTITION_NS
+
+
+class TestDatabaseStorage(unittest.TestCase):
+
+    def setUp(self):
+        """Isola os arquivos de persistência em um diretório temporário."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self._orig = (db.DB_FILE, db.SNAPSHOT_DIR, db.WAL_DIR, db.MEMORY_STATS_DIR)
+        db.DB_FILE = os.path.join(self.tmp_dir, 'log_analysis_data.json')
+        db.SNAPSHOT_DIR = os.path.join(self.tmp_dir, 'snapshot')
+        db.WAL_DIR = os.path.join(self.tmp_dir, 'wal')
+        db.MEMORY_STATS_DIR = os.path.join(self.tmp_dir, 'stats')
+        self._reopen()
+
+    def tearDown(self):
+        if db._WAL is not None:
+            db._WAL.close()
+            db._WAL = None
+        db.DB_FILE, db.SNAPSHOT_DIR, db.WAL_DIR, db.MEMORY_STATS_DIR = self._orig
+        db._SETTINGS.pop('MEMORY_BUDGET_BYTES', None)
+        db._SETTINGS.pop('RETENTION_MAX_BYTES', None)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _reopen(self):
+        """Simula o reinício do processo: descarta o escritor e recarrega do disco."""
+        if db._WAL is not None:
+            db._WAL.close()
+            db._WAL = None
+        db.init_db()
+
+    def _sample_logs(self, n=3, offset=0):
+        return pd.DataFrame({
+            'timestamp': [f'2024-01-01 10:00:{i:02d}' for i in range(offset, offset + n)],
+            'source': ['svc-a'] * n,
+            'message': [f'Mensagem {i}' for i in range(offset, offset + n)]
+        })
+
+    def test_wal_recovers_without_snapshot(self):
+        """Dados gravados apenas no WAL devem sobreviver a um reinício."""
+        db.ingest_logs_to_db(self._sample_logs())
+        db.save_setting('webhook_url', 'http://exemplo')
+        db.save_metric_definition('Erros', r'(Mensagem)', 'counter')
+
+        self.assertFalse(os.path.exists(db.SNAPSHOT_DIR), "save_setting não deveria reescrever o snapshot.")
+        self._reopen()
+
+        self.assertEqual(len(db.get_collected_logs()), 3)
+        self.assertEqual(db.get_setting('webhook_url'), 'http://exemplo')
+        self.assertEqual(len(db.get_metric_definitions()), 1)
+        self.assertEqual(db.ingest_logs_to_db(self._sample_logs()), 0, "Deduplicação deve valer após o replay.")
+
+    def test_snapshot_then_tail_replay(self):
+        """Após um snapshot, apenas os registros novos ficam no WAL e são reaplicados."""
+        db.ingest_logs_to_db(self._sample_logs())
+        self.assertTrue(db.save_to_disk())
+        db.ingest_logs_to_db(self._sample_logs(2, offset=10))
+
+        segments = db._get_wal().list_segments()
+        self.assertEqual(len(segments), 1, "Segmentos cobertos pelo snapshot deveriam ser removidos.")
+
+        self._reopen()
+        self.assertEqual(len(db.get_collected_logs()), 5)
+
+    def test_binary_snapshot_roundtrip(self):
+        """O snapshot binário preserva logs, hashes e demais estruturas."""
+        df = self._sample_logs(50)
+        df.loc[0, 'message'] = 'Mensagem com acentuação e emoji 🔥'
+        db.ingest_logs_to_db(df)
+        db.save_ai_analysis('erro X', 'resposta')
+        original = db.get_collected_logs()
+        self.assertTrue(db.save_to_disk())
+
+        self._reopen()
+        restored = db.get_collected_logs()
+        pd.testing.assert_frame_equal(original.reset_index(drop=True), restored.reset_index(drop=True))
+        self.assertEqual(db.get_cached_ai_analysis('erro X'), 'resposta')
+        self.assertEqual(db.ingest_logs_to_db(df), 0)
+
+    def test_legacy_json_snapshot_is_loaded(self):
+        """Um snapshot JSON antigo continua sendo carregado (migração para o binário)."""
+        db.ingest_logs_to_db(self._sample_logs())
+        self.assertTrue(db.save_to_disk(snapshot_format='json'))
+        self._reopen()
+        self.assertEqual(len(db.get_collected_logs()), 3)
+        self.assertEqual(db.ingest_logs_to_db(self._sample_logs()), 0)
+
+    def test_search_touches_only_overlapping_partitions(self):
+        """Buscas por período consultam apenas as partições horárias do intervalo."""
+        df = pd.DataFrame({
+            'timestamp': ['2024-01-01 10:05:00', '2024-01-01 10:45:00', '2024-01-02 08:00:00', '2024-01-03T12:00:00.000Z'],
+            'source': ['svc-a', 'svc-b', 'svc-a', 'svc-a'],
+            'message': ['Error: timeout', 'ok', 'ERROR: disk full', 'error tardio']
+        })
+        db.ingest_logs_to_db(df)
+        self.assertEqual(len(db._LOG_STORE.partitions), 3)
+
+        start_ns = pd.Timestamp('2024-01-02').value
+        end_ns = pd.Timestamp('2024-01-03').value - 1
+        self.assertEqual(len(db._LOG_STORE.keys(start_ns, end_ns)), 1)
+
+        result = db.search_logs_in_db(query='error', start_date='2024-01-01', end_date='2024-01-02')
+        self.assertEqual(result['message'].tolist(), ['Error: timeout', 'ERROR: disk full'])
+
+        result = db.search_logs_in_db(source='svc-a', limit=2)
+        self.assertEqual(result['message'].tolist(), ['ERROR: disk full', 'error tardio'])
+
+    def test_boolean_search_uses_inverted_index(self):
+        """Consultas booleanas são resolvidas pelo índice e sobrevivem ao snapshot."""
+        df = pd.DataFrame({
+            'timestamp': [f'2024-01-01 10:00:{i:02d}' for i in range(5)],
+            'source': ['svc-a'] * 5,
+            'message': [
+                'ERROR: Timeout connecting to sql server',
+                'Error: disk full',
+                'INFO: request timeout retried',
+                'GET /api/survey/10 completed',
+                'DEBUG: timeouts monitor'
+            ]
+        })
+        db.ingest_logs_to_db(df)
+
+        def search(query):
+            return db.search_logs_in_db(query=query)['message'].tolist() if query else []
+
+        self.assertEqual(search('error AND timeout'), ['ERROR: Timeout connecting to sql server'])
+        self.assertEqual(search('timeout NOT error'), ['INFO: request timeout retried', 'DEBUG: timeouts monitor'])
+        self.assertEqual(len(search('error OR timeout*')), 4)
+        self.assertEqual(search('"sql server"'), ['ERROR: Timeout connecting to sql server'])
+        self.assertEqual(search('api/survey'), ['GET /api/survey/10 completed'])
+        # Várias palavras sem operador são uma substring; combinar exige AND explícito
+        self.assertEqual(search('request timeout'), ['INFO: request timeout retried'])
+        self.assertTrue(db.search_logs_in_db(query='timeout request').empty)
+        self.assertEqual(search('timeout AND request'), ['INFO: request timeout retried'])
+        # Termos simples são substring, como no str.contains (error -> TimeoutError, errors)
+        db.ingest_logs_to_db(pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:10', '2024-01-01 10:00:11'], 'source': ['svc-a'] * 2,
+            'message': ['errors found in TimeoutError handler', 'NullReferenceException x']
+        }))
+        self.assertEqual(search('exception'), ['NullReferenceException x'])
+        self.assertEqual(search('timeouterror'), ['errors found in TimeoutError handler'])
+        self.assertEqual(len(search('error')), 3)
+        # Regex continua funcionando pela varredura completa
+        self.assertEqual(search(r'disk\s+full'), ['Error: disk full'])
+
+        self.assertTrue(db.save_to_disk())
+        self._reopen()
+        self.assertEqual(sorted(search('(error OR info) AND timeout')),
+                         ['ERROR: Timeout connecting to sql server', 'INFO: request timeout retried', 'errors found in TimeoutError handler'])
+        db.ingest_logs_to_db(pd.DataFrame({'timestamp': ['2024-01-01 10:00:30'], 'source': ['svc-a'], 'message': ['error after timeout']}))
+        self.assertEqual(len(search('error AND timeout')), 3)
+
+    def test_substring_and_regex_search_use_trigrams(self):
+        """Fragmentos de identificadores e regex são pré-filtrados pelos trigramas."""
+        df = pd.DataFrame({
+            'timestamp': [f'2024-01-01 10:00:{i:02d}' for i in range(4)],
+            'source': ['svc-a'] * 4,
+            'message': [
+                'System.NullReferenceException at Lockton.Service.Process()',
+                'Trace 3fa85f64-5717-4562-b3fc-2c963f66afa6 started on host api01.lockton.local',
+                'Timeout connecting to sql server',
+                'ok'
+            ]
+        })
+        db.ingest_logs_to_db(df)
+
+        def search(query):
+            return db.search_logs_in_db(query=query)['message'].tolist()
+
+        self.assertEqual(search('*nullref'), [df['message'][0]])
+        self.assertEqual(search('3fa85f64-57'), [df['message'][1]])
+        self.assertEqual(search('lockton.serv'), [df['message'][0]])
+        self.assertEqual(search(r'timeout\s+connecting.*sql'), [df['message'][2]])
+        self.assertEqual(search(r'api\d+\.lockton'), [df['message'][1]])
+
+        stats = db.get_db_stats()
+        self.assertGreater(stats['trigram_index_bytes'], 0)
+        self.assertEqual(stats['logs'], 4)
+
+        self.assertTrue(db.save_to_disk())
+        self._reopen()
+        self.assertEqual(search('*NULLREF'), [df['message'][0]])
+        self.assertGreater(db.get_db_stats()['trigram_index_bytes'], 0)
+
+    def test_bulk_ingest_deduplicates_within_and_across_batches(self):
+        """A ingestão em lote descarta duplicatas do próprio lote e das já armazenadas."""
+        df = self._sample_logs(5)
+        batch = pd.concat([df, df.iloc[:2]], ignore_index=True)
+        self.assertEqual(db.ingest_logs_to_db(batch), 5)
+
+        mixed = pd.concat([df.iloc[3:], self._sample_logs(2, offset=30)], ignore_index=True)
+        self.assertEqual(db.ingest_logs_to_db(mixed), 2)
+
+        stored = db.get_collected_logs()
+        self.assertEqual(len(stored), 7)
+        row = stored.iloc[0]
+        self.assertEqual(row['log_hash'], db.calculate_log_hash(row['timestamp'], row['source'], row['message']))
+
+    def test_logs_without_timestamp_are_not_duplicated_on_reingest(self):
+        """Logs com timestamp inválido caem na hora da ingestão, mas a reingestão em outra hora não os duplica."""
+        store = LogStore()
+        hour = PARTITION_NS
+        digests = db.calculate_log_digests(pd.Series(['sem data'] * 2), pd.Series(['svc-a'] * 2), pd.Series(['falha A', 'falha B']))
+        ts_ns = np.full(2, db.NAT_NS, dtype=np.int64)
+        idx = store.append_batch(['sem data'] * 2, ts_ns, ['svc-a'] * 2, ['falha A', 'falha B'], hour * 10, digests)
+        self.assertEqual(idx.tolist(), [0, 1])
+
+        idx = store.append_batch(['sem data'] * 2, ts_ns, ['svc-a'] * 2, ['falha A', 'falha B'], hour * 12, digests)
+        self.assertEqual(idx.tolist(), [])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(len(store.partitions), 1)
+
+    def test_dedup_filter_has_no_false_negatives(self):
+        """O filtro de Bloom escalável nunca nega um digest inserido e respeita a taxa configurada."""
+        rng = np.random.default_rng(7)
+        inserted = [rng.bytes(16) for _ in range(20000)]
+        others = [rng.bytes(16) for _ in range(20000)]
+        bloom = ScalableBloomFilter(fp_rate=0.01, initial_capacity=1000)
+        for start in range(0, len(inserted), 3000):
+            bloom.add_many(inserted[start:start + 3000])
+
+        self.assertGreater(len(bloom.stages), 1)
+        self.assertTrue(bloom.might_contain(inserted).all())
+        self.assertLess(bloom.might_contain(others).mean(), 0.02)
+
+    def test_dedup_check_does_not_open_snapshot_blocks(self):
+        """Após o load, logs novos são descartados pelo filtro sem mapear os digests do snapshot."""
+        db.ingest_logs_to_db(self._sample_logs(20))
+        self.assertTrue(db.save_to_disk())
+        self._reopen()
+
+        part = next(iter(db._LOG_STORE.partitions.values()))
+        fresh = db.calculate_log_digests(pd.Series(['2024-01-01 10:00:59']), pd.Series(['svc-a']), pd.Series(['nova']))
+        self.assertFalse(part.contains(fresh)[0])
+        self.assertIsNotNone(part._lazy, "Os blocos do snapshot não deveriam ter sido abertos.")
+        self.assertGreater(db.get_db_stats()['dedup_filter_bytes'], 0)
+        self.assertEqual(db.ingest_logs_to_db(self._sample_logs(20)), 0)
+
+    def test_retention_drops_expired_partitions(self):
+        """A retenção descarta janelas inteiras por idade e por orçamento de bytes."""
+        now = pd.Timestamp.now().floor('h')
+        stamps = [now - pd.Timedelta(days=40), now - pd.Timedelta(days=2), now - pd.Timedelta(hours=1), now]
+        df = pd.DataFrame({
+            'timestamp': [t.strftime('%Y-%m-%d %H:%M:%S') for t in stamps],
+            'source': ['svc-a'] * 4,
+            'message': ['req LCP=1200', 'req LCP=900', 'req LCP=800', 'req LCP=700']
+        })
+        db.save_metric_definition('Requests', r'(req)', 'counter')
+        db.ingest_logs_to_db(df)
+        self.assertEqual(len(db._METRIC_VALUES), 4)
+        self.assertEqual(len(db._RUM_EVENTS), 4)
+
+        self.assertEqual(db.clean_old_logs(retention_days=30), 1)
+        self.assertEqual(len(db.get_collected_logs()), 3)
+        self.assertEqual(len(db._METRIC_VALUES), 3)
+        self.assertEqual(len(db._RUM_EVENTS), 3)
+
+        # Orçamento menor que o total: as janelas mais antigas saem primeiro
+        key = max(db._LOG_STORE.partitions)
+        newest = db._LOG_STORE.nbytes(key) + db._METRIC_VALUES.nbytes(key) + db._RUM_EVENTS.nbytes(key)
+        self.assertEqual(db.clean_old_logs(retention_days=30, max_bytes=newest), 2)
+        self.assertEqual(db.get_collected_logs()['message'].tolist(), ['req LCP=700'])
+
+        # A retenção é registrada no WAL e reaplicada após um reinício
+        self._reopen()
+        self.assertEqual(len(db.get_collected_logs()), 1)
+        self.assertEqual(len(db._RUM_EVENTS), 1)
+        self.assertEqual(len(db._METRIC_VALUES), 1)
+
+    def test_memory_budget_evicts_oldest_data(self):
+        """O governador de memória descarta as janelas mais antigas e publica o uso."""
+        now = pd.Timestamp.now().floor('h')
+        df = pd.DataFrame({
+            'timestamp': [(now - pd.Timedelta(hours=h)).strftime('%Y-%m-%d %H:%M:%S') for h in (3, 2, 1, 0)],
+            'source': ['svc-a'] * 4,
+            'message': [f'req LCP={h}00 id={h}' for h in (3, 2, 1, 0)]
+        })
+        db.ingest_logs_to_db(df)
+        usage = db.get_db_stats()['memory']
+        for field in ('logs', 'hashes', 'indexes', 'metric_values', 'rum_events', 'ai_cache'):
+            self.assertIn(field, usage)
+        self.assertEqual(usage['total'], sum(v for k, v in usage.items() if k != 'total'))
+
+        # Configurações gravadas como texto: "0" (ou negativo) significa sem limite
+        db.save_setting('MEMORY_BUDGET_BYTES', 0)
+        db.save_setting('RETENTION_MAX_BYTES', '-1')
+        self.assertEqual(db.enforce_memory_budget(), 0)
+        self.assertEqual(db.clean_old_logs(retention_days=30), 0)
+        self.assertEqual(len(db.get_collected_logs()), 4)
+
+        # Orçamento que só comporta a janela mais recente
+        key = max(db._LOG_STORE.partitions)
+        budget = db._LOG_STORE.memory_bytes(key) + db._RUM_EVENTS.nbytes(key) + 1
+        db._SETTINGS['MEMORY_BUDGET_BYTES'] = budget
+        self.assertGreater(db.enforce_memory_budget(), 0)
+        self.assertEqual(db.get_collected_logs()['message'].tolist(), ['req LCP=000 id=0'])
+        self.assertLessEqual(db.get_memory_usage()['total'], budget)
+
+        reports = db.read_memory_usage()
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['budget'], budget)
+
+        # O descarte é registrado no WAL
+        self._reopen()
+        self.assertEqual(len(db.get_collected_logs()), 1)
+
+    def test_metric_history_uses_rollups(self):
+        """Histórico por métrica: pontos brutos no último dia, rollups em períodos longos."""
+        now = pd.Timestamp.now().floor('min')
+        stamps = [now - pd.Timedelta(days=3), now - pd.Timedelta(days=3), now - pd.Timedelta(minutes=5), now - pd.Timedelta(days=20)]
+        df = pd.DataFrame({
+            'timestamp': [t.strftime('%Y-%m-%d %H:%M:%S') for t in stamps],
+            'source': ['svc-a'] * 4,
+            'message': ['latency=100', 'latency=300', 'latency=50', 'latency=999']
+        })
+        db.save_metric_definition('Latency', r'latency=(\d+)', 'gauge')
+        db.save_metric_definition('Hits', r'(latency)', 'counter')
+        db.ingest_logs_to_db(df)
+        latency, hits = 1, 2
+
+        self.assertEqual(db.get_metric_history(latency, days=1)['value'].tolist(), [50.0])
+        week = db.get_metric_history(latency, days=7)
+        self.assertEqual(week['count'].tolist(), [2, 1])
+        self.assertEqual(week['value'].tolist(), [200.0, 50.0])
+        self.assertEqual(week['max'].tolist(), [300.0, 50.0])
+        self.assertEqual(db.get_metric_history(hits, days=7)['value'].tolist(), [2.0, 1.0])
+        self.assertEqual(db.get_metric_history(latency, days=30)['count'].sum(), 4)
+
+        # Rollups sobrevivem ao snapshot; a exclusão descarta só a métrica apagada
+        self.assertTrue(db.save_to_disk())
+        self._reopen()
+        self.assertEqual(db.get_metric_history(latency, days=7)['count'].tolist(), [2, 1])
+        db.delete_metric_definition(latency)
+        self.assertTrue(db.get_metric_history(latency, days=7).empty)
+        self.assertEqual(len(db.get_metric_history(hits, days=30)), 3)
+
+    def test_metric_ring_buffer_overwrites_oldest(self):
+        """O buffer bruto é limitado; os rollups continuam cobrindo os pontos sobrescritos."""
+        series = MetricSeries(raw_capacity=100)
+        start = pd.Timestamp('2024-01-01 10:00:00').value
+        ts = start + np.arange(250, dtype=np.int64) * 10**9
+        for chunk in range(0, 250, 30):
+            series.add(ts[chunk:chunk + 30], np.ones(len(ts[chunk:chunk + 30])))
+        raw_ts, _ = series.raw.ordered()
+        self.assertEqual(raw_ts.tolist(), ts[-100:].tolist())
+        self.assertFalse(series.covers(start))
+        self.assertEqual(series.rollups['1min'].frame()['count'].tolist(), [60, 60, 60, 60, 10])
+        self.assertEqual(series.rollups['1h'].frame()['sum'].tolist(), [250.0])
+
+    def test_rum_percentiles_come_from_sketches(self):
+        """P75/P95 de vários dias saem dos sketches; eventos brutos só na janela curta."""
+        now = pd.Timestamp.now().floor('min')
+        lcp = np.arange(1, 201) * 10.0
+        df = pd.DataFrame({
+            'timestamp': [(now - pd.Timedelta(days=3, minutes=i % 5)).strftime('%Y-%m-%d %H:%M:%S') for i in range(200)],
+            'source': ['web'] * 200,
+            'message': [f'vitals LCP={v:g} CLS=0 id={i}' for i, v in enumerate(lcp)]
+        })
+        db.ingest_logs_to_db(df)
+        db.ingest_logs_to_db(pd.DataFrame({'timestamp': [now.strftime('%Y-%m-%d %H:%M:%S')], 'source': ['web'], 'message': ['LCP=5000']}))
+
+        # Os eventos de 3 dias atrás já saíram da janela bruta
+        self.assertEqual(db.get_rum_stats(days=7)['value'].tolist(), [5000.0])
+
+        stats = db.get_rum_percentiles(days=7).set_index('name')
+        self.assertEqual(stats.loc['LCP', 'count'], 201)
+        self.assertAlmostEqual(stats.loc['LCP', 'p75'], np.quantile(np.append(lcp, 5000), 0.75), delta=0.02 * 1510)
+        self.assertAlmostEqual(stats.loc['LCP', 'p95'], np.quantile(np.append(lcp, 5000), 0.95), delta=0.02 * 1910)
+        self.assertEqual(stats.loc['CLS', 'p95'], 0.0)
+        self.assertEqual(len(db.get_rum_percentiles(days=7, per_minute=True).query("name == 'LCP'")), 6)
+        self.assertEqual(db.get_rum_percentiles(days=1).set_index('name').loc['LCP', 'count'], 1)
+
+        # Sketches sobrevivem ao snapshot
+        self.assertTrue(db.save_to_disk())
+        self._reopen()
+        self.assertEqual(db.get_rum_percentiles(days=7).set_index('name').loc['LCP', 'count'], 201)
+
+    def test_template_encoding_is_lossless(self):
+        """O modo template reconstrói exatamente o texto original, inclusive em casos de borda."""
+        templates = TemplateDictionary()
+        messages = [
+            'GET /api/v2/users/123 took 45.6ms id=550e8400-e29b-41d4-a716-446655440000',
+            'GET /api/v2/users/98765 took 3ms id=9b2f1c3e-0d4a-4e8b-9f77-1a2b3c4d5e6f',
+            'sem variáveis', '', 'trace deadbeef01 addr 0xFF00 fim 7',
+            'caractere reservado \x1e e \x1f 12', 'nulo \x00 9'
+        ]
+        ids, params = templates.encode(messages)
+        self.assertEqual(ids[0], ids[1])
+        self.assertEqual(templates.decode(ids, params), messages)
+
+    def test_template_message_storage_roundtrip(self):
+        """Logs no modo template sobrevivem ao snapshot, à busca e à conversão de blocos antigos."""
+        db.ingest_logs_to_db(self._sample_logs())
+        self.assertTrue(db.save_to_disk())
+
+        original = db.MESSAGE_STORAGE
+        db.MESSAGE_STORAGE = 'templates'
+        try:
+            self._reopen()
+            db.ingest_logs_to_db(self._sample_logs(5, offset=20))
+            self.assertIsNotNone(db._LOG_STORE.templates)
+            expected = sorted(self._sample_logs()['message'].tolist() + self._sample_logs(5, offset=20)['message'].tolist())
+            self.assertEqual(sorted(db.get_collected_logs()['message'].tolist()), expected)
+
+            self.assertTrue(db.save_to_disk())
+            self._reopen()
+            self.assertEqual(sorted(db.get_collected_logs()['message'].tolist()), expected)
+            self.assertEqual(len(db.search_logs_in_db('20')), 1)
+        finally:
+            db.MESSAGE_STORAGE = original
+
+    def test_truncated_tail_is_ignored(self):
+        """Uma última linha incompleta (crash durante a escrita) não impede a recuperação."""
+        db.ingest_logs_to_db(self._sample_logs())
+        _, path = db._get_wal().list_segments()[-1]
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('[999,"log",{"log_hash":"abc"')
+
+        self._reopen()
+        self.assertEqual(len(db.get_collected_logs()), 3)
+
+        # Novas escritas continuam após o último registro válido
+        db.ingest_logs_to_db(self._sample_logs(1, offset=20))
+        self._reopen()
+        self.assertEqual(len(db.get_collected_logs()), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
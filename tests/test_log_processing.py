@@ -0,0 +1,343 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import pandas as pd
+import tempfile
+import shutil
+import json
+import sys
+import os
+
+# Adiciona o diretório src ao path para importar o log_analyzer
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+# O módulo inicializa o banco ao ser importado; evita criar o arquivo no diretório atual
+with patch.dict(os.environ, {'STORAGE_BACKEND': 'none'}):
+    import log_analyzer as lam
+from log_analyzer_lib import categorization, enrichment, field_extraction, template_miner, timestamps
+
+
+CONFIG = {
+    'categories': [
+        {'name': 'Erro', 'log_levels': ['error', 'fail'], 'keywords': ['exception']},
+        {'name': 'Performance', 'keywords': ['timeout', 'slow']},
+    ]
+}
+
+
+class TestProcessLogData(unittest.TestCase):
+
+    def _logs(self):
+        return pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-01 10:01:00', '2024-01-01 10:02:00', '2024-01-01 10:03:00'],
+            'source': ['svc-b', 'svc-a', 'svc-b', 'svc-a'],
+            'message': ['error: falha no banco', 'info: slow query', '{"LogLevel": "Trace", "Message": "ok"}', 'request ok']
+        })
+
+    def test_categorical_columns_with_stable_code_tables(self):
+        df, counts = lam.process_log_data(self._logs(), CONFIG)
+
+        self.assertEqual(df['category'].tolist(), ['Erro', 'Performance', 'Não categorizado', 'Não categorizado'])
+        self.assertEqual(df['log_level'].tolist(), ['Error', 'Info', 'Trace', 'Não identificado'])
+        self.assertEqual(counts, {'Não categorizado': 2, 'Erro': 1, 'Performance': 1})
+
+        for col in lam.CATEGORICAL_COLUMNS:
+            self.assertIsInstance(df[col].dtype, pd.CategoricalDtype)
+        # Tabelas fixas: ordem do config e níveis conhecidos primeiro, extras no fim
+        self.assertEqual(list(df['category'].cat.categories), ['Erro', 'Performance', 'Não categorizado'])
+        self.assertEqual(list(df['log_level'].cat.categories), lam.LOG_LEVEL_CATEGORIES + ['Trace'])
+        self.assertEqual(list(df['source'].cat.categories), ['svc-a', 'svc-b'])
+
+    def test_filtered_frame_drops_unused_categories(self):
+        df, _ = lam.process_log_data(self._logs(), CONFIG)
+        filtered = lam.drop_unused_categories(df[df['source'].isin(['svc-a'])].copy())
+
+        self.assertEqual(filtered['category'].value_counts().to_dict(), {'Performance': 1, 'Não categorizado': 1})
+        self.assertEqual(list(filtered['source'].cat.categories), ['svc-a'])
+
+    def test_json_fields_materialized_and_preferred_by_extractors(self):
+        logs = pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-01 10:01:00', '2024-01-01 10:02:00'],
+            'source': ['api', 'api', 'worker'],
+            'message': [
+                '{"LogLevel": "Warning", "Category": "Lockton.Api", "RequestPath": "/api/survey/7", '
+                '"TraceId": "0af7651916cd43dd8448eb211c80319c", "ElapsedMilliseconds": 1532.5, "Message": "duration=1ms"}',
+                '{"LogLevel": "Information", "Message": "ok"}',
+                'fail: job duration=2s'
+            ]
+        })
+        df, _ = lam.process_log_data(logs, CONFIG)
+
+        self.assertEqual(df['log_level'].tolist(), ['Warning', 'Information', 'Fail'])
+        self.assertEqual(df['request_path'].tolist()[0], '/api/survey/7')
+        self.assertTrue(pd.isna(df['elapsed_ms'].iloc[1]))
+        # O campo JSON vence a regex (duration=1ms no texto); linhas sem o campo usam a regex
+        self.assertEqual(lam.extract_latency_metrics(df)['latency_ms'].tolist(), [1532.5, 2000.0])
+        self.assertEqual(lam.extract_trace_ids(df)['trace_id'].iloc[0], '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(lam.extract_api_metrics(df)['endpoint'].tolist(), ['/api/survey/7'])
+
+    def test_stream_matches_single_shot(self):
+        logs = self._logs()
+        full, full_counts = lam.process_log_data(logs, CONFIG)
+        parts = list(lam.process_log_stream((logs.iloc[i:i + 3] for i in range(0, len(logs), 3)), CONFIG))
+
+        self.assertEqual([len(chunk) for chunk, _ in parts], [3, 1])
+        self.assertEqual(parts[0][1], {'Erro': 1, 'Performance': 1, 'Não categorizado': 1})
+        self.assertEqual(parts[-1][1], full_counts)
+        streamed = pd.concat([chunk for chunk, _ in parts])
+        self.assertEqual(streamed.index.tolist(), [0, 1, 2, 3])
+        self.assertEqual(streamed['category'].astype(str).tolist(), full['category'].astype(str).tolist())
+
+
+class TestCategorizationEngine(unittest.TestCase):
+
+    def tearDown(self):
+        categorization._ENGINES.clear()
+
+    def _scan(self, messages):
+        engine = categorization.CategorizationEngine({'categories': [
+            {'name': 'Rede', 'keywords': ['connection refused']},
+            {'name': 'Recusa', 'keywords': ['refused', 'SQL']},
+        ]})
+        bits, levels, tokens = engine.scan(messages)
+        codes = engine.assign_categories(bits, [''] * len(messages))
+        return [engine.category_names[c] for c in codes], engine.level_from_keywords(levels, '-').tolist(), tokens.tolist()
+
+    def test_single_pass_finds_overlapping_keywords(self):
+        messages = ['Error: connection refused', 'fail: sql refused', '{"LogLevel": "Info"}', 'ok']
+        expected = (['Rede', 'Recusa', 'Não categorizado', 'Não categorizado'], ['Error', 'Fail', '-', '-'], [False, False, True, False])
+        self.assertEqual(self._scan(messages), expected)
+        # Sem o pyahocorasick a regex com lookahead chega ao mesmo resultado
+        with patch.object(categorization, 'ahocorasick', None):
+            self.assertEqual(self._scan(messages), expected)
+
+    def test_parallel_scan_matches_serial(self):
+        messages = ['fail: sql refused', 'Error: connection refused', 'ok', '{"LogLevel": "Info"}'] * 25
+        engine = categorization.get_engine(CONFIG)
+        self.addCleanup(categorization._shutdown_pool)
+        with patch.object(categorization, 'PARALLEL_MIN_ROWS', 10):
+            parallel = engine.scan(messages, workers=2)
+            pool = categorization._POOL[1]
+            engine.scan(messages, workers=2)
+        for got, expected in zip(parallel, engine.scan(messages)):
+            self.assertEqual(got.tolist(), expected.tolist())
+        # Pool reaproveitado entre varreduras e nunca criado com fork
+        self.assertIs(categorization._POOL[1], pool)
+        self.assertNotEqual(pool._mp_context.get_start_method(), 'fork')
+
+    def test_engine_cached_by_config_content(self):
+        engine = categorization.get_engine(CONFIG)
+        self.assertIs(categorization.get_engine({'categories': [dict(c) for c in CONFIG['categories']]}), engine)
+        self.assertIsNot(categorization.get_engine({'categories': CONFIG['categories'][:1]}), engine)
+
+    def test_engine_lookup_by_identity_skips_hash(self):
+        config = {'categories': [dict(c) for c in CONFIG['categories']]}
+        engine = categorization.get_engine(config)
+        empty = categorization.get_engine({})
+        with patch.object(categorization, '_config_key', side_effect=AssertionError('hash recalculado')):
+            self.assertIs(categorization.get_engine(config), engine)
+            self.assertIs(categorization.get_engine({}), empty)
+
+
+class TestEnrichmentCache(unittest.TestCase):
+
+    def setUp(self):
+        template_miner._MINER = None
+
+    def test_derived_columns_computed_once_per_dataset(self):
+        df, _ = lam.process_log_data(pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-01 10:01:00', 'inválido'],
+            'source': ['api', 'api', 'worker'],
+            'message': ['error: pedido 42 falhou', 'error: pedido 7 falhou', 'info: ok']
+        }), CONFIG)
+
+        with patch.object(enrichment, '_template_id', wraps=enrichment._template_id) as template_id:
+            enrichment.DERIVED_COLUMNS['template_id'] = template_id
+            try:
+                incidents = lam.group_incidents(df)
+                rare = lam.detect_rare_patterns(df, rarity_threshold=0.5)
+                lam.group_incidents(df.copy())    # Outro DataFrame: outro cache
+            finally:
+                enrichment.DERIVED_COLUMNS['template_id'] = enrichment._template_id
+        self.assertEqual(template_id.call_count, 2)
+
+        self.assertEqual(incidents['count'].tolist(), [2])
+        self.assertEqual(incidents['signature'].tolist(), ['error: pedido <*> falhou'])
+        self.assertEqual(rare['message'].tolist(), ['info: ok'])
+        self.assertEqual(len(enrichment.timestamp_frame(df)), 2)
+
+    def test_masking_and_in_place_edits_do_not_reuse_stale_columns(self):
+        df, _ = lam.process_log_data(pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-01 10:01:00'],
+            'source': ['api', 'api'],
+            'message': ['login de ana@exemplo.com', 'error: 10.0.0.1 recusou']
+        }), CONFIG)
+        original = enrichment.enrich(df)['text'].tolist()
+
+        # Mascaramento devolve uma cópia: o cache do original continua válido
+        masked = lam.mask_sensitive_data(df)
+        self.assertEqual(enrichment.enrich(masked)['text'].tolist(),
+                         ['login de *****@*****.***', 'error: ***.***.***.*** recusou'])
+        self.assertEqual(enrichment.enrich(df)['text'].tolist(), original)
+
+        # Alteração no lugar (mesmo tamanho e dtype) exige invalidate
+        df.loc[df.index[0], 'message'] = 'login de ***'
+        lam.invalidate_enrichment(df)
+        self.assertEqual(enrichment.enrich(df)['text'].tolist()[0], 'login de ***')
+
+
+class TestExplorerData(unittest.TestCase):
+
+    def test_prepare_explorer_data_with_categorical_columns(self):
+        """O explorador (Stream) recebe source/log_level categóricos do process_log_data."""
+        st = MagicMock()
+        st.cache_data.side_effect = lambda func=None, **kwargs: func if func else (lambda f: f)
+        df, _ = lam.process_log_data(pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-01 10:01:00', 'inválido'],
+            'source': ['api', None, 'worker'],
+            'message': ['error: pedido 42 falhou', 'info: ok', 'sem nível']
+        }), CONFIG)
+        self.assertIsInstance(df['source'].dtype, pd.CategoricalDtype)
+
+        with patch.dict(sys.modules, {'streamlit': st}):
+            from utils.caching import cached_prepare_explorer_data
+            sorted_df = cached_prepare_explorer_data(df)
+
+        self.assertEqual(sorted_df['priority'].tolist(), [1, 3, 5])
+        self.assertEqual(sorted_df['log_id'].iloc[0], '2024-01-01 10:00:00_api_error: pedido 42 falhou')
+        self.assertEqual(sorted_df['log_id'].iloc[1], '2024-01-01 10:01:00_nan_info: ok')
+
+
+class TestTemplateMiner(unittest.TestCase):
+
+    def test_templates_generalize_with_stable_ids(self):
+        miner = template_miner.TemplateMiner()
+        first = miner.add_messages(['Connection to db-7 closed by peer', 'User alice logged in'])
+        # Alimentado lote a lote: o id não muda quando o template fica mais genérico
+        second = miner.add_messages(['User bob logged in', 'Connection to db-9 closed by peer', 'User alice logged in'])
+
+        self.assertEqual(second.tolist(), [first[1], first[0], first[1]])
+        self.assertEqual(miner.templates_of(first).tolist(), ['Connection to <*> closed by peer', 'User <*> logged in'])
+
+    def test_shared_prefix_does_not_merge_messages(self):
+        prefix = 'Unhandled exception while processing request ' * 4
+        ids = template_miner.TemplateMiner().add_messages([prefix + 'timeout', prefix + 'deadlock victim chosen', prefix + 'timeout'])
+        self.assertEqual(ids[0], ids[2])
+        self.assertNotEqual(ids[0], ids[1])
+
+    def test_patterns_and_incidents_share_template_ids(self):
+        template_miner._MINER = None
+        df, _ = lam.process_log_data(pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-01 10:01:00', '2024-01-01 10:02:00'],
+            'source': ['api', 'worker', 'api'],
+            'message': ['error: job 1 failed', 'error: job 2 failed', 'info: ok']
+        }), CONFIG)
+        patterns = lam.generate_log_patterns(df)
+        incidents = lam.group_incidents(df)
+
+        self.assertEqual(patterns['signature'].tolist(), ['error: job <*> failed', 'info: ok'])
+        self.assertEqual(incidents['template_id'].tolist(), patterns['template_id'].tolist()[:1])
+        # Análises usam o minerador do dataset: o do processo (alimentado pela ingestão) não aprende
+        self.assertEqual(len(template_miner.get_miner()), 1)
+
+
+class TestFieldExtraction(unittest.TestCase):
+
+    def test_single_pass_matches_separate_regexes(self):
+        messages = [
+            'GET https://10.0.0.1:8080/api/orders 500 took=1.5s',
+            'POST /api/123e4567-e89b-12d3-a456-426614174000 status=201 duration: 300us',
+            'RequestPath=/hub/negotiate TraceId=0123456789abcdef0123456789abcdef',
+            'peers 1.2.3.4 and 5.6.7.8 via http://auth.local and https://api.example.com',
+            'nothing here'
+        ]
+        fields = field_extraction.extract_fields(messages)
+        rows = fields.rows
+
+        self.assertEqual(rows['latency_ms'].tolist()[:2], [1500.0, 0.3])
+        self.assertTrue(rows['latency_ms'][2:].isna().all())
+        self.assertEqual(rows['method'].tolist(), ['GET', 'POST', None, None, None])
+        self.assertEqual(rows['endpoint'].tolist()[:2], ['https://10.0.0.1:8080/api/orders', '/api/123e4567-e89b-12d3-a456-426614174000'])
+        self.assertEqual(rows['status_code'].tolist(), ['500', '201', None, None, None])
+        # UUID dentro do path, IP dentro da URL: mesmo resultado das regexes separadas
+        self.assertEqual(rows['uuid'][1], '123e4567-e89b-12d3-a456-426614174000')
+        self.assertEqual(rows['w3c_trace_id'][2], '0123456789abcdef0123456789abcdef')
+        self.assertEqual(rows['request_path'][2], '/hub/negotiate')
+        self.assertEqual(list(zip(fields.ips['row'], fields.ips['ip'])), [(0, '10.0.0.1'), (3, '1.2.3.4'), (3, '5.6.7.8')])
+        self.assertEqual(list(zip(fields.hosts['row'], fields.hosts['host'])),
+                         [(0, '10.0.0.1'), (3, 'auth.local'), (3, 'api.example.com')])
+
+
+class TestTimestampNormalization(unittest.TestCase):
+
+    def test_formats_detected_once_per_shape(self):
+        timestamps._FORMATS.clear()
+        values = ['2024-01-01T10:00:00.000Z', '2024-01-01 10:00:01,250', '2024-01-01 07:00:02-03:00', 'sem data']
+        with patch.object(timestamps, 'detect_format', wraps=timestamps.detect_format) as detect:
+            ns = timestamps.parse_timestamps_ns(values)
+            self.assertEqual(detect.call_count, 3)     # ISO (cobre o offset -03:00), coletor e texto inválido
+            timestamps.parse_timestamps_ns(['2024-02-01 00:00:00,001', '2024-02-01T00:00:00.500Z'])
+            self.assertEqual(detect.call_count, 3)     # Formas já vistas: formato do cache
+
+        self.assertEqual(timestamps.ns_to_datetime(ns).tolist(), [
+            pd.Timestamp('2024-01-01 10:00:00'), pd.Timestamp('2024-01-01 10:00:01.250'),
+            pd.Timestamp('2024-01-01 10:00:02'), pd.NaT
+        ])
+        self.assertEqual(timestamps._FORMATS['0000-00-00 00:00:00,000'], '%Y-%m-%d %H:%M:%S,%f')
+
+    def test_timestamp_parsed_once_at_processing(self):
+        raw = pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00,000', '2024-01-01 10:00:30,500', 'invalido'],
+            'source': ['api', 'api', 'worker'],
+            'message': ['info: a', 'error: b', 'info: c']
+        })
+        df, _ = lam.process_log_data(raw, CONFIG)
+        self.assertEqual(df['timestamp_ns'].tolist()[:2], [1704103200000000000, 1704103230500000000])
+        self.assertEqual(df['timestamp_ns'].iloc[2], timestamps.NAT_NS)
+
+        # As análises usam timestamp_ns: a coluna de texto não é convertida de novo
+        with patch.object(enrichment, 'parse_timestamps_ns') as parse:
+            lam.detect_volume_anomalies(df)
+            context = lam.get_context_logs(df, '2024-01-01T10:00:10Z', 'api')
+            parse.assert_not_called()
+        self.assertEqual(context['message'].tolist(), ['info: a', 'error: b'])
+        self.assertEqual(df['timestamp'].iloc[0], '2024-01-01 10:00:00,000')    # Texto original preservado
+
+
+class TestConfigPlanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'config.json')
+        self._write(CONFIG, mtime=1000)
+        categorization._ENGINES.clear()
+
+    def tearDown(self):
+        categorization._CONFIG_FILES.clear()
+        categorization._ENGINES.clear()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, config, mtime):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        os.utime(self.path, ns=(mtime * 10**9, mtime * 10**9))
+
+    def test_config_reloaded_only_when_file_changes(self):
+        config, error = lam.load_config(self.path)
+        self.assertIsNone(error)
+        self.assertIs(lam.load_config(self.path)[0], config)
+        self.assertEqual(len(categorization._ENGINES), 1)    # Plano compilado junto com a leitura
+
+        # Mesmo conteúdo com mtime novo: relê, mas mantém o dict e o plano
+        self._write(CONFIG, mtime=2000)
+        self.assertIs(lam.load_config(self.path)[0], config)
+
+        changed = {'categories': [{'name': 'Segurança', 'keywords': ['token']}]}
+        self._write(changed, mtime=3000)
+        config, _ = lam.load_config(self.path)
+        self.assertEqual(config, changed)
+        self.assertEqual(lam.categorize_log({'message_text': 'Invalid TOKEN'}, config), 'Segurança')
+        self.assertEqual(lam.categorize_log({'Message': 'ok', 'LogLevel': 'Error'}, CONFIG), 'Erro')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import tempfile
+import shutil
+import sys
+import os
+
+# Adiciona o diretório src ao path para importar o log_analyzer
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+# O módulo inicializa o banco ao ser importado; evita criar o arquivo no diretório atual
+with patch.dict(os.environ, {'STORAGE_BACKEND': 'none'}):
+    import log_analyzer as lam
+import sqlite3
+from log_analyzer_lib import template_miner, template_registry
+
+
+class TestSqliteStorage(unittest.TestCase):
+
+    def setUp(self):
+        """Abre um banco SQLite isolado em um diretório temporário."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'STORAGE_BACKEND': 'sqlite'})
+        self.env.start()
+        self.assertTrue(lam.init_db(os.path.join(self.tmp_dir, 'logs.db')))
+
+    def tearDown(self):
+        self.env.stop()
+        with patch.dict(os.environ, {'STORAGE_BACKEND': 'none'}):
+            lam.init_db()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _logs(self):
+        return pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-02T11:00:00Z', '2024-01-03 12:00:00'],
+            'source': ['svc-a', 'svc-b', 'svc-a'],
+            'message': ['error timeout em /api/survey', 'request ok', 'Erro de conexão 50%']
+        })
+
+    def test_ingest_ignores_duplicates(self):
+        self.assertEqual(lam.ingest_logs_to_db(self._logs()), 3)
+        self.assertEqual(lam.ingest_logs_to_db(self._logs()), 0)
+        self.assertEqual(lam.get_unique_sources_from_db(), ['svc-a', 'svc-b'])
+        self.assertEqual(lam.get_collected_logs(limit=2)['message'].tolist(), ['request ok', 'Erro de conexão 50%'])
+
+    def test_ingest_accepts_categorical_columns(self):
+        """Saída do process_log_data (source/log_level categóricos, com nulos) é ingerida."""
+        df, _ = lam.process_log_data(self._logs().assign(source=['svc-a', None, 'svc-a']), {'categories': []})
+        self.assertEqual(lam.ingest_logs_to_db(df), 3)
+        self.assertEqual(lam.get_unique_sources_from_db(), ['', 'svc-a'])
+
+    def test_search_uses_fts_with_filters(self):
+        """Busca booleana com termos por substring (como a busca em memória) e filtros de data/source."""
+        lam.ingest_logs_to_db(self._logs())
+        self.assertEqual(lam.search_logs_in_db('error AND timeout')['source'].tolist(), ['svc-a'])
+        self.assertEqual(lam.search_logs_in_db('api/survey')['message'].tolist(), ['error timeout em /api/survey'])
+        self.assertEqual(lam.search_logs_in_db('50%')['message'].tolist(), ['Erro de conexão 50%'])
+
+        day = pd.Timestamp('2024-01-03').date()
+        found = lam.search_logs_in_db('erro*', start_date=day, end_date=day, source='svc-a')
+        self.assertEqual(found['message'].tolist(), ['Erro de conexão 50%'])
+        self.assertEqual(len(lam.search_logs_in_db(source='Todos', limit=2)), 2)
+
+        lam.ingest_logs_to_db(pd.DataFrame({
+            'timestamp': ['2024-01-04 10:00:00', '2024-01-04 10:00:01'], 'source': ['svc-c'] * 2,
+            'message': ['TimeoutError: connection refused by host', 'refused connection']
+        }))
+        self.assertEqual(lam.search_logs_in_db('timeout NOT api')['message'].tolist(), ['TimeoutError: connection refused by host'])
+        # Várias palavras sem operador: uma substring (o FTS5 só escolhe as candidatas)
+        self.assertEqual(lam.search_logs_in_db('ion refused b')['message'].tolist(), ['TimeoutError: connection refused by host'])
+        self.assertEqual(len(lam.search_logs_in_db('error OR refused')), 3)
+
+    def test_timestamps_keep_milliseconds_in_utc(self):
+        logs = pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00,100', '2024-01-01 10:00:00,900', '2024-01-01T09:00:00.250-03:00'],
+            'source': ['svc-a'] * 3,
+            'message': ['retry', 'retry', 'retry']
+        })
+        self.assertEqual(lam.ingest_logs_to_db(logs), 3)
+        stored = lam.get_collected_logs()['timestamp'].tolist()
+        self.assertEqual(stored, ['2024-01-01 10:00:00.100', '2024-01-01 10:00:00.900', '2024-01-01 12:00:00.250'])
+
+    def test_retention_and_disabled_backend(self):
+        lam.ingest_logs_to_db(self._logs())
+        self.assertEqual(lam.clean_old_logs(retention_days=30), 3)
+        self.assertTrue(lam.get_collected_logs().empty)
+
+        with patch.dict(os.environ, {'STORAGE_BACKEND': 'none'}):
+            self.assertFalse(lam.init_db())
+        self.assertEqual(lam.ingest_logs_to_db(self._logs()), 0)
+        self.assertTrue(lam.search_logs_in_db('error').empty)
+
+    def test_template_registry_counts_inserted_rows_and_survives_restart(self):
+        logs = pd.DataFrame({
+            'timestamp': ['2024-01-01 10:00:00', '2024-01-01 10:01:00', '2024-01-01 10:02:00'],
+            'source': ['svc-a', 'svc-b', 'svc-a'],
+            'message': ['fail: job 1 crashed', 'fail: job 2 crashed', 'info: ok']
+        })
+        lam.ingest_logs_to_db(logs)
+        lam.ingest_logs_to_db(logs)     # Duplicatas não contam
+        before = lam.get_template_patterns()
+        self.assertEqual(before['signature'].tolist(), ['fail: job <*> crashed', 'info: ok'])
+        self.assertEqual(before['count'].tolist(), [2, 1])
+        self.assertEqual(before['source_counts'].iloc[0], {'svc-a': 1, 'svc-b': 1})
+
+        # Reinício do processo: minerador novo, reconstruído a partir do banco
+        template_miner._MINER = None
+        self.assertTrue(lam.init_db(os.path.join(self.tmp_dir, 'logs.db')))
+        lam.ingest_logs_to_db(logs.assign(timestamp='2024-01-02 08:00:00', message=['fail: job 9 crashed', 'disk full', 'info: ok']))
+
+        after = lam.get_template_patterns().set_index('signature')
+        self.assertEqual(after.loc['fail: job <*> crashed', 'template_id'], before['template_id'].iloc[0])
+        self.assertEqual(after.loc['fail: job <*> crashed', 'last_seen'], '2024-01-02 08:00:00.000')
+        self.assertEqual(after['count'].to_dict(), {'fail: job <*> crashed': 3, 'info: ok': 2, 'disk full': 1})
+        self.assertEqual(lam.get_template_incidents()['signature'].tolist(), ['fail: job <*> crashed'])
+
+    def test_template_registry_writers_share_rows_by_text(self):
+        """Dois processos (mineradores e conexões próprios) somam o mesmo template na mesma linha."""
+        path = os.path.join(self.tmp_dir, 'shared.db')
+        writers = []
+        for _ in range(2):
+            conn = sqlite3.connect(path)
+            for statement in template_registry.SCHEMA:
+                conn.execute(statement)
+            template_registry.ensure_unique_templates(conn)
+            conn.commit()
+            registry = template_registry.TemplateRegistry(template_miner.TemplateMiner())
+            registry.load(conn)
+            writers.append((conn, registry))
+
+        messages = ['fail: job 1 crashed', 'fail: job 2 crashed', 'info: ok']
+        ids = []
+        for conn, registry in writers:
+            with conn:
+                ids.append(registry.record(conn, messages, ['2024-01-01 10:00:00'] * 3, ['svc-a', 'svc-b', 'svc-a']).tolist())
+        self.assertEqual(ids[0], ids[1])
+
+        rows = writers[0][0].execute("SELECT template, count FROM log_templates ORDER BY template").fetchall()
+        self.assertEqual(rows, [('fail: job <*> crashed', 4), ('info: ok', 2)])
+        for conn, _ in writers:
+            conn.close()
+
+    def test_duplicate_templates_are_merged_before_unique_index(self):
+        """Bancos gravados sem o índice UNIQUE têm as linhas repetidas fundidas na de menor id."""
+        conn = sqlite3.connect(os.path.join(self.tmp_dir, 'legacy.db'))
+        for statement in template_registry.SCHEMA:
+            conn.execute(statement)
+        conn.executemany("INSERT INTO log_templates (template_id, template, first_seen, last_seen, count) VALUES (?, ?, ?, ?, ?)",
+                         [(1, 'disk full', '2024-01-02', '2024-01-02', 2), (2, 'disk full', '2024-01-01', '2024-01-03', 3)])
+        conn.executemany("INSERT INTO log_template_sources VALUES (?, ?, ?)", [(1, 'svc-a', 2), (2, 'svc-a', 1), (2, 'svc-b', 2)])
+        template_registry.ensure_unique_templates(conn)
+
+        self.assertEqual(conn.execute("SELECT * FROM log_templates").fetchall(),
+                         [(1, 'disk full', '2024-01-01', '2024-01-03', 5, None, None)])
+        self.assertEqual(conn.execute("SELECT * FROM log_template_sources ORDER BY source").fetchall(), [(1, 'svc-a', 3), (1, 'svc-b', 2)])
+        with self.assertRaises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO log_templates (template) VALUES ('disk full')")
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
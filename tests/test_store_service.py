@@ -0,0 +1,76 @@
+import unittest
+import threading
+import pandas as pd
+import tempfile
+import shutil
+import sys
+import os
+
+# Adiciona o diretório src ao path para importar o pacote log_analyzer_lib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from log_analyzer_lib import database as db
+from log_analyzer_lib import store_service
+
+
+class TestStoreService(unittest.TestCase):
+
+    def setUp(self):
+        """Sobe o serviço em uma porta livre, com os arquivos em um diretório temporário."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self._orig = (db.DB_FILE, db.SNAPSHOT_DIR, db.WAL_DIR, db.MEMORY_STATS_DIR)
+        db.DB_FILE = os.path.join(self.tmp_dir, 'log_analysis_data.json')
+        db.SNAPSHOT_DIR = os.path.join(self.tmp_dir, 'snapshot')
+        db.WAL_DIR = os.path.join(self.tmp_dir, 'wal')
+        db.MEMORY_STATS_DIR = os.path.join(self.tmp_dir, 'stats')
+        self.server = store_service.make_server('127.0.0.1', 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if db._WAL is not None:
+            db._WAL.close()
+            db._WAL = None
+        db.DB_FILE, db.SNAPSHOT_DIR, db.WAL_DIR, db.MEMORY_STATS_DIR = self._orig
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _logs(self, source, n):
+        return pd.DataFrame({
+            'timestamp': [f'2024-01-01 10:{i:02d}:00' for i in range(n)],
+            'source': [source] * n,
+            'message': [f'{source} error timeout {i}' for i in range(n)]
+        })
+
+    def test_concurrent_writers_share_one_store(self):
+        """Escritas de vários processos (clientes) ficam visíveis imediatamente para os leitores."""
+        writers = [store_service.StoreClient(self.url) for _ in range(2)]
+        results = []
+        threads = [
+            threading.Thread(target=lambda c=c, s=s: results.append(c.ingest(self._logs(s, 30))))
+            for c, s in zip(writers, ('scheduler', 'collector'))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(results), [30, 30])
+
+        reader = store_service.StoreClient(self.url)
+        self.assertTrue(reader.is_available())
+        self.assertEqual(reader.ingest(self._logs('scheduler', 30)), 0)
+        self.assertEqual(reader.sources(), ['collector', 'scheduler'])
+        found = reader.search('error AND timeout', start_date='2024-01-01', end_date='2024-01-01', source='collector', limit=None)
+        self.assertEqual(len(found), 30)
+        self.assertTrue({'timestamp', 'source', 'message'} <= set(found.columns))
+        self.assertEqual(len(reader.get_logs(limit=10)), 10)
+        self.assertEqual(reader.stats()['logs'], 60)
+        self.assertTrue(reader.snapshot())
+
+    def test_client_reports_unavailable_service(self):
+        self.assertFalse(store_service.StoreClient('http://127.0.0.1:9', timeout=1).is_available())
+
+
+if __name__ == '__main__':
+    unittest.main()